@@ -0,0 +1,82 @@
+"""
+Per-request latency of psycopg2.connect-per-request versus the shared connection pool.
+
+Each simulated request runs the kitchen-screen order query under N concurrent workers.
+
+Usage (from the Backend_Component/ directory):
+    python -m benchmarks.bench_pool --manager-id 1 --requests 500 --concurrency 20
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+
+from utils.db_authenticate import DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT, get_connection, get_pool
+
+ORDER_SQL = """
+    SELECT ot.order_number, ot.status
+    FROM order_table ot
+    WHERE ot.restaurant_id IN (
+        SELECT restaurant_id
+        FROM manager_account_table
+        WHERE manager_id = %s
+    )
+    AND ot.status IN ('new', 'prepare')
+"""
+
+
+def connect_per_request(manager_id: int) -> None:
+    connection = psycopg2.connect(
+        host=DB_HOST, database=DB_NAME, user="developuser", password=DB_PASSWORD, port=DB_PORT
+    )
+    cursor = connection.cursor()
+    cursor.execute(ORDER_SQL, (manager_id,))
+    cursor.fetchall()
+    cursor.close()
+    connection.close()
+
+
+def pooled(manager_id: int) -> None:
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(ORDER_SQL, (manager_id,))
+        cursor.fetchall()
+        cursor.close()
+
+
+def measure(func, manager_id: int, total: int, concurrency: int):
+    def timed(_):
+        start = time.perf_counter()
+        func(manager_id)
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(timed, range(total)))
+    return {
+        "mean": statistics.mean(latencies),
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--manager-id", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    # Open the pool's connections up front so setup is not measured
+    measure(pooled, args.manager_id, args.concurrency, args.concurrency)
+
+    for name, func in (("connect per request", connect_per_request), ("shared pool", pooled)):
+        stats = measure(func, args.manager_id, args.requests, args.concurrency)
+        print(f"{name:20s} mean={stats['mean']:7.2f}ms p50={stats['p50']:7.2f}ms p95={stats['p95']:7.2f}ms")
+
+    get_pool().closeall()
+
+
+if __name__ == "__main__":
+    main()
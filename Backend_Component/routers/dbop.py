@@ -7,7 +7,8 @@ import psycopg2
 from dotenv import load_dotenv
 import hashlib 
 from .auth import create_access_token, verify_token 
-from utils.db_authenticate import get_db
+from utils.db_authenticate import get_async_connection, get_async_db
+from utils.query_log import track_route_queries
 from fastapi import Depends
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Query
@@ -19,7 +20,7 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(track_route_queries)])
 
 # Define a User model for registration
 class User(BaseModel):
@@ -68,27 +69,20 @@ def hash_password(password: str) -> str:
 @router.post("/register")
 async def register(user: User):
     try:
-        connection = psycopg2.connect(
-            host=os.getenv("HOST"),
-            database=os.getenv("DATABASE"),
-            user="developuser",
-            password=os.getenv("PASSWORD"),
-            port=os.getenv("PORT"),
-        )
-        cursor = connection.cursor()
+        async with get_async_connection() as connection:
+            cursor = connection.cursor()
 
-        # Hash the password before storing it
-        hashed_password = user.password
+            # Hash the password before storing it
+            hashed_password = user.password
 
-        # Insert new user securely
-        cursor.execute(
-            "INSERT INTO manager_account_table (manager_account_name, manager_account_password, restaurant_id, manager_id) VALUES (%s, %s, %s, %s)",
-            (user.username, hashed_password, user.restaurant_id, user.manager_id) 
-        )
-        connection.commit()
+            # Insert new user securely
+            await cursor.execute(
+                "INSERT INTO manager_account_table (manager_account_name, manager_account_password, restaurant_id, manager_id) VALUES (%s, %s, %s, %s)",
+                (user.username, hashed_password, user.restaurant_id, user.manager_id) 
+            )
+            await connection.commit()
 
-        cursor.close()
-        connection.close()
+            await cursor.close()
 
         return {"message": "User registered successfully!"}
     except Exception as e:
@@ -98,27 +92,21 @@ async def register(user: User):
 @router.post("/login")
 async def login(user: Login): 
     try:
-        connection = psycopg2.connect(
-            host=os.getenv("HOST"),
-            database=os.getenv("DATABASE"),
-            user="developuser",
-            password=os.getenv("PASSWORD"),
-            port=os.getenv("PORT"),
-        )
-        cursor = connection.cursor()
+        async with get_async_connection() as connection:
+            cursor = connection.cursor()
 
-        # Validate user credentials
-        cursor.execute(
-            "SELECT manager_account_password, manager_id FROM manager_account_table WHERE manager_account_name = %s",
-            (user.username,)
-        )
-        result = cursor.fetchone()
+            # Validate user credentials
+            await cursor.execute(
+                "SELECT manager_account_password, manager_id FROM manager_account_table WHERE manager_account_name = %s",
+                (user.username,)
+            )
+            result = await cursor.fetchone()
 
-        if result and result[0] == user.password: 
-            access_token = create_access_token(data={"sub": user.username, "manager_id": result[1]}) 
-            return {"access_token": access_token, "token_type": "bearer"}
-        else:
-            raise HTTPException(status_code=401, detail="Invalid credentials")
+            if result and result[0] == user.password: 
+                access_token = create_access_token(data={"sub": user.username, "manager_id": result[1]}) 
+                return {"access_token": access_token, "token_type": "bearer"}
+            else:
+                raise HTTPException(status_code=401, detail="Invalid credentials")
     except Exception as e:
         raise HTTPException(status_code=400, detail="Login failed: " + str(e))
 
@@ -133,18 +121,26 @@ async def test_route():
     return {"message": "This is the dbop test route"}
 
 @router.get("/dbop/get_selected_results")
-async def get_selected_results(query: str, cursor=Depends(get_db)):
+async def get_selected_results(query: str, cursor=Depends(get_async_db)):
     try:
         
-        if not query.strip().lower().startswith("select"):
+        query = query.strip().rstrip(";").strip()
+        if not query.lower().startswith("select"):
             raise ValueError("Only SELECT queries are allowed.")
-
-        # Execute the query
-        cursor.execute(query)
-
-        # Fetch results and convert to a DataFrame
-        records = cursor.fetchall()
-        column_names = [desc[0] for desc in cursor.description]
+        # Without parameters the whole string runs, so `SELECT 1; DELETE ...` must not get through
+        if ";" in query:
+            raise ValueError("Only a single SELECT query is allowed.")
+
+        try:
+            # Read-only and always rolled back, whatever the SELECT calls
+            await cursor.execute("SET TRANSACTION READ ONLY")
+            await cursor.execute(query)
+
+            # Fetch results and convert to a DataFrame
+            records = await cursor.fetchall()
+            column_names = [desc[0] for desc in cursor.description]
+        finally:
+            await cursor.connection.rollback()
         df = pd.DataFrame(records, columns=column_names)
 
         return df.to_dict(orient="records")  # Converts DataFrame to JSON-compatible format
@@ -161,34 +157,27 @@ async def get_selected_results(query: str, cursor=Depends(get_db)):
 @router.get("/menus")
 async def get_menus(manager_id: int = Depends(get_current_user)):
     try:
-        connection = psycopg2.connect(
-            host=os.getenv("HOST"),
-            database=os.getenv("DATABASE"),
-            user="developuser",
-            password=os.getenv("PASSWORD"),
-            port=os.getenv("PORT"),
-        )
-        cursor = connection.cursor()
-
-        # Assume the table structure and logic is correct
-        cursor.execute(
-            """
-            SELECT DISTINCT category
-            FROM menu_table 
-            WHERE restaurant_id IN (
-                SELECT restaurant_id 
-                FROM manager_account_table 
-                WHERE manager_id = %s)
-            """,
-            (manager_id,)
-        )
+        async with get_async_connection() as connection:
+            cursor = connection.cursor()
+
+            # Assume the table structure and logic is correct
+            await cursor.execute(
+                """
+                SELECT DISTINCT category
+                FROM menu_table 
+                WHERE restaurant_id IN (
+                    SELECT restaurant_id 
+                    FROM manager_account_table 
+                    WHERE manager_id = %s)
+                """,
+                (manager_id,)
+            )
 
-        records = cursor.fetchall()
-        column_names = [desc[0] for desc in cursor.description]
-        df = pd.DataFrame(records, columns=column_names)
+            records = await cursor.fetchall()
+            column_names = [desc[0] for desc in cursor.description]
+            df = pd.DataFrame(records, columns=column_names)
 
-        cursor.close()
-        connection.close()
+            await cursor.close()
 
         return df.to_dict(orient="records")
     except Exception as error:
@@ -204,35 +193,28 @@ async def get_menus(
 ):
     try:
         # Establish database connection
-        connection = psycopg2.connect(
-            host=os.getenv("HOST"),
-            database=os.getenv("DATABASE"),
-            user="developuser",
-            password=os.getenv("PASSWORD"),
-            port=os.getenv("PORT"),
-        )
-        cursor = connection.cursor()
-
-        cursor.execute(
-            """
-            SELECT food_name, food_price, availability
-            FROM menu_table
-            WHERE restaurant_id IN (
-                SELECT restaurant_id 
-                FROM manager_account_table 
-                WHERE manager_id = %s
-            ) AND category = %s
-            """,
-            (manager_id, category)
-        )
+        async with get_async_connection() as connection:
+            cursor = connection.cursor()
+
+            await cursor.execute(
+                """
+                SELECT food_name, food_price, availability
+                FROM menu_table
+                WHERE restaurant_id IN (
+                    SELECT restaurant_id 
+                    FROM manager_account_table 
+                    WHERE manager_id = %s
+                ) AND category = %s
+                """,
+                (manager_id, category)
+            )
 
-        # Fetch and format results
-        records = cursor.fetchall()
-        column_names = [desc[0] for desc in cursor.description]
-        df = pd.DataFrame(records, columns=column_names)
+            # Fetch and format results
+            records = await cursor.fetchall()
+            column_names = [desc[0] for desc in cursor.description]
+            df = pd.DataFrame(records, columns=column_names)
         
-        cursor.close()
-        connection.close()
+            await cursor.close()
 
         return df.to_dict(orient="records")  # Return as list of dictionaries
     except Exception as error:
@@ -244,44 +226,37 @@ async def get_menus(
 async def get_order(manager_id: int = Depends(get_current_user)):
     try:
         # Establish database connection
-        connection = psycopg2.connect(
-            host=os.getenv("HOST"),
-            database=os.getenv("DATABASE"),
-            user="developuser",
-            password=os.getenv("PASSWORD"),
-            port=os.getenv("PORT"),
-        )
-        cursor = connection.cursor()
-
-        cursor.execute(
-            """
-            SELECT 
-                ot.*,
-                json_agg(json_build_object(
-                    'food_name', elem ->> 'food_name',
-                    'unit_price', (elem ->> 'unit_price')::numeric
-                )) AS fooditems
-            FROM order_table ot
-            LEFT JOIN LATERAL jsonb_array_elements(ot.fooditems) AS elem ON true
-            WHERE ot.restaurant_id IN (
-                SELECT restaurant_id 
-                FROM manager_account_table 
-                WHERE manager_id = %s
+        async with get_async_connection() as connection:
+            cursor = connection.cursor()
+
+            await cursor.execute(
+                """
+                SELECT 
+                    ot.*,
+                    json_agg(json_build_object(
+                        'food_name', elem ->> 'food_name',
+                        'unit_price', (elem ->> 'unit_price')::numeric
+                    )) AS fooditems
+                FROM order_table ot
+                LEFT JOIN LATERAL jsonb_array_elements(ot.fooditems) AS elem ON true
+                WHERE ot.restaurant_id IN (
+                    SELECT restaurant_id 
+                    FROM manager_account_table 
+                    WHERE manager_id = %s
+                )
+                AND ot.status IN ('new', 'prepare')
+                GROUP BY ot.order_number
+                ORDER BY ot.order_number;
+                """,
+                (manager_id,)
             )
-            AND ot.status IN ('new', 'prepare')
-            GROUP BY ot.order_number
-            ORDER BY ot.order_number;
-            """,
-            (manager_id,)
-        )
 
-        # Fetch and format results
-        records = cursor.fetchall()
-        column_names = [desc[0] for desc in cursor.description]
-        df = pd.DataFrame(records, columns=column_names)
+            # Fetch and format results
+            records = await cursor.fetchall()
+            column_names = [desc[0] for desc in cursor.description]
+            df = pd.DataFrame(records, columns=column_names)
         
-        cursor.close()
-        connection.close()
+            await cursor.close()
 
         return df.to_dict(orient="records") 
     except Exception as error:
@@ -293,44 +268,37 @@ async def get_order(manager_id: int = Depends(get_current_user)):
 async def get_order(manager_id: int = Depends(get_current_user)):
     try:
         # Establish database connection
-        connection = psycopg2.connect(
-            host=os.getenv("HOST"),
-            database=os.getenv("DATABASE"),
-            user="developuser",
-            password=os.getenv("PASSWORD"),
-            port=os.getenv("PORT"),
-        )
-        cursor = connection.cursor()
-
-        cursor.execute(
-            """
-            SELECT 
-                ot.*,
-                json_agg(json_build_object(
-                    'food_name', elem ->> 'food_name',
-                    'unit_price', (elem ->> 'unit_price')::numeric
-                )) AS fooditems
-            FROM order_table ot
-            LEFT JOIN LATERAL jsonb_array_elements(ot.fooditems) AS elem ON true
-            WHERE ot.restaurant_id IN (
-                SELECT restaurant_id 
-                FROM manager_account_table 
-                WHERE manager_id = %s
+        async with get_async_connection() as connection:
+            cursor = connection.cursor()
+
+            await cursor.execute(
+                """
+                SELECT 
+                    ot.*,
+                    json_agg(json_build_object(
+                        'food_name', elem ->> 'food_name',
+                        'unit_price', (elem ->> 'unit_price')::numeric
+                    )) AS fooditems
+                FROM order_table ot
+                LEFT JOIN LATERAL jsonb_array_elements(ot.fooditems) AS elem ON true
+                WHERE ot.restaurant_id IN (
+                    SELECT restaurant_id 
+                    FROM manager_account_table 
+                    WHERE manager_id = %s
+                )
+                AND ot.status IN ('complete', 'cancelled')
+                GROUP BY ot.order_number
+                ORDER BY ot.order_number;
+                """,
+                (manager_id,)
             )
-            AND ot.status IN ('complete', 'cancelled')
-            GROUP BY ot.order_number
-            ORDER BY ot.order_number;
-            """,
-            (manager_id,)
-        )
 
-        # Fetch and format results
-        records = cursor.fetchall()
-        column_names = [desc[0] for desc in cursor.description]
-        df = pd.DataFrame(records, columns=column_names)
+            # Fetch and format results
+            records = await cursor.fetchall()
+            column_names = [desc[0] for desc in cursor.description]
+            df = pd.DataFrame(records, columns=column_names)
         
-        cursor.close()
-        connection.close()
+            await cursor.close()
 
         return df.to_dict(orient="records")  # Return as list of dictionaries
     except Exception as error:
@@ -346,41 +314,34 @@ async def get_order(manager_id: int = Depends(get_current_user)):
 async def update_menu_availability(item: UpdateMenuAvailability, manager_id: int = Depends(get_current_user)):
     try:
         # Establish database connection
-        connection = psycopg2.connect(
-            host=os.getenv("HOST"),
-            database=os.getenv("DATABASE"),
-            user="developuser",
-            password=os.getenv("PASSWORD"),
-            port=os.getenv("PORT"),
-        )
-        cursor = connection.cursor()
-
-        # Combined SQL query to update availability based on category and check food name
-        cursor.execute(
-            """
-            UPDATE menu_table
-            SET availability = %s
-            WHERE category = %s AND restaurant_id IN (
-                SELECT restaurant_id 
-                FROM manager_account_table 
-                WHERE manager_id = %s
+        async with get_async_connection() as connection:
+            cursor = connection.cursor()
+
+            # Combined SQL query to update availability based on category and check food name
+            await cursor.execute(
+                """
+                UPDATE menu_table
+                SET availability = %s
+                WHERE category = %s AND restaurant_id IN (
+                    SELECT restaurant_id 
+                    FROM manager_account_table 
+                    WHERE manager_id = %s
+                )
+                AND food_name = %s
+                RETURNING food_name
+                """,
+                (item.availability, item.category, manager_id, item.food_name)  # Updated to include category and food_name
             )
-            AND food_name = %s
-            RETURNING food_name
-            """,
-            (item.availability, item.category, manager_id, item.food_name)  # Updated to include category and food_name
-        )
         
-        result = cursor.fetchone()
+            result = await cursor.fetchone()
 
-        if result is None:
-            raise HTTPException(status_code=404, detail="No food items found for this category or you do not have permission to modify them.")
+            if result is None:
+                raise HTTPException(status_code=404, detail="No food items found for this category or you do not have permission to modify them.")
 
-        actual_food_name = result[0]
+            actual_food_name = result[0]
         
-        connection.commit()
-        cursor.close()
-        connection.close()
+            await connection.commit()
+            await cursor.close()
 
         return {
             "message": "Menu availability updated successfully!", 
@@ -394,40 +355,33 @@ async def update_menu_availability(item: UpdateMenuAvailability, manager_id: int
 async def update_menu_by_category(item: UpdateMenuByCategory, manager_id: int = Depends(get_current_user)):
     try:
         # Establish database connection
-        connection = psycopg2.connect(
-            host=os.getenv("HOST"),
-            database=os.getenv("DATABASE"),
-            user="developuser",
-            password=os.getenv("PASSWORD"),
-            port=os.getenv("PORT"),
-        )
-        cursor = connection.cursor()
-
-        # SQL query to update availability for all items in the specified category
-        cursor.execute(
-            """
-            UPDATE menu_table
-            SET availability = %s
-            WHERE category = %s AND restaurant_id IN (
-                SELECT restaurant_id 
-                FROM manager_account_table 
-                WHERE manager_id = %s
+        async with get_async_connection() as connection:
+            cursor = connection.cursor()
+
+            # SQL query to update availability for all items in the specified category
+            await cursor.execute(
+                """
+                UPDATE menu_table
+                SET availability = %s
+                WHERE category = %s AND restaurant_id IN (
+                    SELECT restaurant_id 
+                    FROM manager_account_table 
+                    WHERE manager_id = %s
+                )
+                RETURNING food_name
+                """,
+                (item.availability, item.category, manager_id)  # Use the new parameters
             )
-            RETURNING food_name
-            """,
-            (item.availability, item.category, manager_id)  # Use the new parameters
-        )
         
-        results = cursor.fetchall()  # Fetch all updated food names
+            results = await cursor.fetchall()  # Fetch all updated food names
 
-        if not results:
-            raise HTTPException(status_code=404, detail="No food items found for this category or you do not have permission to modify them.")
+            if not results:
+                raise HTTPException(status_code=404, detail="No food items found for this category or you do not have permission to modify them.")
         
-        food_names = [result[0] for result in results] 
+            food_names = [result[0] for result in results] 
         
-        connection.commit()
-        cursor.close()
-        connection.close()
+            await connection.commit()
+            await cursor.close()
 
         return {
             "message": "Menu availability updated successfully!", 
@@ -441,34 +395,27 @@ async def update_menu_by_category(item: UpdateMenuByCategory, manager_id: int =
 async def update_order_status(order: UpdateOrderStatus, manager_id: int = Depends(get_current_user)):
     try:
         # Establish database connection
-        connection = psycopg2.connect(
-            host=os.getenv("HOST"),
-            database=os.getenv("DATABASE"),
-            user="developuser",
-            password=os.getenv("PASSWORD"),
-            port=os.getenv("PORT"),
-        )
-        cursor = connection.cursor()
-
-        # SQL query to update order status based on order_number
-        cursor.execute(
-            """
-            UPDATE public.order_table
-            SET status = %s
-            WHERE order_number = %s
-            RETURNING order_number, status
-            """,
-            (order.status, order.order_number)
-        )
+        async with get_async_connection() as connection:
+            cursor = connection.cursor()
+
+            # SQL query to update order status based on order_number
+            await cursor.execute(
+                """
+                UPDATE public.order_table
+                SET status = %s
+                WHERE order_number = %s
+                RETURNING order_number, status
+                """,
+                (order.status, order.order_number)
+            )
         
-        updated_order = cursor.fetchone()
+            updated_order = await cursor.fetchone()
 
-        if updated_order is None:
-            raise HTTPException(status_code=404, detail="Order not found or status could not be updated.")
+            if updated_order is None:
+                raise HTTPException(status_code=404, detail="Order not found or status could not be updated.")
         
-        connection.commit()
-        cursor.close()
-        connection.close()
+            await connection.commit()
+            await cursor.close()
 
         return {
             "message": "Order status updated successfully!",
@@ -492,49 +439,42 @@ async def get_restaurant_by_manager(manager_id: int = Depends(get_current_user))
     """
     try:
         # Establish database connection
-        connection = psycopg2.connect(
-            host=os.getenv("HOST"),
-            database=os.getenv("DATABASE"),
-            user="developuser",
-            password=os.getenv("PASSWORD"),
-            port=os.getenv("PORT"),
-        )
-        cursor = connection.cursor()
-
-        # Updated SQL query to fetch required restaurant details
-        cursor.execute(
-            """
-            SELECT 
-                restaurant_id, 
-                restaurant_name, 
-                ratings, 
-                restaurant_type, 
-                pricing_levels
-            FROM public.restaurant_table
-            WHERE restaurant_id IN (
-                SELECT restaurant_id 
-                FROM manager_account_table 
-                WHERE manager_id = %s
+        async with get_async_connection() as connection:
+            cursor = connection.cursor()
+
+            # Updated SQL query to fetch required restaurant details
+            await cursor.execute(
+                """
+                SELECT 
+                    restaurant_id, 
+                    restaurant_name, 
+                    ratings, 
+                    restaurant_type, 
+                    pricing_levels
+                FROM public.restaurant_table
+                WHERE restaurant_id IN (
+                    SELECT restaurant_id 
+                    FROM manager_account_table 
+                    WHERE manager_id = %s
+                )
+                """,
+                (manager_id,)
             )
-            """,
-            (manager_id,)
-        )
 
-        # Fetch restaurant details
-        record = cursor.fetchone()
+            # Fetch restaurant details
+            record = await cursor.fetchone()
 
-        if not record:
-            raise HTTPException(
-                status_code=404, 
-                detail="No restaurant found for the provided manager ID."
-            )
+            if not record:
+                raise HTTPException(
+                    status_code=404, 
+                    detail="No restaurant found for the provided manager ID."
+                )
 
-        # Map the record to a dictionary
-        column_names = [desc[0] for desc in cursor.description]
-        restaurant_details = dict(zip(column_names, record))
+            # Map the record to a dictionary
+            column_names = [desc[0] for desc in cursor.description]
+            restaurant_details = dict(zip(column_names, record))
 
-        cursor.close()
-        connection.close()
+            await cursor.close()
 
         return restaurant_details
 
@@ -549,33 +489,26 @@ async def get_restaurant_by_manager(manager_id: int = Depends(get_current_user))
 @router.get("/foodnames")
 async def get_food_names(manager_id: int = Depends(get_current_user)):
     try:
-        connection = psycopg2.connect(
-            host=os.getenv("HOST"),
-            database=os.getenv("DATABASE"),
-            user="developuser",
-            password=os.getenv("PASSWORD"),
-            port=os.getenv("PORT"),
-        )
-        cursor = connection.cursor()
-        cursor.execute(
-            """
-            SELECT food_name
-            FROM menu_table
-            WHERE restaurant_id IN (
-                SELECT restaurant_id 
-                FROM manager_account_table 
-                WHERE manager_id = %s
+        async with get_async_connection() as connection:
+            cursor = connection.cursor()
+            await cursor.execute(
+                """
+                SELECT food_name
+                FROM menu_table
+                WHERE restaurant_id IN (
+                    SELECT restaurant_id 
+                    FROM manager_account_table 
+                    WHERE manager_id = %s
+                )
+                """,
+                (manager_id,)
             )
-            """,
-            (manager_id,)
-        )
 
-        # Fetch all food names
-        records = cursor.fetchall()
-        food_names = [record[0] for record in records]
+            # Fetch all food names
+            records = await cursor.fetchall()
+            food_names = [record[0] for record in records]
 
-        cursor.close()
-        connection.close()
+            await cursor.close()
 
         return {"food_names": food_names}
     except Exception as error:
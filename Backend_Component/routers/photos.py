@@ -1,10 +1,16 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends
+from fastapi import APIRouter, BackgroundTasks, HTTPException, UploadFile, File, Form, Depends
 from fastapi.security import OAuth2PasswordBearer
 from dotenv import load_dotenv
 import psycopg2
 import os
 import logging
 from .auth import verify_token  # Ensure this is the correct path
+from utils.db_authenticate import get_async_connection
+from utils.query_log import track_route_queries
+from utils.upload_limit import BoundedUploadRoute
+from utils.photo_store import PHOTO_MAX_UPLOAD_BYTES, PhotoTooLarge, photo_version, read_photo, save_photo_stream
+from utils.photo_variants import CLEAR_FAILURES_SQL, RECORD_FAILURE_SQL, SAVE_VARIANTS_SQL, make_variants
+import asyncio
 import base64
 
 # Set up logging
@@ -14,8 +20,11 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# Photos are served by the customer-facing backend (GET /api/photos/{file_name})
+API_BASE_URL = os.getenv("API_BASE_URL")
+
 # Initialize the router
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(track_route_queries)], route_class=BoundedUploadRoute)
 
 # OAuth2 dependency for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
@@ -28,9 +37,68 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
         raise HTTPException(status_code=401, detail="Invalid user")
     return manager_id
 
+# Photo row (photo_id, restaurant_id, description, file_name, content_type, content_hash, photo_data)
+# as returned to the client, with the bytes base64-encoded in photo_data
+async def photo_record(record) -> dict:
+    column_names = ["photo_id", "restaurant_id", "description", "file_name", "content_type"]
+    result = dict(zip(column_names, record))
+    content_hash, photo_data = record[5], record[6]
+
+    # Rows not moved to the photo store yet still carry their bytes
+    if content_hash:
+        photo_data = await asyncio.to_thread(read_photo, content_hash)
+    result["photo_data"] = base64.b64encode(photo_data).decode("utf-8") if photo_data else None
+    return result
+
+def photo_url(file_name: str, content_hash: str = None, size: str = None) -> str:
+    params = []
+    if content_hash:
+        params.append(f"v={photo_version(content_hash)}")
+    if size:
+        params.append(f"size={size}")
+    return f"{API_BASE_URL}/api/photos/{file_name}" + ("?" + "&".join(params) if params else "")
+
+# Background task after an upload: thumbnail, card and full-size variants of the new bytes.
+# A failed build is recorded in photo_variant_failures and the photo keeps being served as
+# uploaded until scripts/backfill_photo_variants.py builds its variants.
+async def store_photo_variants(content_hash: str) -> None:
+    try:
+        async with get_async_connection() as connection:
+            cursor = connection.cursor()
+            await cursor.execute("SELECT 1 FROM photo_variants WHERE content_hash = %s LIMIT 1", (content_hash,))
+            already_built = await cursor.fetchone()
+            await cursor.close()
+        if already_built:
+            return
+
+        # No connection is held while the worker pool renders
+        rows = await make_variants(content_hash)
+
+        async with get_async_connection() as connection:
+            cursor = connection.cursor()
+            await cursor.executemany(SAVE_VARIANTS_SQL, rows)
+            await cursor.execute(CLEAR_FAILURES_SQL, ([content_hash],))
+            await connection.commit()
+            await cursor.close()
+        logger.info(f"Stored {len(rows)} variants of photo {content_hash}")
+    except Exception as e:
+        logger.error(f"Error building variants of photo {content_hash}: {str(e)}")
+        await record_variant_failure(content_hash, e)
+
+async def record_variant_failure(content_hash: str, error: Exception) -> None:
+    try:
+        async with get_async_connection() as connection:
+            cursor = connection.cursor()
+            await cursor.execute(RECORD_FAILURE_SQL, (content_hash, f"{type(error).__name__}: {error}"))
+            await connection.commit()
+            await cursor.close()
+    except Exception as e:
+        logger.error(f"Error recording the variant failure of photo {content_hash}: {str(e)}")
+
 # Endpoint for uploading photos
 @router.post("/restaurant/upload-photo")
 async def upload_photo(
+    background_tasks: BackgroundTasks,
     restaurant_id: int = Form(...),
     food_name: str = Form(...),  # Added food_name to ensure unique records
     description: str = Form(None),
@@ -40,56 +108,58 @@ async def upload_photo(
     try:
         logger.debug(f"Manager ID: {manager_id}, Restaurant ID: {restaurant_id}, File: {file.filename}")
 
-        file_content = await file.read()
-
-        connection = psycopg2.connect(
-            host="34.123.21.31",
-            database="quefoodhall",
-            user="developuser",
-            password="]&l381[czY:F@sV*",
-            port=5432,
-        )
-        cursor = connection.cursor()
-
-        # Check if the photo already exists
-        cursor.execute(
-            """
-            SELECT photo_id FROM restaurant_photos WHERE restaurant_id = %s AND food_name = %s;
-            """,
-            (restaurant_id, food_name)
-        )
-        existing_photo = cursor.fetchone()
-
-        if existing_photo:
-            # If photo exists, update it
-            cursor.execute(
-                """
-                UPDATE restaurant_photos
-                SET description = %s, photo_data = %s, file_name = %s, content_type = %s
-                WHERE restaurant_id = %s AND food_name = %s;
-                """,
-                (description, file_content, file.filename, file.content_type, restaurant_id, food_name)
-            )
-            logger.info(f"Updated photo for {food_name} in restaurant {restaurant_id}")
-            message = "Photo updated successfully!"
-        else:
-            # If no photo exists, insert a new one
-            cursor.execute(
+        # Streamed from the spooled upload to the photo store in chunks; the row only keeps the hash
+        try:
+            content_hash, size_bytes = await asyncio.to_thread(save_photo_stream, file.file, PHOTO_MAX_UPLOAD_BYTES)
+        except PhotoTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+        async with get_async_connection() as connection:
+            cursor = connection.cursor()
+
+            # Check if the photo already exists
+            await cursor.execute(
                 """
-                INSERT INTO restaurant_photos (restaurant_id, food_name, description, photo_data, file_name, content_type)
-                VALUES (%s, %s, %s, %s, %s, %s);
+                SELECT photo_id FROM restaurant_photos WHERE restaurant_id = %s AND food_name = %s;
                 """,
-                (restaurant_id, food_name, description, file_content, file.filename, file.content_type)
+                (restaurant_id, food_name)
             )
-            logger.info(f"Inserted new photo for {food_name} in restaurant {restaurant_id}")
-            message = "Photo uploaded successfully!"
-
-        connection.commit()
-        cursor.close()
-        connection.close()
-
+            existing_photo = await cursor.fetchone()
+
+            if existing_photo:
+                # If photo exists, update it; scripts/gc_photo_store.py removes the replaced file
+                await cursor.execute(
+                    """
+                    UPDATE restaurant_photos
+                    SET description = %s, photo_data = NULL, content_hash = %s, size_bytes = %s,
+                        file_name = %s, content_type = %s, upload_time = timezone('utc', now())
+                    WHERE restaurant_id = %s AND food_name = %s;
+                    """,
+                    (description, content_hash, size_bytes, file.filename, file.content_type, restaurant_id, food_name)
+                )
+                logger.info(f"Updated photo for {food_name} in restaurant {restaurant_id}")
+                message = "Photo updated successfully!"
+            else:
+                # If no photo exists, insert a new one
+                await cursor.execute(
+                    """
+                    INSERT INTO restaurant_photos
+                        (restaurant_id, food_name, description, content_hash, size_bytes, file_name, content_type, upload_time)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, timezone('utc', now()));
+                    """,
+                    (restaurant_id, food_name, description, content_hash, size_bytes, file.filename, file.content_type)
+                )
+                logger.info(f"Inserted new photo for {food_name} in restaurant {restaurant_id}")
+                message = "Photo uploaded successfully!"
+
+            await connection.commit()
+            await cursor.close()
+
+        background_tasks.add_task(store_photo_variants, content_hash)
         return {"message": message}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading photo: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to upload photo: {str(e)}")
@@ -100,42 +170,27 @@ async def upload_photo(
 async def get_photo(photo_id: int, manager_id: int = Depends(get_current_user)):
     try:
         # Connect to the database
-        connection = psycopg2.connect(
-            host="34.123.21.31",
-            database="quefoodhall",
-            user="developuser",
-            password="]&l381[czY:F@sV*",
-            port=5432,
-        )
-        cursor = connection.cursor()
-
-        # Fetch the photo record
-        cursor.execute(
-            """
-            SELECT photo_id, restaurant_id, description, file_name, content_type, photo_data
-            FROM restaurant_photos
-            WHERE photo_id = %s
-            """,
-            (photo_id,)
-        )
-        record = cursor.fetchone()
-
-        # Handle the case where the record is not found
-        if not record:
-            raise HTTPException(status_code=404, detail="Photo not found")
-
-        # Define column names
-        column_names = ["photo_id", "restaurant_id", "description", "file_name", "content_type", "photo_data"]
-
-        # Convert to a dictionary
-        result = dict(zip(column_names, record))
-
-        # Encode photo_data to base64
-        if result["photo_data"]:
-            result["photo_data"] = base64.b64encode(result["photo_data"]).decode("utf-8")
-
-        cursor.close()
-        connection.close()
+        async with get_async_connection() as connection:
+            cursor = connection.cursor()
+
+            # Fetch the photo record
+            await cursor.execute(
+                """
+                SELECT photo_id, restaurant_id, description, file_name, content_type, content_hash, photo_data
+                FROM restaurant_photos
+                WHERE photo_id = %s
+                """,
+                (photo_id,)
+            )
+            record = await cursor.fetchone()
+
+            # Handle the case where the record is not found
+            if not record:
+                raise HTTPException(status_code=404, detail="Photo not found")
+
+            result = await photo_record(record)
+
+            await cursor.close()
 
         return result
     except Exception as e:
@@ -148,94 +203,121 @@ async def get_photo(food_name: str, manager_id: int = Depends(get_current_user))
     """
     try:
         # Connect to the database
-        connection = psycopg2.connect(
-            host="34.123.21.31",
-            database="quefoodhall",
-            user="developuser",
-            password="]&l381[czY:F@sV*",
-            port=5432,
-        )
-        cursor = connection.cursor()
-
-        # Fetch the photo record based on restaurant_id and food_name
-        cursor.execute(
-            """
-            SELECT photo_id, restaurant_id, description, file_name, content_type, photo_data
-            FROM restaurant_photos
-            WHERE restaurant_id = %s
-              AND food_name = %s;
-            """,
-            (manager_id, food_name)
-        )
-        record = cursor.fetchone()
-
-        # Handle the case where the record is not found
-        if not record:
-            return {"message": "No photo found for this dish."}
-
-        # Define column names
-        column_names = ["photo_id", "restaurant_id", "description", "file_name", "content_type", "photo_data"]
-
-        # Convert to a dictionary
-        result = dict(zip(column_names, record))
-
-        # Encode photo_data to base64
-        if result["photo_data"]:
-            result["photo_data"] = base64.b64encode(result["photo_data"]).decode("utf-8")
-
-        cursor.close()
-        connection.close()
+        async with get_async_connection() as connection:
+            cursor = connection.cursor()
+
+            # Fetch the photo record based on restaurant_id and food_name
+            await cursor.execute(
+                """
+                SELECT photo_id, restaurant_id, description, file_name, content_type, content_hash, photo_data
+                FROM restaurant_photos
+                WHERE restaurant_id = %s
+                  AND food_name = %s;
+                """,
+                (manager_id, food_name)
+            )
+            record = await cursor.fetchone()
+
+            # Handle the case where the record is not found
+            if not record:
+                return {"message": "No photo found for this dish."}
+
+            result = await photo_record(record)
+
+            await cursor.close()
 
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch photo: {str(e)}")
 
+@router.get("/restaurant/photos")
+async def list_photos(manager_id: int = Depends(get_current_user)):
+    """
+    Metadata of every photo of the manager's restaurant: ids, sizes and URLs instead of the
+    base64 image, so the listing stays small. Fetch the bytes from `url` / `thumbnail_url`.
+    """
+    try:
+        async with get_async_connection() as connection:
+            cursor = connection.cursor()
+
+            # octet_length reads the stored length of legacy photo_data without fetching the bytes
+            await cursor.execute(
+                """
+                SELECT photo_id, restaurant_id, food_name, description, file_name, content_type,
+                       COALESCE(size_bytes, octet_length(photo_data)) AS size_bytes, content_hash, upload_time
+                FROM restaurant_photos
+                WHERE restaurant_id IN (
+                    SELECT restaurant_id
+                    FROM manager_account_table
+                    WHERE manager_id = %s
+                )
+                ORDER BY photo_id;
+                """,
+                (manager_id,)
+            )
+            records = await cursor.fetchall()
+            await cursor.close()
+
+        return [
+            {
+                "photo_id": photo_id,
+                "restaurant_id": restaurant_id,
+                "food_name": food_name,
+                "description": description,
+                "file_name": file_name,
+                "content_type": content_type,
+                "size_bytes": size_bytes,
+                "upload_time": upload_time,
+                "url": photo_url(file_name, content_hash),
+                "thumbnail_url": photo_url(file_name, content_hash, "thumb"),
+            }
+            for photo_id, restaurant_id, food_name, description, file_name, content_type, size_bytes, content_hash, upload_time
+            in records
+        ]
+    except Exception as e:
+        logger.error(f"Error listing photos: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to list photos: {str(e)}")
+
 @router.delete("/restaurant/photo/{photo_id}")
 async def delete_photo(
     photo_id: int, 
     manager_id: int = Depends(get_current_user)  # Validate manager
 ):
     """
-    DELETE endpoint for removing a photo record by photo_id.
+    DELETE endpoint for removing a photo record by photo_id. The stored file and its variants
+    are left for scripts/gc_photo_store.py, which removes them once no photo uses them.
     """
     try:
         # Log the request
         logger.debug(f"Manager ID: {manager_id}, Photo ID to delete: {photo_id}")
 
         # Connect to the PostgreSQL database
-        connection = psycopg2.connect(
-            host="34.123.21.31",
-            database="quefoodhall",
-            user="developuser",
-            password="]&l381[czY:F@sV*",
-            port=5432,
-        )
-        cursor = connection.cursor()
-
-        # Attempt to delete the photo
-        cursor.execute(
-            """
-            DELETE FROM restaurant_photos
-            WHERE photo_id = %s
-            """,
-            (photo_id,)
-        )
-
-        # Check if any row was affected (i.e., if the photo existed)
-        if cursor.rowcount == 0:
-            logger.warning(f"No photo found with ID {photo_id}.")
-            raise HTTPException(
-                status_code=404, 
-                detail=f"Photo with ID {photo_id} not found."
+        async with get_async_connection() as connection:
+            cursor = connection.cursor()
+
+            # Attempt to delete the photo
+            await cursor.execute(
+                """
+                DELETE FROM restaurant_photos
+                WHERE photo_id = %s
+                """,
+                (photo_id,)
             )
 
-        # Commit the deletion
-        connection.commit()
+            # Check if any row was affected (i.e., if the photo existed)
+            if cursor.rowcount == 0:
+                logger.warning(f"No photo found with ID {photo_id}.")
+                raise HTTPException(
+                    status_code=404, 
+                    detail=f"Photo with ID {photo_id} not found."
+                )
+
+            # Commit the deletion
+            await connection.commit()
 
-        # Log success and close the connection
-        logger.info(f"Photo with ID {photo_id} deleted successfully.")
-        cursor.close()
-        connection.close()
+            # Log success and close the connection
+            logger.info(f"Photo with ID {photo_id} deleted successfully.")
+            await cursor.close()
 
         return {"message": f"Photo with ID {photo_id} has been deleted successfully."}
     except HTTPException as http_exc:
@@ -0,0 +1,70 @@
+"""
+Build the thumb / card / full variants (utils/photo_variants.py) of every stored photo that
+has none yet, e.g. photos uploaded before variants existed or whose build failed on upload
+(recorded in photo_variant_failures). Safe to re-run: finished photos are skipped, and so
+are photos that already failed --max-attempts times; their last error is in
+photo_variant_failures. Photos still kept in photo_data are skipped too; move them to the
+photo store first (backend migration 0006_photo_store).
+
+Usage (from the Backend_Component/ directory):
+    python -m scripts.backfill_photo_variants --batch-size 20
+"""
+import argparse
+import asyncio
+import time
+
+from utils.db_authenticate import get_async_connection, get_async_pool
+from utils.photo_variants import CLEAR_FAILURES_SQL, RECORD_FAILURE_SQL, SAVE_VARIANTS_SQL, make_variants
+
+PENDING_SQL = """
+    SELECT DISTINCT p.content_hash
+    FROM restaurant_photos p
+    LEFT JOIN photo_variant_failures f ON f.content_hash = p.content_hash
+    WHERE p.content_hash IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM photo_variants v WHERE v.content_hash = p.content_hash)
+      AND COALESCE(f.attempts, 0) < %s
+"""
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=20, help="photos rendered concurrently")
+    parser.add_argument("--max-attempts", type=int, default=3, help="skip photos whose build failed this many times")
+    args = parser.parse_args()
+
+    async with get_async_connection() as connection:
+        cursor = await connection.execute(PENDING_SQL, (args.max_attempts,))
+        pending = [row[0] for row in await cursor.fetchall()]
+    print(f"{len(pending)} photos without variants")
+
+    done = failed = 0
+    start = time.perf_counter()
+    for offset in range(0, len(pending), args.batch_size):
+        batch = pending[offset:offset + args.batch_size]
+        results = await asyncio.gather(*(make_variants(content_hash) for content_hash in batch), return_exceptions=True)
+
+        rows, built, failures = [], [], []
+        for content_hash, result in zip(batch, results):
+            if isinstance(result, Exception):
+                failed += 1
+                failures.append((content_hash, f"{type(result).__name__}: {result}"))
+                print(f"  {content_hash}: {result}")
+            else:
+                rows.extend(result)
+                built.append(content_hash)
+                done += 1
+        async with get_async_connection() as connection:
+            async with connection.cursor() as cursor:
+                if rows:
+                    await cursor.executemany(SAVE_VARIANTS_SQL, rows)
+                    await cursor.execute(CLEAR_FAILURES_SQL, (built,))
+                if failures:
+                    await cursor.executemany(RECORD_FAILURE_SQL, failures)
+            await connection.commit()
+        print(f"{done + failed}/{len(pending)} photos ({failed} failed) in {time.perf_counter() - start:.1f} s")
+
+    await (await get_async_pool()).close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
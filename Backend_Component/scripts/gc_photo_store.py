@@ -0,0 +1,96 @@
+"""
+Remove photo store files no photo uses any more: originals whose restaurant_photos rows were
+deleted or replaced, and the variants of those originals (with their photo_variants rows).
+Uploads write the file before committing its row, so files younger than --min-age are
+kept; storing bytes that are already in the store refreshes the file's mtime for the same
+reason. Leftover temporary files from interrupted uploads are removed too.
+
+Usage (from the Backend_Component/ directory):
+    python -m scripts.gc_photo_store --dry-run
+    python -m scripts.gc_photo_store --min-age 3600
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from utils.db_authenticate import get_async_connection, get_async_pool
+from utils.photo_store import PHOTO_STORE_DIR, relative_path
+
+# Variants of originals no photo row points at any more (photo_variants.created_at is naive UTC)
+ORPHAN_VARIANTS_SQL = """
+    DELETE FROM photo_variants v
+    WHERE v.created_at < timezone('utc', now()) - make_interval(secs => %s)
+      AND NOT EXISTS (SELECT 1 FROM restaurant_photos p WHERE p.content_hash = v.content_hash)
+"""
+
+ORPHAN_FAILURES_SQL = """
+    DELETE FROM photo_variant_failures f
+    WHERE NOT EXISTS (SELECT 1 FROM restaurant_photos p WHERE p.content_hash = f.content_hash)
+"""
+
+REFERENCED_SQL = """
+    SELECT content_hash FROM restaurant_photos WHERE content_hash IS NOT NULL
+    UNION
+    SELECT variant_hash FROM photo_variants
+"""
+
+
+def is_store_file(store_dir: str, path: str) -> bool:
+    """True for files at their content hash's place in the store layout."""
+    try:
+        return os.path.relpath(path, store_dir) == relative_path(os.path.basename(path))
+    except ValueError:
+        return False
+
+
+def unreferenced_files(store_dir: str, referenced: set, min_age: float):
+    """Store files not in `referenced`, and temporary files, last modified over min_age seconds ago."""
+    cutoff = time.time() - min_age
+    for directory, _, names in os.walk(store_dir):
+        for name in names:
+            path = os.path.join(directory, name)
+            if not name.startswith(".tmp-") and (name in referenced or not is_store_file(store_dir, path)):
+                continue
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    yield path
+            except FileNotFoundError:
+                continue
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-age", type=float, default=3600, help="seconds a file must be unmodified before removal")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be removed without removing it")
+    args = parser.parse_args()
+
+    # The referenced set is read after the orphan rows are dropped, in the same transaction
+    async with get_async_connection() as connection:
+        async with connection.cursor() as cursor:
+            await cursor.execute(ORPHAN_VARIANTS_SQL, (args.min_age,))
+            orphan_rows = cursor.rowcount
+            await cursor.execute(ORPHAN_FAILURES_SQL)
+            await cursor.execute(REFERENCED_SQL)
+            referenced = {row[0] for row in await cursor.fetchall()}
+        if not args.dry_run:
+            await connection.commit()
+    print(f"{orphan_rows} variant rows of removed photos{' (dry run)' if args.dry_run else ''}")
+
+    removed = freed = 0
+    for path in await asyncio.to_thread(lambda: list(unreferenced_files(PHOTO_STORE_DIR, referenced, args.min_age))):
+        try:
+            size = os.path.getsize(path)
+            if not args.dry_run:
+                os.remove(path)
+        except FileNotFoundError:
+            continue
+        removed += 1
+        freed += size
+    print(f"{removed} unreferenced files, {freed / 1024 / 1024:.1f} MiB{' (dry run)' if args.dry_run else ''}")
+
+    await (await get_async_pool()).close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,8 +1,19 @@
+import asyncio
 import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager, suppress
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 import psycopg2
+from psycopg2 import pool as pg_pool
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+from psycopg import AsyncConnection, AsyncCursor
+from psycopg.pq import TransactionStatus
+from psycopg_pool import AsyncConnectionPool
+from utils.query_log import TimedAsyncCursor, TimedCursor, current_statement_timeout
 
 load_dotenv()
 
@@ -12,6 +23,21 @@ DB_NAME = os.getenv("DATABASE")
 DB_USER = os.getenv("USER")
 DB_PASSWORD = os.getenv("PASSWORD")
 
+# Connection pool settings
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_POOL_HEALTHCHECK_IDLE = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE", "30"))  # ping connections idle this long
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "600"))  # close idle connections beyond DB_POOL_MIN after this long
+
+CONNECT_KWARGS = {
+    "host": DB_HOST,
+    "dbname": DB_NAME,
+    "user": DB_USER if DB_USER == "developuser" else "developuser",
+    "password": DB_PASSWORD,
+    "port": DB_PORT,
+}
+
 print(f"Connecting to database with the following settings:")
 print(f"Host: {DB_HOST}")
 print(f"Database: {DB_NAME}")
@@ -19,26 +45,235 @@ print(f"User: {DB_USER}")
 print(f"Password: {DB_PASSWORD}")  # Be careful: this should not be printed in production
 
 
+class PooledConnection(psycopg2.extensions.connection):
+    """psycopg2 connection carrying its own pool bookkeeping."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.returned_at = None  # monotonic time of the last putconn
+        self.statement_timeout = 0  # last statement_timeout SET on it; 0 is the server default
+
+
+class PooledConnections:
+    """
+    Process-wide psycopg2 pool that blocks when exhausted and health-checks idle connections.
+    Up to maxconn connections stay open for reuse; idle ones beyond minconn are closed after
+    DB_POOL_MAX_IDLE seconds.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, timeout: float, **connect_kwargs):
+        self._minconn = minconn
+        self._maxconn = maxconn
+        self._timeout = timeout
+        self._connect_kwargs = connect_kwargs
+        # Borrowers wait on a semaphore instead of failing when every connection is in use
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._idle = deque()  # most recently returned on the right
+        self._closed = False
+        for _ in range(minconn):
+            self._idle.append(self._connect())
+
+    def _connect(self) -> PooledConnection:
+        return psycopg2.connect(connection_factory=PooledConnection, **self._connect_kwargs)
+
+    def _is_healthy(self, connection) -> bool:
+        if connection.closed:
+            return False
+        if connection.returned_at is None or time.monotonic() - connection.returned_at < DB_POOL_HEALTHCHECK_IDLE:
+            return True
+        try:
+            # Plain cursor: pool housekeeping is not a query of the route, nor logged as slow
+            with connection.cursor(cursor_factory=psycopg2.extensions.cursor) as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=self._timeout):
+            raise pg_pool.PoolError(f"No database connection available within {self._timeout}s")
+        try:
+            # A broken connection is discarded and replaced by a fresh one
+            for _ in range(self._maxconn + 1):
+                with self._lock:
+                    connection = self._idle.pop() if self._idle else None
+                if connection is None:
+                    connection = self._connect()
+                elif not self._is_healthy(connection):
+                    connection.close()
+                    continue
+                self._apply_statement_timeout(connection)
+                return connection
+            raise pg_pool.PoolError("Could not obtain a healthy database connection")
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _apply_statement_timeout(self, connection) -> None:
+        # Only re-issue SET when the route's timeout differs from what this connection already has
+        timeout = current_statement_timeout()
+        if connection.statement_timeout != timeout:
+            with connection.cursor(cursor_factory=psycopg2.extensions.cursor) as cursor:
+                cursor.execute(f"SET statement_timeout = {int(timeout)}")
+            connection.commit()
+            connection.statement_timeout = timeout
+
+    def _reset(self, connection) -> None:
+        # Never hand out a connection with a transaction left open
+        status = connection.info.transaction_status
+        if status == TRANSACTION_STATUS_UNKNOWN:
+            connection.close()
+        elif status != TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except psycopg2.Error:
+                connection.close()
+
+    def putconn(self, connection) -> None:
+        try:
+            if not connection.closed:
+                self._reset(connection)
+            if connection.closed:
+                return
+            connection.returned_at = time.monotonic()
+            expired = []
+            with self._lock:
+                if self._closed:
+                    expired.append(connection)
+                else:
+                    self._idle.append(connection)
+                    # The least recently used connections are the ones left idle longest
+                    while len(self._idle) > self._minconn and connection.returned_at - self._idle[0].returned_at > DB_POOL_MAX_IDLE:
+                        expired.append(self._idle.popleft())
+            for stale in expired:
+                stale.close()
+        finally:
+            self._slots.release()
+
+    def closeall(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+        for connection in idle:
+            connection.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> PooledConnections:
+    """Create the pool on first use so importing this module opens no connections."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PooledConnections(
+                    DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, cursor_factory=TimedCursor, **CONNECT_KWARGS
+                )
+    return _pool
+
+
+@contextmanager
+def get_connection():
+    """Borrow a pooled connection for the duration of the `with` block."""
+    pool = get_pool()
+    connection = pool.getconn()
+    try:
+        yield connection
+    finally:
+        pool.putconn(connection)
+
+
 def get_db():
-    if not DB_USER == "developuser":
-        connection = psycopg2.connect(
-            host=DB_HOST,
-            database=DB_NAME,
-            user="developuser",
-            password=DB_PASSWORD,
-            port=DB_PORT
-    )
-    else:
-        connection = psycopg2.connect(
-            host=DB_HOST,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            port=DB_PORT
-    )
-    cursor = connection.cursor()
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+
+# Non-blocking pool (psycopg 3) for the `async def` handlers, same sizing as the sync pool
+_async_pool = None
+_async_pool_lock = asyncio.Lock()
+
+
+class PooledAsyncConnection(AsyncConnection):
+    """psycopg 3 connection remembering the statement_timeout last SET on it (0 is the server default)."""
+
+    statement_timeout = 0
+
+
+async def _execute_untimed(connection, query: str) -> None:
+    # A plain cursor (connection.execute would use TimedAsyncCursor): pool housekeeping is not
+    # a query of the route, nor logged as slow
+    async with AsyncCursor(connection) as cursor:
+        await cursor.execute(query)
+
+
+async def _check_async_connection(connection) -> None:
+    """AsyncConnectionPool.check_connection, through a plain cursor."""
+    await connection.set_autocommit(True)
     try:
-        yield cursor
+        await _execute_untimed(connection, "")
     finally:
-        cursor.close()
-        connection.close()
\ No newline at end of file
+        with suppress(Exception):
+            await connection.set_autocommit(False)
+
+
+async def _apply_async_statement_timeout(connection) -> None:
+    timeout = current_statement_timeout()
+    if connection.statement_timeout != timeout:
+        await _execute_untimed(connection, f"SET statement_timeout = {int(timeout)}")
+        await connection.commit()
+        connection.statement_timeout = timeout
+
+
+async def get_async_pool() -> AsyncConnectionPool:
+    """Open the async pool on first use so importing this module opens no connections."""
+    global _async_pool
+    if _async_pool is None:
+        async with _async_pool_lock:
+            if _async_pool is None:
+                pool = AsyncConnectionPool(
+                    kwargs={**CONNECT_KWARGS, "cursor_factory": TimedAsyncCursor},
+                    min_size=DB_POOL_MIN,
+                    max_size=DB_POOL_MAX,
+                    timeout=DB_POOL_TIMEOUT,
+                    max_idle=DB_POOL_MAX_IDLE,
+                    check=_check_async_connection,
+                    connection_class=PooledAsyncConnection,
+                    open=False,
+                )
+                await pool.open()
+                _async_pool = pool
+    return _async_pool
+
+
+@asynccontextmanager
+async def get_async_connection():
+    """Borrow an async pooled connection for the duration of the `async with` block."""
+    pool = await get_async_pool()
+    connection = await pool.getconn()
+    try:
+        await _apply_async_statement_timeout(connection)
+        yield connection
+    finally:
+        # Handlers commit what they write: anything left uncommitted is rolled back, never committed
+        try:
+            if not connection.closed and connection.info.transaction_status != TransactionStatus.IDLE:
+                await connection.rollback()
+        finally:
+            await pool.putconn(connection)
+
+
+async def get_async_db():
+    async with get_async_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            yield cursor
+        finally:
+            await cursor.close()
@@ -0,0 +1,18 @@
+import os
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# The photo store's layout, hashing and writes have a single implementation, shared with the
+# customer API that serves the files: backend/app/api/photo_store.py
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
+
+from app.api.photo_store import (  # noqa: E402, F401
+    PHOTO_STORE_DIR, PHOTO_UPLOAD_CHUNK_BYTES, PhotoTooLarge, content_hash, photo_path, photo_version,
+    read_photo, relative_path, save_photo, save_photo_stream,
+)
+
+PHOTO_MAX_UPLOAD_BYTES = int(os.getenv("PHOTO_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
@@ -0,0 +1,89 @@
+import asyncio
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from PIL import Image, ImageOps
+from utils.photo_store import read_photo, save_photo
+
+load_dotenv()
+
+# Longest edge in pixels of each variant, largest first; smaller originals are never upscaled
+VARIANT_SIZES = {"full": 1280, "card": 480, "thumb": 160}
+
+PHOTO_WEBP_QUALITY = int(os.getenv("PHOTO_WEBP_QUALITY", "80"))
+PHOTO_JPEG_QUALITY = int(os.getenv("PHOTO_JPEG_QUALITY", "82"))
+PHOTO_VARIANT_WORKERS = int(os.getenv("PHOTO_VARIANT_WORKERS", "2"))
+
+# Row per (original, variant, format); variant bytes are stored in the photo store like originals
+SAVE_VARIANTS_SQL = """
+    INSERT INTO photo_variants (content_hash, variant, format, variant_hash, size_bytes, width, height)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (content_hash, variant, format) DO NOTHING
+"""
+
+# Failed builds are recorded so scripts/backfill_photo_variants.py can retry them
+RECORD_FAILURE_SQL = """
+    INSERT INTO photo_variant_failures (content_hash, last_error)
+    VALUES (%s, %s)
+    ON CONFLICT (content_hash) DO UPDATE
+    SET attempts = photo_variant_failures.attempts + 1, last_error = EXCLUDED.last_error,
+        failed_at = timezone('utc', now())
+"""
+CLEAR_FAILURES_SQL = "DELETE FROM photo_variant_failures WHERE content_hash = ANY(%s)"
+
+
+def encode(image: Image.Image, format: str) -> bytes:
+    buffer = io.BytesIO()
+    if format == "webp":
+        image.save(buffer, "WEBP", quality=PHOTO_WEBP_QUALITY, method=4)
+    else:
+        # JPEG has no alpha channel: flatten onto white
+        if image.mode == "RGBA":
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        image.save(buffer, "JPEG", quality=PHOTO_JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def render_variants(data: bytes) -> list:
+    """[(variant, format, encoded bytes, width, height)] for every size in WebP and JPEG."""
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    variants = []
+    for variant, edge in VARIANT_SIZES.items():
+        # Each size is resized from the previous (larger) one
+        image.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        for format in ("webp", "jpeg"):
+            variants.append((variant, format, encode(image, format), image.width, image.height))
+    return variants
+
+
+def build_variants(content_hash: str) -> list:
+    """Render and store the variants of a stored photo; runs in a worker process."""
+    rows = []
+    for variant, format, encoded, width, height in render_variants(read_photo(content_hash)):
+        variant_hash, size_bytes = save_photo(encoded)
+        rows.append((content_hash, variant, format, variant_hash, size_bytes, width, height))
+    return rows
+
+
+_pool = None
+
+
+def get_variant_pool() -> ProcessPoolExecutor:
+    """Resizing and encoding are CPU-bound, so they run in worker processes started on first use."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PHOTO_VARIANT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+async def make_variants(content_hash: str) -> list:
+    """SAVE_VARIANTS_SQL parameter rows for the photo's variants, built in the worker pool."""
+    return await asyncio.get_running_loop().run_in_executor(get_variant_pool(), build_variants, content_hash)
@@ -0,0 +1,130 @@
+import contextvars
+import json
+import logging
+import os
+import time
+from fastapi import Request
+import psycopg2.extensions
+from psycopg import AsyncCursor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def parse_route_settings(value: str) -> dict:
+    """Parse "<route path>=<int>;<route path>=<int>" into {route path: int}."""
+    settings = {}
+    for pair in value.split(";"):
+        if "=" in pair:
+            route, number = pair.rsplit("=", 1)
+            settings[route.strip()] = int(number)
+    return settings
+
+# Slow-query log and per-route limits. Route keys are path templates, e.g. "/menus/food"
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 disables the timeout
+DB_QUERY_BUDGET = int(os.getenv("DB_QUERY_BUDGET", "20"))  # statements per request before a warning
+DB_ROUTE_STATEMENT_TIMEOUTS = parse_route_settings(os.getenv("DB_ROUTE_STATEMENT_TIMEOUTS", ""))
+DB_ROUTE_QUERY_BUDGETS = parse_route_settings(os.getenv("DB_ROUTE_QUERY_BUDGETS", ""))
+
+slow_query_logger = logging.getLogger("quefood.slow_query")
+
+
+class RequestQueries:
+    """Statement count and time for one HTTP request, tagged with its route template."""
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.count = 0
+        self.total_ms = 0.0
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope.get("path")
+
+    @property
+    def budget(self) -> int:
+        return DB_ROUTE_QUERY_BUDGETS.get(self.route, DB_QUERY_BUDGET)
+
+
+_request_queries = contextvars.ContextVar("request_queries", default=None)
+
+
+def current_statement_timeout() -> int:
+    """Statement timeout (ms) for the route being served, 0 outside a request."""
+    queries = _request_queries.get()
+    if queries is None:
+        return 0
+    return DB_ROUTE_STATEMENT_TIMEOUTS.get(queries.route, DB_STATEMENT_TIMEOUT_MS)
+
+
+async def track_route_queries(request: Request):
+    """Router dependency: attribute statements to this route and log when its budget is exceeded."""
+    queries = RequestQueries(request.scope)
+    token = _request_queries.set(queries)
+    try:
+        yield
+    finally:
+        _request_queries.reset(token)
+    if queries.count > queries.budget:
+        slow_query_logger.warning(json.dumps({
+            "event": "query_budget_exceeded",
+            "route": queries.route,
+            "method": request.method,
+            "queries": queries.count,
+            "budget": queries.budget,
+            "total_ms": round(queries.total_ms, 2),
+        }))
+
+
+def record_query(query, duration: float) -> None:
+    duration_ms = duration * 1000
+    queries = _request_queries.get()
+    if queries is not None:
+        queries.count += 1
+        queries.total_ms += duration_ms
+    if duration_ms >= DB_SLOW_QUERY_MS:
+        statement = query if isinstance(query, str) else str(query)
+        slow_query_logger.warning(json.dumps({
+            "event": "slow_query",
+            "route": queries.route if queries else None,
+            "duration_ms": round(duration_ms, 2),
+            "statement": " ".join(statement.split())[:2000],
+        }))
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """psycopg2 cursor that records the duration of every statement."""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record_query(query, time.perf_counter() - start)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            record_query(query, time.perf_counter() - start)
+
+
+class TimedAsyncCursor(AsyncCursor):
+    """psycopg 3 async cursor that records the duration of every statement."""
+
+    async def execute(self, query, params=None, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().execute(query, params, **kwargs)
+        finally:
+            record_query(query, time.perf_counter() - start)
+
+    async def executemany(self, query, params_seq, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().executemany(query, params_seq, **kwargs)
+        finally:
+            record_query(query, time.perf_counter() - start)
@@ -0,0 +1,40 @@
+from fastapi import HTTPException, Request
+from fastapi.routing import APIRoute
+from utils.photo_store import PHOTO_MAX_UPLOAD_BYTES
+
+# Room for the multipart boundaries and the other form fields next to the photo
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+class BoundedUploadRoute(APIRoute):
+    """
+    Route that rejects request bodies over PHOTO_MAX_UPLOAD_BYTES (plus form overhead) with a
+    413 before the form is parsed: from Content-Length when sent, otherwise as soon as the
+    streamed body passes the limit.
+    """
+
+    max_body_bytes = PHOTO_MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD_BYTES
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        limit = self.max_body_bytes
+
+        async def bounded_handler(request: Request):
+            content_length = request.headers.get("content-length")
+            if content_length and content_length.isdigit() and int(content_length) > limit:
+                raise HTTPException(status_code=413, detail=f"Upload exceeds {PHOTO_MAX_UPLOAD_BYTES} bytes")
+
+            received = 0
+
+            async def receive():
+                nonlocal received
+                message = await request.receive()
+                if message["type"] == "http.request":
+                    received += len(message.get("body", b""))
+                    if received > limit:
+                        raise HTTPException(status_code=413, detail=f"Upload exceeds {PHOTO_MAX_UPLOAD_BYTES} bytes")
+                return message
+
+            return await handler(Request(request.scope, receive))
+
+        return bounded_handler
@@ -0,0 +1,158 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "backend"))
+
+# The customer API imports `app.*` relative to backend
+sys.path.insert(0, BACKEND_DIR)
+
+# app.api.database builds its connection URLs, and app.api.auth its token settings, at import time
+for name, value in {
+    "DB_USER": "postgres", "PASSWORD": "postgres", "HOST": "localhost", "PORT": "5432",
+    "API_BASE_URL": "http://testserver", "ACCESS_TOKEN_EXPIRE_MINUTES": "30", "SECRET_KEY": "test-secret",
+}.items():
+    os.environ.setdefault(name, value)
+
+# Database-backed tests run against a scratch database on the same server, created and
+# migrated from empty for each session and dropped afterwards; never the one in DATABASE
+TEST_DATABASE = os.getenv("TEST_DATABASE", "quefood_test")
+os.environ["DATABASE"] = TEST_DATABASE
+# Whatever the server's default, the app (and asyncpg) expect UTF-8 text
+CREATE_OPTIONS = "ENCODING 'UTF8' TEMPLATE template0"
+
+
+def connect(dbname):
+    import psycopg2
+
+    return psycopg2.connect(
+        host=os.environ["HOST"], port=os.environ["PORT"], user=os.environ["DB_USER"],
+        password=os.environ["PASSWORD"], dbname=dbname, connect_timeout=3,
+    )
+
+
+def server_connection():
+    """Autocommit connection to the server's `postgres` database."""
+    connection = connect("postgres")
+    connection.autocommit = True
+    return connection
+
+
+def migrate(database=TEST_DATABASE):
+    """`python -m app.migrate` against the scratch database, as deployments run it."""
+    return subprocess.run(
+        [sys.executable, "-m", "app.migrate"], cwd=BACKEND_DIR, env={**os.environ, "DATABASE": database},
+        capture_output=True, text=True, timeout=300,
+    )
+
+
+@pytest.fixture(scope="session")
+def migrated_database():
+    """Name of a freshly created database with every migration applied."""
+    import psycopg2
+
+    try:
+        server = server_connection()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL is not reachable: {e}")
+    with server.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            server.close()
+            pytest.skip("the pg_trgm extension is not available on this server")
+        cursor.execute(f'DROP DATABASE IF EXISTS "{TEST_DATABASE}" WITH (FORCE)')
+        cursor.execute(f'CREATE DATABASE "{TEST_DATABASE}" {CREATE_OPTIONS}')
+
+    result = migrate()
+    assert result.returncode == 0, result.stdout + result.stderr
+    yield TEST_DATABASE
+
+    from app.api.database import engine
+
+    engine.dispose()
+    with server.cursor() as cursor:
+        cursor.execute(f'DROP DATABASE IF EXISTS "{TEST_DATABASE}" WITH (FORCE)')
+    server.close()
+
+
+@pytest.fixture
+def db_connection(migrated_database):
+    """psycopg2 connection to the migrated database; commit what other connections must see."""
+    connection = connect(migrated_database)
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def run_migrations(migrated_database):
+    return migrate
+
+
+@pytest.fixture
+def empty_database(migrated_database):
+    """(name, connection) of an extra database with no schema at all, dropped afterwards."""
+    name = migrated_database + "_empty"
+    server = server_connection()
+    with server.cursor() as cursor:
+        cursor.execute(f'DROP DATABASE IF EXISTS "{name}"')
+        cursor.execute(f'CREATE DATABASE "{name}" {CREATE_OPTIONS}')
+    connection = connect(name)
+    yield name, connection
+    connection.close()
+    with server.cursor() as cursor:
+        cursor.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+    server.close()
+
+
+@pytest.fixture(scope="session")
+def replica_database(migrated_database):
+    """Name of a second database on the server, standing in for a read replica of the
+    migrated one (same schema, none of its rows; dropped afterwards)."""
+    name = migrated_database + "_replica"
+    server = server_connection()
+    with server.cursor() as cursor:
+        cursor.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+        cursor.execute(f'CREATE DATABASE "{name}" {CREATE_OPTIONS}')
+    result = migrate(name)
+    assert result.returncode == 0, result.stdout + result.stderr
+    yield name
+    with server.cursor() as cursor:
+        cursor.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+    server.close()
+
+
+@pytest.fixture(scope="session")
+def api_client(migrated_database):
+    """TestClient of the whole customer API on the migrated database. One client for the
+    session, so the async engine's connections stay on a single event loop."""
+    from fastapi.testclient import TestClient
+    from app.api.database import async_engine
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
+        client.portal.call(async_engine.dispose)
+
+
+def wait_until(condition, timeout=15):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+@pytest.fixture
+def notifications(migrated_database):
+    """The app's LISTEN/NOTIFY listener, connected to the migrated database, and a helper
+    that waits (up to 15 s) for a condition a notification should bring about."""
+    from app.api.notifications import listener
+
+    listener.start()
+    if not wait_until(lambda: listener.connected):
+        pytest.fail("the notification listener did not connect")
+    return wait_until
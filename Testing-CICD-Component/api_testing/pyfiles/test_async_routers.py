@@ -0,0 +1,128 @@
+import itertools
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from app.api.database import async_engine
+from app.api.menu_cache import menu_cache
+from app.api.routers import menu
+
+phone_numbers = itertools.count(4165550000)
+
+
+def execute(connection, sql, params=()):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone() if cursor.description else None
+    connection.commit()
+    return row
+
+
+@pytest.fixture
+def shop(db_connection):
+    """(phone_number, restaurant_id, {food_name: menu_id}) of a customer and a restaurant with an address and menu."""
+    phone_number = str(next(phone_numbers))
+    execute(
+        db_connection,
+        "INSERT INTO customer_account_table (phone_number, manager_account_name, manager_account_password) VALUES (%s, 'Cart Customer', 'x')",
+        (phone_number,),
+    )
+    restaurant_id = execute(db_connection, "INSERT INTO restaurant_table (restaurant_name) VALUES ('Async Kitchen') RETURNING restaurant_id")[0]
+    execute(
+        db_connection,
+        "INSERT INTO address_table (restaurant_id, state, city, street_address, postal_code, latitude, longitude)"
+        " VALUES (%s, 'ON', 'Toronto', '1 King St', 12345, 43.65, -79.38)",
+        (restaurant_id,),
+    )
+    menu_ids = {}
+    for food_name, price in (("Ramen", 12.5), ("Gyoza", 6)):
+        menu_ids[food_name] = execute(
+            db_connection,
+            "INSERT INTO menu_table (restaurant_id, category, food_name, food_price, availability) VALUES (%s, 'Mains', %s, %s, true) RETURNING menu_id",
+            (restaurant_id, food_name, price),
+        )[0]
+    return phone_number, restaurant_id, menu_ids
+
+
+def stored_cart(connection, order_number):
+    row = execute(connection, "SELECT status, items_count, subtotal, fooditems FROM order_table WHERE order_number = %s", (order_number,))
+    connection.rollback()
+    return row
+
+
+def add_item(api_client, order_number, menu_ids, food_name):
+    return api_client.put(
+        f"/api/cart/{order_number}/items", json={"menu_id": menu_ids[food_name], "food_name": food_name, "quantity": 1}
+    )
+
+
+# Test that cart writes on the AsyncSession path are committed
+
+def test_cart_writes_are_committed(api_client, db_connection, shop):
+    phone_number, restaurant_id, menu_ids = shop
+
+    response = api_client.post("/api/cart", json={"phone_number": phone_number, "restaurant_id": restaurant_id})
+    assert response.status_code == 200
+    order_number = response.json()["order_number"]
+    assert stored_cart(db_connection, order_number)[:2] == ("cart", 0)
+
+    assert add_item(api_client, order_number, menu_ids, "Ramen").status_code == 200
+    assert add_item(api_client, order_number, menu_ids, "Ramen").status_code == 200
+    assert add_item(api_client, order_number, menu_ids, "Gyoza").status_code == 200
+    status, items_count, subtotal, fooditems = stored_cart(db_connection, order_number)
+    assert (status, items_count, subtotal) == ("cart", 3, 31.0)
+    assert [(item["food_name"], item["quantity"]) for item in fooditems] == [("Ramen", 2), ("Gyoza", 1)]
+
+    # Asking again returns the same open cart
+    again = api_client.post("/api/cart", json={"phone_number": phone_number, "restaurant_id": restaurant_id})
+    assert again.json()["order_number"] == order_number
+
+    assert api_client.post(f"/api/cart/{order_number}/checkout").json()["status"] == "new"
+    assert stored_cart(db_connection, order_number)[0] == "new"
+
+
+# Test that a write failing in the database is rolled back, and its connection goes back clean
+
+@pytest.fixture
+def two_item_limit(db_connection):
+    execute(db_connection, "ALTER TABLE order_table ADD CONSTRAINT test_two_item_limit CHECK (items_count <= 2) NOT VALID")
+    yield
+    execute(db_connection, "ALTER TABLE order_table DROP CONSTRAINT test_two_item_limit")
+
+
+def test_failed_cart_write_is_rolled_back(api_client, db_connection, shop, two_item_limit):
+    phone_number, restaurant_id, menu_ids = shop
+    order_number = api_client.post("/api/cart", json={"phone_number": phone_number, "restaurant_id": restaurant_id}).json()["order_number"]
+    add_item(api_client, order_number, menu_ids, "Ramen")
+    add_item(api_client, order_number, menu_ids, "Gyoza")
+
+    with pytest.raises(IntegrityError):
+        add_item(api_client, order_number, menu_ids, "Gyoza")
+
+    status, items_count, _, fooditems = stored_cart(db_connection, order_number)
+    assert items_count == 2
+    assert [(item["food_name"], item["quantity"]) for item in fooditems] == [("Ramen", 1), ("Gyoza", 1)]
+
+    assert async_engine.pool.checkedout() == 0
+    for _ in range(async_engine.pool.size() + 1):
+        assert api_client.get(f"/api/cart/{order_number}").json()["items_count"] == 2
+
+
+# Test that a failed menu read (the menu routes only read) releases its connection cleanly
+
+def test_failed_menu_read_leaves_no_aborted_transaction(api_client, shop, monkeypatch):
+    _, restaurant_id, _ = shop
+    menu_cache.clear()
+    monkeypatch.setattr(menu, "menu_sql", text("SELECT 1 / 0"))
+    response = api_client.get(f"/api/menu/{restaurant_id}")
+    assert response.status_code == 500
+    assert "division by zero" in response.json()["detail"]
+
+    monkeypatch.undo()
+    assert async_engine.pool.checkedout() == 0
+    for _ in range(async_engine.pool.size() + 1):
+        menu_cache.clear()
+        response = api_client.get(f"/api/menu/{restaurant_id}")
+        assert response.status_code == 200
+        assert {entry["food_name"] for entry in response.json()} == {"Ramen", "Gyoza"}
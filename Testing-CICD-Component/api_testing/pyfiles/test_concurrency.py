@@ -0,0 +1,73 @@
+import asyncio
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+
+import httpx
+from fastapi import FastAPI
+
+# The merchant routers import `utils.*` relative to Backend_Component
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "..", "Backend_Component"))
+
+from routers import dbop  # noqa: E402
+
+QUERY_SECONDS = 0.2
+CONCURRENT_REQUESTS = 10
+
+app = FastAPI()
+app.include_router(dbop.router)
+app.dependency_overrides[dbop.get_current_user] = lambda: 1
+
+
+# Fake async connection whose queries take QUERY_SECONDS without blocking the event loop
+class SlowCursor:
+    description = [("order_number",), ("status",)]
+
+    async def execute(self, query, params=None):
+        await asyncio.sleep(QUERY_SECONDS)
+
+    async def fetchall(self):
+        return [("A0000001", "new")]
+
+    async def close(self):
+        pass
+
+
+class SlowConnection:
+    def cursor(self):
+        return SlowCursor()
+
+
+@asynccontextmanager
+async def slow_connection():
+    yield SlowConnection()
+
+
+async def fire_concurrent_requests(path):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(client.get(path) for _ in range(CONCURRENT_REQUESTS)))
+        return time.perf_counter() - start, responses
+
+
+# Test that slow kitchen-display queries overlap instead of serializing on the event loop
+
+def test_get_order_requests_run_concurrently():
+    with patch("routers.dbop.get_async_connection", slow_connection):
+        elapsed, responses = asyncio.run(fire_concurrent_requests("/order"))
+
+    assert all(response.status_code == 200 for response in responses)
+    assert responses[0].json() == [{"order_number": "A0000001", "status": "new"}]
+    # Serialized handlers would take CONCURRENT_REQUESTS * QUERY_SECONDS (2s)
+    assert elapsed < CONCURRENT_REQUESTS * QUERY_SECONDS / 2
+
+
+def test_get_menus_requests_run_concurrently():
+    with patch("routers.dbop.get_async_connection", slow_connection):
+        elapsed, responses = asyncio.run(fire_concurrent_requests("/menus"))
+
+    assert all(response.status_code == 200 for response in responses)
+    assert elapsed < CONCURRENT_REQUESTS * QUERY_SECONDS / 2
@@ -0,0 +1,193 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+from psycopg2 import pool as pg_pool
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+# The merchant utilities import `utils.*` relative to Backend_Component
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "..", "Backend_Component"))
+
+from utils import db_authenticate  # noqa: E402
+from utils.db_authenticate import PooledConnections  # noqa: E402
+
+
+@pytest.fixture
+def make_pool(migrated_database):
+    """Build PooledConnections over the migrated database; every pool is closed afterwards."""
+    pools = []
+
+    def make_pool(minconn=0, maxconn=2, timeout=5):
+        pool = PooledConnections(
+            minconn, maxconn, timeout, host=os.environ["HOST"], port=os.environ["PORT"],
+            user=os.environ["DB_USER"], password=os.environ["PASSWORD"], dbname=migrated_database,
+        )
+        pools.append(pool)
+        return pool
+
+    yield make_pool
+    for pool in pools:
+        pool.closeall()
+
+
+def backend_pid(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_backend_pid()")
+        pid = cursor.fetchone()[0]
+    connection.rollback()
+    return pid
+
+
+# Test that borrowers wait for a connection when the pool is exhausted, up to the timeout
+
+def test_exhausted_pool_times_out(make_pool):
+    pool = make_pool(maxconn=2, timeout=0.2)
+    first, second = pool.getconn(), pool.getconn()
+
+    start = time.monotonic()
+    with pytest.raises(pg_pool.PoolError):
+        pool.getconn()
+    assert time.monotonic() - start >= 0.2
+
+    # A failed wait leaves no slot taken
+    pool.putconn(first)
+    pool.putconn(second)
+    assert len({pool.getconn(), pool.getconn()}) == 2
+
+
+def test_exhausted_pool_blocks_until_a_connection_is_returned(make_pool):
+    pool = make_pool(maxconn=1)
+    connection = pool.getconn()
+    borrowed = []
+    waiter = threading.Thread(target=lambda: borrowed.append(pool.getconn()))
+    waiter.start()
+
+    time.sleep(0.2)
+    assert borrowed == []
+
+    pool.putconn(connection)
+    waiter.join(timeout=5)
+    assert borrowed == [connection]
+
+
+# Test that connections found broken are discarded and replaced
+
+def test_broken_idle_connection_is_replaced(make_pool, db_connection, monkeypatch):
+    monkeypatch.setattr(db_authenticate, "DB_POOL_HEALTHCHECK_IDLE", 0)
+    pool = make_pool(maxconn=1)
+    connection = pool.getconn()
+    pid = backend_pid(connection)
+    pool.putconn(connection)
+
+    with db_connection.cursor() as cursor:
+        cursor.execute("SELECT pg_terminate_backend(%s)", (pid,))
+    db_connection.commit()
+
+    replacement = pool.getconn()
+    assert replacement is not connection
+    assert connection.closed
+    assert backend_pid(replacement) != pid
+
+
+def test_every_broken_idle_connection_is_replaced(make_pool, db_connection, monkeypatch):
+    # The retries follow this pool's own size, not the module-wide DB_POOL_MAX
+    monkeypatch.setattr(db_authenticate, "DB_POOL_HEALTHCHECK_IDLE", 0)
+    monkeypatch.setattr(db_authenticate, "DB_POOL_MAX", 1)
+    pool = make_pool(maxconn=3)
+    connections = [pool.getconn() for _ in range(3)]
+    pids = [backend_pid(connection) for connection in connections]
+    for connection in connections:
+        pool.putconn(connection)
+
+    with db_connection.cursor() as cursor:
+        cursor.execute("SELECT pg_terminate_backend(pid) FROM unnest(%s) AS pid", (pids,))
+    db_connection.commit()
+
+    replacement = pool.getconn()
+    assert all(connection.closed for connection in connections)
+    assert backend_pid(replacement) not in pids
+
+
+def test_recently_used_connection_is_not_pinged(make_pool, monkeypatch):
+    monkeypatch.setattr(db_authenticate, "DB_POOL_HEALTHCHECK_IDLE", 3600)
+    pool = make_pool(maxconn=1)
+    connection = pool.getconn()
+    pool.putconn(connection)
+
+    def ping(*args, **kwargs):
+        raise AssertionError("pinged a connection idle for less than DB_POOL_HEALTHCHECK_IDLE")
+
+    monkeypatch.setattr(connection, "cursor", ping)
+    monkeypatch.setattr(pool, "_apply_statement_timeout", lambda connection: None)
+    assert pool.getconn() is connection
+
+
+# Test that a connection is returned to the pool with no transaction left open
+
+def test_putconn_rolls_back_open_transactions(make_pool):
+    pool = make_pool(maxconn=1)
+    connection = pool.getconn()
+    with connection.cursor() as cursor:
+        cursor.execute("SET application_name = 'left open'")
+    pool.putconn(connection)
+
+    assert connection.info.transaction_status == TRANSACTION_STATUS_IDLE
+    with connection.cursor() as cursor:
+        cursor.execute("SHOW application_name")
+        assert cursor.fetchone()[0] != "left open"
+    connection.rollback()
+
+
+def test_putconn_recovers_failed_transactions(make_pool):
+    pool = make_pool(maxconn=1)
+    connection = pool.getconn()
+    with pytest.raises(Exception):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT * FROM no_such_table")
+    pool.putconn(connection)
+
+    assert pool.getconn() is connection
+    assert backend_pid(connection)
+
+
+# Test that idle connections beyond minconn are closed after DB_POOL_MAX_IDLE
+
+def test_idle_connections_beyond_minconn_expire(make_pool, monkeypatch):
+    monkeypatch.setattr(db_authenticate, "DB_POOL_MAX_IDLE", 0.2)
+    pool = make_pool(minconn=1, maxconn=3)
+    oldest, older, newest = pool.getconn(), pool.getconn(), pool.getconn()
+
+    pool.putconn(oldest)
+    time.sleep(0.3)
+    pool.putconn(older)
+    pool.putconn(newest)
+
+    assert oldest.closed
+    assert list(pool._idle) == [older, newest]
+
+    # Never below minconn, however long they have been idle
+    pool.getconn(), pool.getconn()
+    monkeypatch.setattr(db_authenticate, "DB_POOL_MAX_IDLE", 0)
+    pool.putconn(older)
+    time.sleep(0.05)
+    pool.putconn(newest)
+    assert list(pool._idle) == [newest]
+    assert older.closed and not newest.closed
+
+
+# Test that closeall closes idle connections, and borrowed ones as they come back
+
+def test_closeall(make_pool):
+    pool = make_pool(minconn=1, maxconn=2)
+    idle, borrowed = pool.getconn(), pool.getconn()
+    pool.putconn(idle)
+
+    pool.closeall()
+    assert idle.closed
+    assert not borrowed.closed
+
+    pool.putconn(borrowed)
+    assert borrowed.closed
+    assert len(pool._idle) == 0
@@ -0,0 +1,239 @@
+import math
+import random
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import geo
+from app.api.database import get_read_db
+from app.api.geo import GEO_BATCH_MAX_POINTS, GEO_MAX_RADIUS_KM, RestaurantGrid, haversine
+from app.api.routers import restaurant
+
+
+def random_rows(count, seed=7):
+    generator = random.Random(seed)
+    return [
+        (restaurant_id, generator.uniform(-90, 90), generator.uniform(-180, 180), "cafe", "$", 4.0)
+        for restaurant_id in range(1, count + 1)
+    ]
+
+
+def brute_force(rows, latitude, longitude, radius_km, limit):
+    """Reference result: every row measured with the scalar haversine, nearest first."""
+    matches = sorted(
+        (haversine(latitude, longitude, row_latitude, row_longitude), restaurant_id)
+        for restaurant_id, row_latitude, row_longitude, *_ in rows
+    )
+    return [restaurant_id for distance, restaurant_id in matches if distance < radius_km][:limit]
+
+
+def grid_ids(grid, latitude, longitude, radius_km, limit):
+    return [restaurant_id for _, restaurant_id in grid.nearest(latitude, longitude, radius_km, limit)]
+
+
+# Test that the grid returns exactly what a scan of every restaurant returns
+
+@pytest.mark.parametrize("latitude, longitude, radius_km", [
+    (40.7, -74.0, 500),
+    (-33.9, 151.2, 2000),
+    (0.0, 0.0, 50),
+    # Across the antimeridian, from either side
+    (10.0, 179.95, 800),
+    (-10.0, -179.95, 800),
+    # Boxes reaching a pole, where a degree of longitude shrinks to nothing
+    (89.9, 45.0, 600),
+    (-89.95, -120.0, 600),
+    # Larger than half the globe: every cell is a candidate
+    (25.0, 10.0, 15000),
+])
+def test_grid_matches_brute_force(latitude, longitude, radius_km):
+    rows = random_rows(3000)
+    grid = RestaurantGrid().build(rows)
+
+    assert grid_ids(grid, latitude, longitude, radius_km, 3000) == brute_force(rows, latitude, longitude, radius_km, 3000)
+
+
+def test_antimeridian_neighbours_are_found():
+    rows = [(1, 0.0, 179.99, None, None, None), (2, 0.0, -179.99, None, None, None), (3, 0.0, 170.0, None, None, None)]
+    grid = RestaurantGrid().build(rows)
+
+    assert grid_ids(grid, 0.0, 179.99, 5, 10) == [1, 2]
+    assert grid_ids(grid, 0.0, -179.99, 5, 10) == [2, 1]
+
+
+def test_large_box_uses_the_vectorized_scan():
+    rows = random_rows(200)
+    grid = RestaurantGrid().build(rows)
+
+    # Far more cells in the box than occupied cells: resolved without a per-cell loop
+    grid.cells = {}
+    assert sorted(grid._candidates(0.0, 0.0, 15000).tolist()) == list(range(200))
+
+
+def city_rows():
+    """Restaurants scattered around one city, with a few sharing a location to force distance ties."""
+    generator = random.Random(11)
+    rows = [
+        (restaurant_id, 43.65 + generator.uniform(-0.2, 0.2), -79.38 + generator.uniform(-0.2, 0.2),
+         "cafe" if restaurant_id % 3 else "bar", "$$" if restaurant_id % 2 else "$", restaurant_id % 5)
+        for restaurant_id in range(1, 201)
+    ]
+    rows += [(restaurant_id, 43.66, -79.39, "cafe", "$", 3) for restaurant_id in range(201, 206)]
+    return rows
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Restaurant routes over an in-memory grid; details are just the ids, in order."""
+    grid = RestaurantGrid().build(city_rows())
+    monkeypatch.setattr(restaurant.restaurant_locations, "grid", lambda db: grid)
+    monkeypatch.setattr(restaurant, "restaurant_details", lambda db, matches: [
+        {"restaurant_id": restaurant_id, "distance_km": round(distance, 2)} for distance, restaurant_id in matches
+    ])
+
+    app = FastAPI()
+    app.include_router(restaurant.router, prefix="/api/restaurant")
+    app.dependency_overrides[get_read_db] = lambda: None
+    return TestClient(app)
+
+
+# Test that GET /api/restaurant/ keeps accepting any radius, while /nearest is capped
+
+def test_nearby_radius_is_not_capped(client):
+    for radius in (GEO_MAX_RADIUS_KM + 1, 20000):
+        response = client.get("/api/restaurant/", params={"latitude": 43.66, "longitude": -79.39, "radius": radius})
+        assert response.status_code == 200
+        assert len(response.json()) == 10
+    response = client.get("/api/restaurant/nearest", params={"latitude": 43.66, "longitude": -79.39, "radius": 20000})
+    assert response.status_code == 422
+
+
+# Test that following next_cursor walks every match exactly once, in distance order
+
+def walk_pages(client, **params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        response = client.get("/api/restaurant/nearest", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        body = response.json()
+        ids += [entry["restaurant_id"] for entry in body["restaurants"]]
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids, pages
+
+
+def test_nearest_cursor_pages_through_all_matches(client):
+    rows = city_rows()
+    ids, pages = walk_pages(client, latitude=43.66, longitude=-79.39, radius=10, limit=7)
+
+    expected = brute_force(rows, 43.66, -79.39, 10, len(rows))
+    assert ids == expected
+    assert pages == math.ceil(len(expected) / 7)
+
+
+def test_nearest_cursor_keeps_filters(client):
+    rows = [row for row in city_rows() if row[3] == "bar" and row[5] >= 2]
+    ids, _ = walk_pages(client, latitude=43.66, longitude=-79.39, radius=10, limit=4, restaurant_type="bar", min_rating=2)
+
+    assert ids == brute_force(rows, 43.66, -79.39, 10, len(rows))
+
+
+def test_nearest_rejects_invalid_cursor(client):
+    response = client.get("/api/restaurant/nearest", params={"latitude": 43.66, "longitude": -79.39, "cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+# Test that /batch ranks every point like /nearest and validates its input
+
+def test_batch_matches_nearest_per_point(client):
+    points = [
+        {"latitude": 43.66, "longitude": -79.39, "radius": 5},
+        {"latitude": 43.60, "longitude": -79.50, "radius": 2},
+        {"latitude": 0.0, "longitude": 0.0, "radius": 10},
+    ]
+    response = client.post("/api/restaurant/batch", json={"points": points})
+    assert response.status_code == 200
+
+    for point, result in zip(points, response.json()):
+        expected = brute_force(city_rows(), point["latitude"], point["longitude"], point["radius"], 10)
+        assert [entry["restaurant_id"] for entry in result["restaurants"]] == expected
+    assert response.json()[2]["restaurants"] == []
+
+
+def test_nearest_many_matches_nearest_across_chunks(monkeypatch):
+    # Small chunks, so points are split over several vectorized passes
+    monkeypatch.setattr(geo, "GEO_BATCH_CHUNK_ELEMENTS", 50)
+    grid = RestaurantGrid().build(random_rows(3000))
+    generator = random.Random(3)
+    points = [(generator.uniform(-90, 90), generator.uniform(-180, 180), generator.uniform(100, 1500)) for _ in range(40)]
+    points.append((0.0, 179.9, 500))
+
+    assert grid.nearest_many(points, limit=10) == [grid.nearest(*point, limit=10) for point in points]
+
+
+@pytest.mark.parametrize("points, status_code", [
+    ([], 422),
+    ([{"latitude": 91, "longitude": 0, "radius": 1}], 422),
+    ([{"latitude": 0, "longitude": 181, "radius": 1}], 422),
+    ([{"latitude": 0, "longitude": 0, "radius": 0}], 422),
+    ([{"latitude": 0, "longitude": 0, "radius": GEO_MAX_RADIUS_KM + 1}], 400),
+    ([{"latitude": 0, "longitude": 0, "radius": 1}] * (GEO_BATCH_MAX_POINTS + 1), 400),
+])
+def test_batch_rejects_invalid_points(client, points, status_code):
+    response = client.post("/api/restaurant/batch", json={"points": points})
+    assert response.status_code == status_code
+
+
+# Test that a location change reported by Postgres drops the grid and the cached results
+
+class FakeDb:
+    def __init__(self, rows):
+        self.rows = rows
+        self.reads = 0
+
+    def execute(self, statement):
+        self.reads += 1
+        return self
+
+    def fetchall(self):
+        return self.rows
+
+
+def id_details(db, matches):
+    return [{"restaurant_id": restaurant_id} for _, restaurant_id in matches]
+
+
+@pytest.fixture
+def location_index(monkeypatch):
+    monkeypatch.setattr(geo.listener, "start", lambda: None)
+    geo.restaurant_locations.invalidate()
+    geo.nearby_results.clear()
+    yield geo.restaurant_locations
+    geo.restaurant_locations.invalidate()
+    geo.nearby_results.clear()
+
+
+def test_location_notification_invalidates_grid_and_results(location_index):
+    db = FakeDb(city_rows())
+    first = geo.nearby_results.nearby(db, 43.66, -79.39, 5, id_details)
+    assert geo.nearby_results.nearby(db, 43.66, -79.39, 5, id_details) == first
+    assert db.reads == 1
+
+    for callback in geo.listener._handlers[geo.LOCATION_CHANGED_CHANNEL]:
+        callback("address_table")
+    assert geo.nearby_results.snapshot()["entries"] == 0
+
+    db.rows = [row for row in db.rows if row[0] != first[0]["restaurant_id"]]
+    second = geo.nearby_results.nearby(db, 43.66, -79.39, 5, id_details)
+    assert db.reads == 2
+    assert first[0]["restaurant_id"] not in [entry["restaurant_id"] for entry in second]
+
+
+def test_results_are_stored_under_the_rebuilt_grid_version(location_index):
+    db = FakeDb(city_rows())
+    geo.nearby_results.nearby(db, 43.66, -79.39, 5, id_details)
+
+    (version, _, _), = geo.nearby_results._entries.values()
+    assert version == location_index.version
@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from app.api.routers import internal
+
+TOKEN = "internal-test-token"
+ENDPOINTS = ["/internal/pool", "/internal/cache"]
+
+
+@pytest.fixture
+def token(monkeypatch):
+    monkeypatch.setattr(internal, "INTERNAL_API_TOKEN", TOKEN)
+    return {"X-Internal-Token": TOKEN}
+
+
+# Test that the internal endpoints are only served with the configured token
+
+@pytest.mark.parametrize("path", ENDPOINTS)
+def test_internal_endpoints_are_disabled_without_a_token(api_client, monkeypatch, path):
+    monkeypatch.setattr(internal, "INTERNAL_API_TOKEN", None)
+    assert api_client.get(path).status_code == 404
+    assert api_client.get(path, headers={"X-Internal-Token": ""}).status_code == 404
+
+    monkeypatch.setattr(internal, "INTERNAL_API_TOKEN", "")
+    assert api_client.get(path, headers={"X-Internal-Token": ""}).status_code == 404
+
+
+@pytest.mark.parametrize("path", ENDPOINTS)
+def test_internal_endpoints_require_the_token(api_client, token, path):
+    assert api_client.get(path).status_code == 403
+    assert api_client.get(path, headers={"X-Internal-Token": "wrong"}).status_code == 403
+    assert api_client.get(path, headers={"X-Internal-Token": TOKEN.upper()}).status_code == 403
+    assert api_client.get(path, headers=token).status_code == 200
+
+
+# Test the shape of the pool and cache reports
+
+def test_pool_report(api_client, token):
+    # At least one checkout to report on
+    assert api_client.get("/api/restaurant/", params={"latitude": 0, "longitude": 0, "radius": 1}).status_code == 200
+
+    report = api_client.get("/internal/pool", headers=token).json()
+    assert report["pid"] == os.getpid()
+    assert {"primary", "primary_async"} <= set(report["pools"])
+
+    primary = report["pools"]["primary"]
+    assert {"pool_size", "checked_out", "idle", "overflow", "max_overflow", "timeouts"} <= set(primary)
+    assert all(isinstance(primary[key], int) for key in ("pool_size", "checked_out", "idle", "overflow", "timeouts"))
+
+    wait_seconds = primary["wait_seconds"]
+    assert wait_seconds["count"] >= 1
+    assert list(wait_seconds["buckets"])[-1] == "+Inf"
+    assert wait_seconds["buckets"]["+Inf"] == wait_seconds["count"]
+    counts = list(wait_seconds["buckets"].values())
+    assert counts == sorted(counts)
+
+
+def test_cache_report(api_client, token):
+    report = api_client.get("/internal/cache", headers=token).json()
+    assert report["pid"] == os.getpid()
+
+    caches = report["caches"]
+    assert {"menu", "nearby_restaurants", "photo_bytes", "photo_metadata"} <= set(caches)
+    for stats in caches.values():
+        assert {"hits", "misses", "hit_ratio", "entries"} <= set(stats)
+        lookups = stats["hits"] + stats["misses"]
+        assert stats["hit_ratio"] == (round(stats["hits"] / lookups, 4) if lookups else None)
+    assert caches["photo_bytes"]["resident_bytes"] <= caches["photo_bytes"]["budget_bytes"]
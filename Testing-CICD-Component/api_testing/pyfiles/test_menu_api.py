@@ -0,0 +1,363 @@
+import pytest
+
+from app.api.menu_cache import menu_cache
+from app.api.routers.menu import API_BASE_URL
+
+
+def add_restaurant(connection, name="Test Kitchen", items=()):
+    """Insert a restaurant and its (food_name, category, price) menu items; returns its id."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO restaurant_table (restaurant_name, restaurant_type, pricing_levels, ratings)"
+            " VALUES (%s, 'cafe', '$', 4) RETURNING restaurant_id",
+            (name,),
+        )
+        restaurant_id = cursor.fetchone()[0]
+        for food_name, category, price in items:
+            cursor.execute(
+                "INSERT INTO menu_table (restaurant_id, category, food_name, food_description, food_price, availability)"
+                " VALUES (%s, %s, %s, NULL, %s, true)",
+                (restaurant_id, category, food_name, price),
+            )
+    connection.commit()
+    return restaurant_id
+
+
+def execute(connection, sql, params=()):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+    connection.commit()
+
+
+def prices(response):
+    return {entry["food_name"]: entry["food_price"] for entry in response.json()}
+
+
+@pytest.fixture
+def restaurant_id(db_connection):
+    return add_restaurant(db_connection, items=[("Ramen", "Noodles", 12.5), ("Gyoza", "Sides", 6), ("Udon", "Noodles", 11)])
+
+
+# Test that menus are served from the cache until Postgres reports a change
+
+def test_menu_is_cached(api_client, notifications, restaurant_id):
+    first = api_client.get(f"/api/menu/{restaurant_id}")
+    assert first.status_code == 200
+    hits = menu_cache.counters.snapshot()["hits"]
+
+    second = api_client.get(f"/api/menu/{restaurant_id}")
+    assert second.json() == first.json()
+    assert menu_cache.counters.snapshot()["hits"] == hits + 1
+
+
+def test_menu_edit_invalidates_cache(api_client, notifications, db_connection, restaurant_id):
+    assert prices(api_client.get(f"/api/menu/{restaurant_id}"))["Ramen"] == 12.5
+    assert prices(api_client.get(f"/api/menu/{restaurant_id}", params={"category": "noodles"})) == {"Ramen": 12.5, "Udon": 11}
+    assert menu_cache.get(restaurant_id, None) is not None
+
+    execute(db_connection, "UPDATE menu_table SET food_price = 13 WHERE restaurant_id = %s AND food_name = 'Ramen'", (restaurant_id,))
+
+    assert notifications(lambda: menu_cache.get(restaurant_id, None) is None)
+    assert menu_cache.get(restaurant_id, "noodles") is None
+    assert prices(api_client.get(f"/api/menu/{restaurant_id}"))["Ramen"] == 13
+    assert prices(api_client.get(f"/api/menu/{restaurant_id}", params={"category": "noodles"})) == {"Ramen": 13, "Udon": 11}
+
+
+def test_photo_change_invalidates_cache(api_client, notifications, db_connection, restaurant_id):
+    assert {entry["image_url"] for entry in api_client.get(f"/api/menu/{restaurant_id}").json()} == {None}
+
+    execute(
+        db_connection,
+        "INSERT INTO restaurant_photos (restaurant_id, food_name, file_name, content_type) VALUES (%s, 'Gyoza', 'gyoza.jpg', 'image/jpeg')",
+        (restaurant_id,),
+    )
+
+    assert notifications(lambda: menu_cache.get(restaurant_id, None) is None)
+    gyoza = [entry for entry in api_client.get(f"/api/menu/{restaurant_id}").json() if entry["food_name"] == "Gyoza"]
+    assert [entry["image_url"] for entry in gyoza] == [f"{API_BASE_URL}/api/photos/gyoza.jpg"]
+
+
+def test_other_restaurants_stay_cached(api_client, notifications, db_connection, restaurant_id):
+    other_id = add_restaurant(db_connection, "Other Kitchen", [("Soup", "Soups", 5)])
+    api_client.get(f"/api/menu/{restaurant_id}")
+    api_client.get(f"/api/menu/{other_id}")
+
+    execute(db_connection, "DELETE FROM menu_table WHERE restaurant_id = %s AND food_name = 'Gyoza'", (restaurant_id,))
+
+    assert notifications(lambda: menu_cache.get(restaurant_id, None) is None)
+    assert menu_cache.get(other_id, None) is not None
+    assert "Gyoza" not in prices(api_client.get(f"/api/menu/{restaurant_id}"))
+
+
+# Test that the single joined query returns what the former three-query loader returned
+
+def old_menu(connection, restaurant_id, category=None):
+    """get_menu's response as built before MENU_SQL: restaurant, menu items and photos queried apart."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT restaurant_name FROM restaurant_table WHERE restaurant_id = %s", (restaurant_id,))
+        restaurant_name, = cursor.fetchone()
+        sql = "SELECT menu_id, food_name, food_description, food_price, category, availability, restaurant_id FROM menu_table WHERE restaurant_id = %s"
+        params = [restaurant_id]
+        if category:
+            sql += " AND category ILIKE %s"
+            params.append(f"%{category}%")
+        cursor.execute(sql, params)
+        menu_items = cursor.fetchall()
+        cursor.execute("SELECT food_name, file_name FROM restaurant_photos WHERE restaurant_id = %s", (restaurant_id,))
+        photos = cursor.fetchall()
+    connection.rollback()
+
+    photo_dict = {}
+    for food_name, file_name in photos:
+        if food_name:
+            photo_dict.setdefault(food_name.strip(), []).append(f"{API_BASE_URL}/api/photos/{file_name}")
+    return [
+        {
+            "menu_id": menu_id, "food_name": food_name, "food_description": food_description or "No description available.",
+            "food_price": float(food_price), "category": item_category, "availability": availability,
+            "restaurant_id": item_restaurant_id, "restaurant_name": restaurant_name, "image_url": image_url,
+        }
+        for menu_id, food_name, food_description, food_price, item_category, availability, item_restaurant_id in menu_items
+        for image_url in photo_dict.get(food_name.strip(), [None])
+    ]
+
+
+def sort_entries(entries):
+    return sorted(entries, key=lambda entry: (entry["menu_id"], entry["image_url"] or ""))
+
+
+def test_menu_sql_matches_old_loader(api_client, db_connection):
+    restaurant_id = add_restaurant(db_connection, "Noodle Bar", [
+        ("Ramen", "Noodles", 12.5), (" Udon\t", "Noodles", 11), ("Gyoza", "Sides", 6), ("Edamame", "Sides", 4.25),
+    ])
+    other_id = add_restaurant(db_connection, "Other Kitchen", [("Ramen", "Noodles", 9)])
+    for owner, food_name, file_name in [
+        (restaurant_id, "Ramen", "ramen-1.jpg"), (restaurant_id, " Ramen ", "ramen-2.jpg"), (restaurant_id, "Udon", "udon.jpg"),
+        (restaurant_id, "", "storefront.jpg"), (restaurant_id, None, "logo.jpg"), (other_id, "Gyoza", "not-ours.jpg"),
+    ]:
+        execute(
+            db_connection,
+            "INSERT INTO restaurant_photos (restaurant_id, food_name, file_name, content_type) VALUES (%s, %s, %s, 'image/jpeg')",
+            (owner, food_name, file_name),
+        )
+    execute(db_connection, "UPDATE menu_table SET food_description = 'Steamed' WHERE restaurant_id = %s AND food_name = 'Edamame'", (restaurant_id,))
+    empty_id = add_restaurant(db_connection, "Empty Kitchen")
+
+    for category in (None, "noodle", "SIDES", "desserts"):
+        params = {"category": category} if category else {}
+        response = api_client.get(f"/api/menu/{restaurant_id}", params=params)
+        assert response.status_code == 200
+        assert sort_entries(response.json()) == sort_entries(old_menu(db_connection, restaurant_id, category))
+    assert api_client.get(f"/api/menu/{empty_id}").json() == []
+    assert api_client.get("/api/menu/999999").status_code == 404
+
+
+# Test conditional GETs: 304 while the client's copy is current, a new ETag after an edit
+
+@pytest.mark.parametrize("cached", [True, False])
+def test_menu_not_modified(api_client, notifications, restaurant_id, cached):
+    response = api_client.get(f"/api/menu/{restaurant_id}")
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "no-cache"
+    if not cached:
+        menu_cache.clear()
+
+    for if_none_match in (etag, f"W/{etag}", f'"stale", {etag}', "*"):
+        revalidated = api_client.get(f"/api/menu/{restaurant_id}", headers={"If-None-Match": if_none_match})
+        assert revalidated.status_code == 304
+        assert revalidated.headers["ETag"] == etag
+        assert revalidated.content == b""
+
+
+def test_menu_etag_depends_on_category(api_client, restaurant_id):
+    etag = api_client.get(f"/api/menu/{restaurant_id}").headers["ETag"]
+    noodles = api_client.get(f"/api/menu/{restaurant_id}", params={"category": "noodles"})
+
+    assert noodles.headers["ETag"] != etag
+    assert api_client.get(f"/api/menu/{restaurant_id}", params={"category": "noodles"}, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_menu_edit_changes_etag(api_client, notifications, db_connection, restaurant_id):
+    etag = api_client.get(f"/api/menu/{restaurant_id}").headers["ETag"]
+
+    execute(db_connection, "UPDATE menu_table SET availability = false WHERE restaurant_id = %s AND food_name = 'Udon'", (restaurant_id,))
+    assert notifications(lambda: menu_cache.get(restaurant_id, None) is None)
+
+    response = api_client.get(f"/api/menu/{restaurant_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert {entry["food_name"]: entry["availability"] for entry in response.json()}["Udon"] is False
+    assert api_client.get(f"/api/menu/{restaurant_id}", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+
+def test_unknown_restaurant_is_never_not_modified(api_client):
+    assert api_client.get("/api/menu/999999", headers={"If-None-Match": "*"}).status_code == 404
+
+
+# Test that dish search ranks matches by similarity and only looks near the point when given one
+
+def add_address(connection, restaurant_id, latitude, longitude):
+    execute(
+        connection,
+        "INSERT INTO address_table (restaurant_id, state, city, street_address, postal_code, latitude, longitude)"
+        " VALUES (%s, 'ON', 'Toronto', '1 Main St', 10000, %s, %s)",
+        (restaurant_id, latitude, longitude),
+    )
+
+
+def test_search_ranks_dishes(api_client, db_connection):
+    restaurant_id = add_restaurant(db_connection, "Search Kitchen", [
+        ("Tonkotsu Ramen", "Noodles", 14), ("Ramen Burger", "Burgers", 10), ("Greek Bowl", "Salads", 8),
+    ])
+
+    results = [result for result in api_client.get("/api/menu/search", params={"q": "tonkotsu ramen"}).json()
+               if result["restaurant_id"] == restaurant_id]
+    assert [result["food_name"] for result in results][0] == "Tonkotsu Ramen"
+    assert "Greek Bowl" not in [result["food_name"] for result in results]
+    assert [result["score"] for result in results] == sorted((result["score"] for result in results), reverse=True)
+
+    # Matched on the category
+    assert "Greek Bowl" in [result["food_name"] for result in api_client.get("/api/menu/search", params={"q": "salads"}).json()]
+
+
+def test_search_near_point(api_client, db_connection):
+    from app.api.geo import restaurant_locations
+
+    near_id = add_restaurant(db_connection, "Near Kitchen", [("Pho Bo", "Noodles", 13)])
+    far_id = add_restaurant(db_connection, "Far Kitchen", [("Pho Ga", "Noodles", 12)])
+    add_address(db_connection, near_id, 43.65, -79.38)
+    add_address(db_connection, far_id, 45.50, -73.57)
+    # Rebuilt from the rows just added
+    restaurant_locations.invalidate()
+
+    results = api_client.get("/api/menu/search", params={"q": "pho", "latitude": 43.66, "longitude": -79.39, "radius": 50}).json()
+    assert [result["restaurant_id"] for result in results] == [near_id]
+    assert results[0]["distance_km"] < 5
+
+    assert api_client.get("/api/menu/search", params={"q": "pho", "latitude": 43.66}).status_code == 400
+    assert api_client.get("/api/menu/search", params={"q": "p"}).status_code == 422
+
+
+def test_search_limit_keeps_the_nearest_of_equal_matches(api_client, db_connection):
+    from app.api.geo import restaurant_locations
+
+    # Added farthest first, so ordering by menu_id alone would keep the farthest
+    restaurant_ids = []
+    for name, latitude in (("Far Laksa", 43.90), ("Middle Laksa", 43.75), ("Near Laksa", 43.661)):
+        restaurant_ids.append(add_restaurant(db_connection, name, [("Laksa", "Noodles", 15)]))
+        add_address(db_connection, restaurant_ids[-1], latitude, -79.39)
+    restaurant_locations.invalidate()
+
+    params = {"q": "laksa", "latitude": 43.66, "longitude": -79.39, "radius": 50}
+    results = api_client.get("/api/menu/search", params={**params, "limit": 2}).json()
+    assert [result["restaurant_id"] for result in results] == restaurant_ids[:0:-1]
+    assert results[0]["distance_km"] < results[1]["distance_km"]
+
+    results = api_client.get("/api/menu/search", params=params).json()
+    assert [result["restaurant_id"] for result in results] == restaurant_ids[::-1]
+
+
+# Test that /bulk answers every item like get_menu, in request order, and enforces its limits
+
+def test_bulk_matches_get_menu(api_client, notifications, db_connection, restaurant_id):
+    other_id = add_restaurant(db_connection, "Other Kitchen", [("Soup", "Soups", 5)])
+    empty_id = add_restaurant(db_connection, "Empty Kitchen")
+    items = [
+        {"restaurant_id": other_id}, {"restaurant_id": restaurant_id, "category": "noodles"},
+        {"restaurant_id": 999999}, {"restaurant_id": restaurant_id}, {"restaurant_id": empty_id},
+        {"restaurant_id": restaurant_id, "category": "noodles"},
+    ]
+    # One menu already cached, the rest loaded by the bulk query
+    api_client.get(f"/api/menu/{other_id}")
+
+    response = api_client.post("/api/menu/bulk", json={"restaurants": items})
+    assert response.status_code == 200
+
+    body = response.json()
+    assert [(entry["restaurant_id"], entry["category"]) for entry in body] == [
+        (item["restaurant_id"], item.get("category")) for item in items
+    ]
+    for item, entry in zip(items, body):
+        menu = api_client.get(f"/api/menu/{item['restaurant_id']}", params={"category": item["category"]} if "category" in item else {})
+        assert entry["menu"] == (menu.json() if menu.status_code == 200 else None)
+    assert body[4]["menu"] == []
+
+
+def test_bulk_limits(api_client, monkeypatch):
+    from app.api.routers import menu
+
+    assert api_client.post("/api/menu/bulk", json={"restaurants": []}).status_code == 422
+    monkeypatch.setattr(menu, "MENU_BULK_MAX_RESTAURANTS", 3)
+    too_many = [{"restaurant_id": restaurant_id} for restaurant_id in range(1, 5)]
+    assert api_client.post("/api/menu/bulk", json={"restaurants": too_many}).status_code == 400
+    assert api_client.post("/api/menu/bulk", json={"restaurants": too_many[:3]}).status_code == 200
+
+
+# Test that applying /changes deltas keeps a client's copy equal to the full menu
+
+def apply_delta(entries, delta):
+    if delta["full"]:
+        return delta["changed"]
+    replaced = {entry["menu_id"] for entry in delta["changed"]} | set(delta["removed"])
+    return [entry for entry in entries if entry["menu_id"] not in replaced] + delta["changed"]
+
+
+def changes(api_client, restaurant_id, since):
+    response = api_client.get(f"/api/menu/{restaurant_id}/changes", params={"since": since})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_changes_delta_cursor(api_client, db_connection, restaurant_id):
+    # A new client starts from nothing and gets the whole menu
+    delta = changes(api_client, restaurant_id, 0)
+    assert delta["full"]
+    entries, version = apply_delta([], delta), delta["version"]
+    assert changes(api_client, restaurant_id, version) == {
+        "restaurant_id": restaurant_id, "version": version, "full": False, "changed": [], "removed": [],
+    }
+
+    execute(db_connection, "UPDATE menu_table SET food_price = 15 WHERE restaurant_id = %s AND food_name = 'Ramen'", (restaurant_id,))
+    execute(db_connection, "DELETE FROM menu_table WHERE restaurant_id = %s AND food_name = 'Gyoza'", (restaurant_id,))
+    execute(
+        db_connection,
+        "INSERT INTO menu_table (restaurant_id, category, food_name, food_price, availability) VALUES (%s, 'Rice', 'Donburi', 14, true)",
+        (restaurant_id,),
+    )
+    execute(
+        db_connection,
+        "INSERT INTO restaurant_photos (restaurant_id, food_name, file_name, content_type) VALUES (%s, 'Udon ', 'udon.jpg', 'image/jpeg')",
+        (restaurant_id,),
+    )
+
+    delta = changes(api_client, restaurant_id, version)
+    assert not delta["full"]
+    assert delta["version"] == version + 4
+    assert {entry["food_name"] for entry in delta["changed"]} == {"Ramen", "Donburi", "Udon"}
+    assert len(delta["removed"]) == 1
+    entries = apply_delta(entries, delta)
+    assert sort_entries(entries) == sort_entries(api_client.get(f"/api/menu/{restaurant_id}").json())
+
+    # Caught up: the next call is empty again
+    assert changes(api_client, restaurant_id, delta["version"])["changed"] == []
+
+
+def test_changes_fall_back_to_full_menu(api_client, db_connection, restaurant_id):
+    version = changes(api_client, restaurant_id, 0)["version"]
+
+    # The restaurant itself changed: every entry carries its name
+    execute(db_connection, "UPDATE restaurant_table SET restaurant_name = 'Renamed Kitchen' WHERE restaurant_id = %s", (restaurant_id,))
+    delta = changes(api_client, restaurant_id, version)
+    assert delta["full"]
+    assert {entry["restaurant_name"] for entry in delta["changed"]} == {"Renamed Kitchen"}
+
+    # A version the server never handed out
+    assert changes(api_client, restaurant_id, delta["version"] + 10)["full"]
+
+    # Versions missing from the change log
+    execute(db_connection, "UPDATE menu_table SET food_price = 1 WHERE restaurant_id = %s AND food_name = 'Gyoza'", (restaurant_id,))
+    execute(db_connection, "DELETE FROM menu_changes WHERE restaurant_id = %s", (restaurant_id,))
+    assert changes(api_client, restaurant_id, delta["version"])["full"]
+
+    assert api_client.get("/api/menu/999999/changes", params={"since": 0}).status_code == 404
+    assert api_client.get(f"/api/menu/{restaurant_id}/changes", params={"since": -1}).status_code == 422
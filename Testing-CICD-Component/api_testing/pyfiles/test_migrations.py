@@ -0,0 +1,208 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.exc import DBAPIError
+
+from app import migrate
+from app.api.database import Base, engine
+
+
+def all_versions():
+    return {path.stem for path in migrate.migration_files()}
+
+
+def applied(cursor):
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+# Test that migrating an empty database records every migration and creates every table
+# and column the models declare; the app itself creates nothing
+
+def test_empty_database_gets_the_model_schema(db_connection):
+    with db_connection.cursor() as cursor:
+        assert applied(cursor) == all_versions()
+
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        assert set(table.columns.keys()) <= columns, table.name
+
+
+def test_importing_the_app_creates_no_tables(empty_database):
+    name, connection = empty_database
+    result = subprocess.run(
+        [sys.executable, "-c", "import app.main"], cwd=migrate.MIGRATIONS_DIR.parent,
+        env={**os.environ, "DATABASE": name}, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM pg_tables WHERE schemaname = 'public'")
+        assert cursor.fetchone() == (0,)
+
+
+# Test that re-running the migrations changes nothing, and that every migration is itself
+# safe to apply again (e.g. after a partial run whose bookkeeping was lost)
+
+def test_rerun_is_a_no_op(run_migrations):
+    result = run_migrations()
+
+    assert result.returncode == 0, result.stderr
+    assert "Database is up to date" in result.stdout
+
+
+def test_every_migration_reapplies_cleanly(db_connection, run_migrations):
+    with db_connection.cursor() as cursor:
+        cursor.execute("DELETE FROM schema_migrations")
+    db_connection.commit()
+
+    result = run_migrations()
+    assert result.returncode == 0, result.stdout + result.stderr
+    with db_connection.cursor() as cursor:
+        assert applied(cursor) == all_versions()
+
+
+# Test that no-transaction migrations run outside a transaction block: CREATE INDEX
+# CONCURRENTLY fails inside one
+
+@pytest.fixture
+def probe_table(db_connection):
+    with db_connection.cursor() as cursor:
+        cursor.execute("CREATE TABLE IF NOT EXISTS migration_probe (id INTEGER)")
+    db_connection.commit()
+    yield
+    with db_connection.cursor() as cursor:
+        cursor.execute("DROP TABLE migration_probe")
+        cursor.execute("DELETE FROM schema_migrations WHERE version LIKE '9999_%'")
+    db_connection.commit()
+
+
+CONCURRENT_INDEX_SQL = """
+-- Probe index
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_migration_probe_id ON migration_probe (id);
+"""
+
+
+def test_no_transaction_migration_builds_concurrently(tmp_path, db_connection, probe_table):
+    path = tmp_path / "9999_probe_index.sql"
+    path.write_text(migrate.NO_TRANSACTION_MARKER + "\n" + CONCURRENT_INDEX_SQL)
+    migrate.apply_migration(path)
+
+    with db_connection.cursor() as cursor:
+        cursor.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = 'ix_migration_probe_id'::regclass")
+        assert cursor.fetchone() == (True,)
+        assert "9999_probe_index" in applied(cursor)
+
+
+def test_transactional_migration_rejects_concurrent_index(tmp_path, db_connection, probe_table):
+    path = tmp_path / "9999_probe_index.sql"
+    path.write_text(CONCURRENT_INDEX_SQL)
+
+    with pytest.raises(DBAPIError, match="cannot run inside a transaction block"):
+        migrate.apply_migration(path)
+    with db_connection.cursor() as cursor:
+        assert "9999_probe_index" not in applied(cursor)
+
+
+def test_trigram_indexes_are_valid(db_connection):
+    with db_connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid"
+            " WHERE c.relname IN ('ix_menu_table_category_trgm', 'ix_menu_table_food_name_trgm')"
+        )
+        assert sorted(cursor.fetchall()) == [("ix_menu_table_category_trgm", True), ("ix_menu_table_food_name_trgm", True)]
+
+
+# Test that a database migrated from empty accepts writes: the triggers installed by the
+# migrations run on every restaurant, menu and photo change
+
+
+def insert_restaurant(cursor, name="Migrated Diner"):
+    cursor.execute(
+        "INSERT INTO restaurant_table (restaurant_name, restaurant_type, pricing_levels, ratings)"
+        " VALUES (%s, 'cafe', '$', 4.5) RETURNING restaurant_id",
+        (name,),
+    )
+    return cursor.fetchone()[0]
+
+
+def test_menu_item_insert_after_migrations(db_connection):
+    with db_connection.cursor() as cursor:
+        restaurant_id = insert_restaurant(cursor)
+        cursor.execute(
+            "INSERT INTO menu_table (restaurant_id, category, food_name, food_price, availability)"
+            " VALUES (%s, 'Mains', 'Pad Thai', 12.5, true) RETURNING menu_id",
+            (restaurant_id,),
+        )
+        menu_id = cursor.fetchone()[0]
+        cursor.execute("UPDATE menu_table SET food_price = 13 WHERE menu_id = %s", (menu_id,))
+        cursor.execute("SELECT version FROM menu_versions WHERE restaurant_id = %s", (restaurant_id,))
+        version = cursor.fetchone()[0]
+    db_connection.commit()
+
+    # Restaurant insert, menu insert and menu update each bump the version
+    assert version == 3
+
+
+def test_menu_versions_defaults(db_connection):
+    with db_connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT column_name, column_default FROM information_schema.columns WHERE table_name = 'menu_versions'"
+        )
+        defaults = dict(cursor.fetchall())
+
+    assert defaults["version"] == "1"
+    # The key is the restaurant's id, never generated
+    assert defaults["restaurant_id"] is None
+
+
+# Test that moving photos to the photo store commits batch by batch and leaves the table
+# readable meanwhile, instead of locking it for the whole move
+
+def test_photo_store_migration_commits_per_batch(db_connection, tmp_path, monkeypatch):
+    from app.api import photo_store
+
+    monkeypatch.setattr(photo_store, "PHOTO_STORE_DIR", str(tmp_path))
+    module = migrate.load_python_migration(migrate.MIGRATIONS_DIR / "0006_photo_store.py")
+    # Photos other tests left in Postgres are moved first, so the batches below hold only ours
+    with engine.connect() as connection:
+        module.upgrade(connection)
+
+    with db_connection.cursor() as cursor:
+        restaurant_id = insert_restaurant(cursor, "Legacy Diner")
+        photo_ids = []
+        for number in range(5):
+            cursor.execute(
+                "INSERT INTO restaurant_photos (restaurant_id, file_name, content_type, photo_data)"
+                " VALUES (%s, %s, 'image/jpeg', %s) RETURNING photo_id",
+                (restaurant_id, f"legacy-{number}.jpg", f"legacy bytes {number}".encode()),
+            )
+            photo_ids.append(cursor.fetchone()[0])
+    db_connection.commit()
+
+    moved_before_each_save = []
+
+    def save_photo(data):
+        # From another session, without waiting for locks
+        with db_connection.cursor() as cursor:
+            cursor.execute("SET LOCAL lock_timeout = '1s'")
+            cursor.execute("SELECT count(*) FROM restaurant_photos WHERE photo_id = ANY(%s) AND content_hash IS NOT NULL", (photo_ids,))
+            moved_before_each_save.append(cursor.fetchone()[0])
+        db_connection.rollback()
+        return photo_store.save_photo(data)
+
+    monkeypatch.setattr(module, "save_photo", save_photo)
+    monkeypatch.setattr(module, "BATCH_SIZE", 2)
+    with engine.connect() as connection:
+        module.upgrade(connection)
+
+    assert moved_before_each_save == [0, 0, 2, 2, 4]
+    with db_connection.cursor() as cursor:
+        cursor.execute("SELECT content_hash, photo_data FROM restaurant_photos WHERE photo_id = ANY(%s) ORDER BY photo_id", (photo_ids,))
+        rows = cursor.fetchall()
+    assert all(photo_data is None for _, photo_data in rows)
+    assert [photo_store.read_photo(digest) for digest, _ in rows] == [f"legacy bytes {number}".encode() for number in range(5)]
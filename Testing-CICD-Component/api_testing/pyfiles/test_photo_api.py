@@ -0,0 +1,263 @@
+import itertools
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.api import photo_store
+from app.api.http_cache import http_date
+from app.api.photo_cache import PhotoBytesCache, photo_bytes, photo_metadata
+from app.api.routers.photo import IMMUTABLE_CACHE_CONTROL
+
+file_numbers = itertools.count(1)
+
+
+def execute(connection, sql, params=()):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone() if cursor.description else None
+    connection.commit()
+    return row
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(photo_store, "PHOTO_STORE_DIR", str(tmp_path))
+    photo_bytes._entries.clear()
+    photo_bytes.resident_bytes = 0
+    photo_metadata.clear()
+    return tmp_path
+
+
+@pytest.fixture
+def restaurant_id(db_connection):
+    return execute(db_connection, "INSERT INTO restaurant_table (restaurant_name) VALUES ('Photo Kitchen') RETURNING restaurant_id")[0]
+
+
+@pytest.fixture
+def add_photo(db_connection, store_dir, restaurant_id):
+    """Store bytes and insert their restaurant_photos row, with WebP and JPEG `variants` of
+    the given sizes; returns (file_name, content_hash, {(variant, format): variant_hash})."""
+    def add_photo(data=None, variants=("full",)):
+        file_name = f"photo-{next(file_numbers)}.jpg"
+        data = data or f"original {file_name}".encode()
+        digest, size_bytes = photo_store.save_photo(data)
+        execute(
+            db_connection,
+            "INSERT INTO restaurant_photos (restaurant_id, food_name, file_name, content_type, content_hash, size_bytes, upload_time)"
+            " VALUES (%s, 'Ramen', %s, 'image/jpeg', %s, %s, timezone('utc', now()) - interval '1 day')",
+            (restaurant_id, file_name, digest, size_bytes),
+        )
+        variant_hashes = {}
+        for variant in variants:
+            for format in ("webp", "jpeg"):
+                variant_hash, variant_size = photo_store.save_photo(f"{format} {variant} of {file_name}".encode())
+                execute(
+                    db_connection,
+                    "INSERT INTO photo_variants (content_hash, variant, format, variant_hash, size_bytes, width, height, created_at)"
+                    " VALUES (%s, %s, %s, %s, %s, 10, 10, timezone('utc', now()) - interval '1 hour')",
+                    (digest, variant, format, variant_hash, variant_size),
+                )
+                variant_hashes[variant, format] = variant_hash
+        return file_name, digest, variant_hashes
+    return add_photo
+
+
+WEBP = {"Accept": "image/avif,image/webp,*/*"}
+FULL = {"size": "full"}
+
+
+# Test photo validators and when a response may be cached as immutable
+
+def test_versioned_variant_is_immutable(api_client, add_photo):
+    file_name, digest, variants = add_photo()
+
+    response = api_client.get(f"/api/photos/{file_name}", params={**FULL, "v": photo_store.photo_version(digest)}, headers=WEBP)
+    assert response.status_code == 200
+    assert response.content == f"webp full of {file_name}".encode()
+    assert response.headers["Content-Type"] == "image/webp"
+    assert response.headers["ETag"] == f'"{variants["full", "webp"]}"'
+    assert response.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["Vary"] == "Accept"
+    assert "Last-Modified" in response.headers
+
+    jpeg = api_client.get(f"/api/photos/{file_name}", params={**FULL, "v": photo_store.photo_version(digest)})
+    assert jpeg.headers["Content-Type"] == "image/jpeg"
+    assert jpeg.headers["ETag"] == f'"{variants["full", "jpeg"]}"'
+
+
+@pytest.mark.parametrize("params", [FULL, {**FULL, "v": "0123456789abcdef"}, {"size": "card"}])
+def test_unversioned_or_fallback_photo_is_revalidated(api_client, add_photo, params):
+    file_name, digest, _ = add_photo()
+    if params.get("size") == "card":
+        # No card variant yet: the original is sent, but will not be once the variant exists
+        params = {**params, "v": photo_store.photo_version(digest)}
+
+    response = api_client.get(f"/api/photos/{file_name}", params=params, headers=WEBP)
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "public, no-cache"
+
+
+def test_versioned_original_is_immutable(api_client, add_photo):
+    file_name, digest, _ = add_photo()
+
+    response = api_client.get(f"/api/photos/{file_name}", params={"size": "original", "v": photo_store.photo_version(digest)}, headers=WEBP)
+    assert response.content == f"original {file_name}".encode()
+    assert response.headers["ETag"] == f'"{digest}"'
+    assert response.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+    assert "Vary" not in response.headers
+
+
+def test_photo_not_modified(api_client, add_photo):
+    file_name, _, _ = add_photo()
+    response = api_client.get(f"/api/photos/{file_name}", params=FULL, headers=WEBP)
+    etag, last_modified = response.headers["ETag"], response.headers["Last-Modified"]
+
+    for headers in ({"If-None-Match": etag}, {"If-None-Match": f'"other", W/{etag}'}, {"If-Modified-Since": last_modified}):
+        revalidated = api_client.get(f"/api/photos/{file_name}", params=FULL, headers={**WEBP, **headers})
+        assert revalidated.status_code == 304
+        assert revalidated.content == b""
+        assert revalidated.headers["ETag"] == etag
+
+    # A different representation, or a copy older than the photo
+    assert api_client.get(f"/api/photos/{file_name}", params=FULL, headers={"If-None-Match": etag}).status_code == 200
+    assert api_client.get(f"/api/photos/{file_name}", headers={**WEBP, "If-None-Match": etag}).status_code == 200
+    earlier = http_date(datetime.now(timezone.utc) - timedelta(days=2))
+    assert api_client.get(f"/api/photos/{file_name}", params=FULL, headers={**WEBP, "If-Modified-Since": earlier}).status_code == 200
+    # If-None-Match wins over If-Modified-Since
+    assert api_client.get(f"/api/photos/{file_name}", params=FULL, headers={**WEBP, "If-None-Match": '"other"', "If-Modified-Since": last_modified}).status_code == 200
+
+
+def test_original_is_the_default_size(api_client, add_photo):
+    file_name, digest, _ = add_photo(variants=("thumb", "card", "full"))
+
+    # Clients that never asked for a size keep getting the uploaded bytes
+    response = api_client.get(f"/api/photos/{file_name}", headers=WEBP)
+    assert response.content == f"original {file_name}".encode()
+    assert response.headers["Content-Type"] == "image/jpeg"
+    assert response.headers["ETag"] == f'"{digest}"'
+
+
+def test_photo_size_is_validated(api_client, add_photo):
+    file_name, _, _ = add_photo()
+
+    assert api_client.get(f"/api/photos/{file_name}", params={"size": "huge"}).status_code == 400
+    assert api_client.get("/api/photos/missing.jpg").status_code == 404
+
+
+# Test that photo bytes are kept within the cache budget, least recently used first out
+
+def test_photo_bytes_cache_budget(store_dir):
+    digests = [photo_store.save_photo(bytes([number]) * 400)[0] for number in range(4)]
+    cache = PhotoBytesCache(budget_bytes=1000, max_file_bytes=500)
+
+    cache.read(digests[0], 400)
+    cache.read(digests[1], 400)
+    assert cache.read(digests[0], 400) == bytes([0]) * 400  # now the most recently used
+    cache.read(digests[2], 400)
+
+    assert list(cache._entries) == [digests[0], digests[2]]
+    assert cache.resident_bytes == 800 <= cache.budget_bytes
+    assert cache.counters.snapshot()["hits"] == 1
+
+    # Too large to cache, or of unknown size: left to stream from disk
+    large = photo_store.save_photo(b"x" * 600)[0]
+    assert cache.read(large, 600) is None
+    assert cache.read(digests[3], None) is None
+    assert cache.resident_bytes == 800
+
+
+def test_hot_photo_is_served_from_memory(api_client, add_photo):
+    file_name, _, variants = add_photo()
+    first = api_client.get(f"/api/photos/{file_name}", params=FULL, headers=WEBP)
+
+    # Gone from disk, still in memory
+    os.remove(photo_store.photo_path(variants["full", "webp"]))
+    second = api_client.get(f"/api/photos/{file_name}", params=FULL, headers=WEBP)
+    assert second.status_code == 200
+    assert second.content == first.content
+
+
+def test_photo_lookup_follows_variant_changes(api_client, notifications, db_connection, add_photo):
+    file_name, digest, _ = add_photo(variants=())
+    assert api_client.get(f"/api/photos/{file_name}", params=FULL, headers=WEBP).headers["ETag"] == f'"{digest}"'
+    assert photo_metadata.get((file_name, "full")) is not None
+
+    variant_hash, size_bytes = photo_store.save_photo(b"built later")
+    execute(
+        db_connection,
+        "INSERT INTO photo_variants (content_hash, variant, format, variant_hash, size_bytes, width, height) VALUES (%s, 'full', 'webp', %s, %s, 10, 10)",
+        (digest, variant_hash, size_bytes),
+    )
+
+    assert notifications(lambda: photo_metadata.get((file_name, "full")) is None)
+    response = api_client.get(f"/api/photos/{file_name}", params=FULL, headers=WEBP)
+    assert response.headers["ETag"] == f'"{variant_hash}"'
+    assert response.content == b"built later"
+
+
+# Test that photo metadata never loads the legacy photo_data bytes
+
+@pytest.fixture
+def statements():
+    """SQL of every statement run while the test runs."""
+    recorded = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        recorded.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", record)
+    yield recorded
+    event.remove(Engine, "before_cursor_execute", record)
+
+
+def selects_photo_data(statement):
+    """True when photo_data itself is selected, not just its length."""
+    return "photo_data" in statement.replace("octet_length(restaurant_photos.photo_data)", "")
+
+
+@pytest.fixture
+def legacy_photo(db_connection, restaurant_id):
+    """file_name of a photo still kept in Postgres, as before the photo store."""
+    file_name = f"legacy-{next(file_numbers)}.jpg"
+    execute(
+        db_connection,
+        "INSERT INTO restaurant_photos (restaurant_id, food_name, file_name, content_type, photo_data) VALUES (%s, 'Ramen', %s, 'image/jpeg', %s)",
+        (restaurant_id, file_name, b"\xff\xd8 legacy bytes"),
+    )
+    return file_name
+
+
+def test_photo_rows_defer_photo_data(legacy_photo, statements):
+    from app.api.database import SessionLocal
+    from app.api.models import RestaurantPhotos
+
+    with SessionLocal() as db:
+        photo = db.query(RestaurantPhotos).filter(RestaurantPhotos.file_name == legacy_photo).one()
+        assert "photo_data" not in photo.__dict__
+        assert statements and not any(selects_photo_data(statement) for statement in statements)
+
+        # Loaded on access
+        assert photo.photo_data == b"\xff\xd8 legacy bytes"
+
+
+def test_photo_listing_reads_no_bytes(api_client, add_photo, legacy_photo, restaurant_id, statements):
+    file_name, digest, _ = add_photo()
+
+    response = api_client.get(f"/api/restaurant/{restaurant_id}/photos")
+    assert response.status_code == 200
+    assert statements and not any(selects_photo_data(statement) for statement in statements)
+
+    photos = {photo["file_name"]: photo for photo in response.json()}
+    assert photos[legacy_photo]["size_bytes"] == len(b"\xff\xd8 legacy bytes")
+    assert photos[file_name]["size_bytes"] == len(f"original {file_name}")
+    assert photos[file_name]["thumbnail_url"].endswith(f"/api/photos/{file_name}?v={photo_store.photo_version(digest)}&size=thumb")
+    assert all("photo_data" not in photo for photo in photos.values())
+
+
+def test_legacy_photo_is_still_served(api_client, legacy_photo):
+    response = api_client.get(f"/api/photos/{legacy_photo}")
+    assert response.status_code == 200
+    assert response.content == b"\xff\xd8 legacy bytes"
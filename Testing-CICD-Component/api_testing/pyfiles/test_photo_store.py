@@ -0,0 +1,117 @@
+import io
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+# The merchant utilities import `utils.*` relative to Backend_Component
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "..", "Backend_Component"))
+
+from app.api import photo_store as shared_photo_store  # noqa: E402
+from scripts import gc_photo_store  # noqa: E402
+from utils import photo_store  # noqa: E402
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_photo_store, "PHOTO_STORE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def stored_files(store_dir):
+    return sorted(
+        os.path.relpath(os.path.join(directory, name), store_dir)
+        for directory, _, names in os.walk(store_dir) for name in names
+    )
+
+
+# Test that identical uploads share one file and leave no temporary files behind
+
+def test_save_photo_stream_dedupes(store_dir):
+    data = b"\xff\xd8 photo bytes" * 1000
+    digest, size = photo_store.save_photo_stream(io.BytesIO(data))
+    old = time.time() - 3600
+    os.utime(photo_store.photo_path(digest), (old, old))
+
+    assert photo_store.save_photo_stream(io.BytesIO(data)) == (digest, size)
+    assert digest == photo_store.content_hash(data) and size == len(data)
+    assert stored_files(store_dir) == [photo_store.relative_path(digest)]
+    assert photo_store.read_photo(digest) == data
+    # Storing bytes already there refreshes the file, so the store GC keeps it
+    assert os.stat(photo_store.photo_path(digest)).st_mtime > old
+
+
+# Test that the file only appears at its final path once it is complete
+
+class WatchedStream(io.BytesIO):
+    def __init__(self, data, final_path):
+        super().__init__(data)
+        self.final_path = final_path
+        self.reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        assert not os.path.exists(self.final_path)
+        return super().read(size)
+
+
+def test_save_photo_stream_writes_atomically(store_dir):
+    data = os.urandom(3 * photo_store.PHOTO_UPLOAD_CHUNK_BYTES + 10)
+    stream = WatchedStream(data, photo_store.photo_path(photo_store.content_hash(data)))
+
+    digest, _ = photo_store.save_photo_stream(stream)
+
+    assert stream.reads > 3
+    assert photo_store.read_photo(digest) == data
+    assert oct(os.stat(photo_store.photo_path(digest)).st_mode & 0o777) == "0o644"
+    assert stored_files(store_dir) == [photo_store.relative_path(digest)]
+
+
+# Test that an upload over the limit is rejected and its temporary file removed
+
+def test_photo_too_large_removes_temp_file(store_dir):
+    data = os.urandom(2 * photo_store.PHOTO_UPLOAD_CHUNK_BYTES)
+
+    with pytest.raises(photo_store.PhotoTooLarge):
+        photo_store.save_photo_stream(io.BytesIO(data), max_bytes=photo_store.PHOTO_UPLOAD_CHUNK_BYTES + 1)
+
+    assert stored_files(store_dir) == []
+
+
+# Test which files the store GC removes
+
+def test_gc_removes_only_old_unreferenced_files(store_dir):
+    referenced, _ = photo_store.save_photo(b"still on a menu")
+    replaced, _ = photo_store.save_photo(b"replaced upload")
+    fresh, _ = photo_store.save_photo(b"uploaded, row not committed yet")
+    leftover = store_dir / ".tmp-interrupted"
+    leftover.write_bytes(b"partial")
+    foreign = store_dir / "README"
+    foreign.write_text("not a photo")
+
+    old = time.time() - 7200
+    for path in (photo_store.photo_path(referenced), photo_store.photo_path(replaced), leftover, foreign):
+        os.utime(path, (old, old))
+
+    removable = gc_photo_store.unreferenced_files(str(store_dir), {referenced}, min_age=3600)
+    assert sorted(removable) == sorted([photo_store.photo_path(replaced), str(leftover)])
+
+
+# Test that both services use one photo store implementation, at one absolute path
+
+def test_services_share_the_photo_store():
+    assert photo_store.save_photo_stream is shared_photo_store.save_photo_stream
+    assert photo_store.photo_path is shared_photo_store.photo_path
+    assert os.path.isabs(photo_store.PHOTO_STORE_DIR)
+
+
+def test_relative_photo_store_dir_is_refused():
+    backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(shared_photo_store.__file__)))
+    result = subprocess.run(
+        [sys.executable, "-c", "import app.api.photo_store"], cwd=backend_dir,
+        env={**os.environ, "PHOTO_STORE_DIR": "photo_store"}, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode != 0
+    assert "PHOTO_STORE_DIR must be an absolute path" in result.stderr
@@ -0,0 +1,176 @@
+import asyncio
+import os
+import sys
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+# The merchant routers import `utils.*` relative to Backend_Component
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "..", "Backend_Component"))
+
+from app.api import photo_store as shared_photo_store  # noqa: E402
+from routers import photos  # noqa: E402
+from utils.photo_store import PHOTO_MAX_UPLOAD_BYTES  # noqa: E402
+
+MEGABYTE = 1024 * 1024
+
+app = FastAPI()
+app.include_router(photos.router)
+app.dependency_overrides[photos.get_current_user] = lambda: 1
+
+
+class RecordingCursor:
+    def __init__(self, statements):
+        self.statements = statements
+
+    async def execute(self, sql, params=None):
+        self.statements.append(" ".join(sql.split()))
+
+    async def fetchone(self):
+        return None
+
+    async def close(self):
+        pass
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.statements = []
+
+    def cursor(self):
+        return RecordingCursor(self.statements)
+
+    async def commit(self):
+        pass
+
+
+@pytest.fixture
+def connection(monkeypatch):
+    """Fake database for the router: records statements and finds no existing photo."""
+    connection = RecordingConnection()
+
+    @asynccontextmanager
+    async def get_async_connection():
+        yield connection
+
+    async def store_photo_variants(content_hash):
+        pass
+
+    monkeypatch.setattr(photos, "get_async_connection", get_async_connection)
+    monkeypatch.setattr(photos, "store_photo_variants", store_photo_variants)
+    return connection
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_photo_store, "PHOTO_STORE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def stored_files(store_dir):
+    return sorted(
+        os.path.relpath(os.path.join(directory, name), store_dir)
+        for directory, _, names in os.walk(store_dir) for name in names
+    )
+
+
+def upload_request(photo: bytes):
+    """(headers, body) of a multipart upload of `photo`, as a browser would send it."""
+    request = httpx.Request(
+        "POST", "http://test/restaurant/upload-photo",
+        data={"restaurant_id": "1", "food_name": "Ramen"}, files={"file": ("ramen.jpg", photo, "image/jpeg")},
+    )
+    return request.headers, request.read()
+
+
+def call(headers, chunks):
+    """
+    Send a request to the app over ASGI, the body in `chunks` (an iterable, pulled only as the
+    app reads). Returns (status, body consumed in bytes).
+    """
+    chunks = iter(chunks)
+    consumed = 0
+    status = None
+
+    async def receive():
+        nonlocal consumed
+        chunk = next(chunks, None)
+        if chunk is None:
+            return {"type": "http.request", "body": b"", "more_body": False}
+        consumed += len(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": True}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/restaurant/upload-photo", "raw_path": b"/restaurant/upload-photo", "query_string": b"",
+        "root_path": "", "server": ("test", 80), "client": ("127.0.0.1", 1234),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+    }
+    asyncio.run(app(scope, receive, send))
+    return status, consumed
+
+
+def body_chunks(body: bytes, size: int = MEGABYTE):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+# Test that uploads within the limit are stored, and the row only keeps the hash
+
+def test_upload_is_stored(connection, store_dir):
+    headers, body = upload_request(b"ramen photo")
+    status, _ = call(headers, body_chunks(body))
+
+    assert status == 200
+    digest = shared_photo_store.content_hash(b"ramen photo")
+    assert stored_files(store_dir) == [shared_photo_store.relative_path(digest)]
+    assert connection.statements[-1].startswith("INSERT INTO restaurant_photos")
+
+
+# Test that oversized uploads are refused with a 413, reading as little of them as possible
+
+def test_oversized_content_length_is_refused_before_reading(connection, store_dir):
+    headers, _ = upload_request(b"x")
+    headers["Content-Length"] = str(PHOTO_MAX_UPLOAD_BYTES * 2)
+
+    def never_read():
+        raise AssertionError("the body was read")
+        yield
+
+    status, consumed = call(headers, never_read())
+    assert status == 413
+    assert consumed == 0
+    assert connection.statements == []
+    assert stored_files(store_dir) == []
+
+
+def test_streamed_body_over_the_limit_is_refused(connection, store_dir):
+    headers, body = upload_request(b"x" * (PHOTO_MAX_UPLOAD_BYTES + 4 * MEGABYTE))
+    del headers["Content-Length"]
+    headers["Transfer-Encoding"] = "chunked"
+
+    status, consumed = call(headers, body_chunks(body))
+    assert status == 413
+    # Stopped within a chunk of the limit, not at the end of the body
+    assert consumed <= photos.BoundedUploadRoute.max_body_bytes + MEGABYTE < len(body)
+    assert connection.statements == []
+    assert stored_files(store_dir) == []
+
+
+def test_photo_too_large_is_refused(connection, store_dir, monkeypatch):
+    # Within the route's body limit, over the photo limit: caught while copying to the store
+    monkeypatch.setattr(photos, "PHOTO_MAX_UPLOAD_BYTES", 1000)
+    headers, body = upload_request(os.urandom(5000))
+
+    status, _ = call(headers, body_chunks(body))
+    assert status == 413
+    assert connection.statements == []
+    # No temporary file left behind
+    assert stored_files(store_dir) == []
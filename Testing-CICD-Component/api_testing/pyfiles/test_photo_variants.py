@@ -0,0 +1,121 @@
+import asyncio
+import io
+import os
+import sys
+from contextlib import asynccontextmanager
+
+from PIL import Image
+
+# The merchant utilities import `utils.*` relative to Backend_Component
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "..", "Backend_Component"))
+
+from routers import photos  # noqa: E402
+from utils.photo_variants import RECORD_FAILURE_SQL, render_variants  # noqa: E402
+
+
+def image_bytes(size, mode="RGB", color=(200, 30, 30), format="PNG", exif=None):
+    buffer = io.BytesIO()
+    image = Image.new(mode, size, color)
+    image.save(buffer, format, **({"exif": exif} if exif is not None else {}))
+    return buffer.getvalue()
+
+
+def decoded(variants):
+    """{(variant, format): image} of render_variants output, checking the reported sizes."""
+    images = {}
+    for variant, format, encoded, width, height in variants:
+        image = Image.open(io.BytesIO(encoded))
+        assert image.format == format.upper()
+        assert image.size == (width, height)
+        images[variant, format] = image
+    return images
+
+
+# Test that each variant is scaled to its longest edge, keeping the aspect ratio
+
+def test_render_variants_sizes():
+    images = decoded(render_variants(image_bytes((2000, 1000))))
+
+    assert {key: image.size for key, image in images.items()} == {
+        ("full", "webp"): (1280, 640), ("full", "jpeg"): (1280, 640),
+        ("card", "webp"): (480, 240), ("card", "jpeg"): (480, 240),
+        ("thumb", "webp"): (160, 80), ("thumb", "jpeg"): (160, 80),
+    }
+
+
+def test_render_variants_never_upscales():
+    images = decoded(render_variants(image_bytes((300, 200))))
+
+    assert images["full", "webp"].size == (300, 200)
+    assert images["card", "jpeg"].size == (300, 200)
+    assert images["thumb", "jpeg"].size == (160, 107)
+
+
+# Test that transparency is flattened onto white for JPEG and kept for WebP
+
+def test_render_variants_flattens_alpha_for_jpeg():
+    images = decoded(render_variants(image_bytes((64, 64), mode="RGBA", color=(0, 0, 0, 0))))
+
+    jpeg = images["thumb", "jpeg"]
+    assert jpeg.mode == "RGB"
+    assert all(channel >= 250 for channel in jpeg.getpixel((32, 32)))
+    webp = images["thumb", "webp"]
+    assert webp.mode == "RGBA" and webp.getpixel((32, 32))[3] == 0
+
+
+# Test that the EXIF orientation is applied, so phone photos are not sideways
+
+def test_render_variants_applies_exif_rotation():
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise to display
+    images = decoded(render_variants(image_bytes((400, 200), format="JPEG", exif=exif.tobytes())))
+
+    assert images["full", "jpeg"].size == (200, 400)
+    assert images["thumb", "webp"].size == (80, 160)
+
+
+# Test that a failed build is recorded for the backfill instead of being lost
+
+class RecordingCursor:
+    def __init__(self, statements):
+        self.statements = statements
+
+    async def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+
+    async def fetchone(self):
+        return None
+
+    async def close(self):
+        pass
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self):
+        return RecordingCursor(self.statements)
+
+    async def commit(self):
+        self.commits += 1
+
+
+def test_failed_variant_build_is_recorded(monkeypatch):
+    connection = RecordingConnection()
+
+    @asynccontextmanager
+    async def get_async_connection():
+        yield connection
+
+    async def make_variants(content_hash):
+        raise OSError("cannot identify image file")
+
+    monkeypatch.setattr(photos, "get_async_connection", get_async_connection)
+    monkeypatch.setattr(photos, "make_variants", make_variants)
+
+    asyncio.run(photos.store_photo_variants("ab" * 32))
+
+    assert connection.statements[-1] == (RECORD_FAILURE_SQL, ("ab" * 32, "OSError: cannot identify image file"))
+    assert connection.commits == 1
@@ -0,0 +1,196 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+
+import psycopg2
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+# The merchant utilities import `utils.*` relative to Backend_Component
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "..", "Backend_Component"))
+
+from utils import db_authenticate, query_log  # noqa: E402
+from utils.db_authenticate import (  # noqa: E402
+    PooledAsyncConnection, PooledConnections, _apply_async_statement_timeout, _check_async_connection,
+)
+from utils.query_log import RequestQueries, TimedAsyncCursor, TimedCursor, track_route_queries  # noqa: E402
+
+
+def connect_kwargs(database):
+    return {
+        "host": os.environ["HOST"], "port": os.environ["PORT"], "user": os.environ["DB_USER"],
+        "password": os.environ["PASSWORD"], "dbname": database,
+    }
+
+
+@pytest.fixture
+def pool(migrated_database, monkeypatch):
+    """One-connection pool of timed cursors, pinging the connection on every checkout."""
+    monkeypatch.setattr(db_authenticate, "DB_POOL_HEALTHCHECK_IDLE", 0)
+    pool = PooledConnections(0, 1, 5, cursor_factory=TimedCursor, **connect_kwargs(migrated_database))
+    yield pool
+    pool.closeall()
+
+
+@pytest.fixture
+def client(pool):
+    """Routes tracked like the merchant routers, each running its statements on the pool."""
+    router = APIRouter(dependencies=[Depends(track_route_queries)])
+
+    def run(*statements):
+        connection = pool.getconn()
+        try:
+            results = []
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+                    results.append(cursor.fetchone()[0])
+            connection.commit()
+            return results
+        except psycopg2.errors.QueryCanceled:
+            return "canceled"
+        finally:
+            pool.putconn(connection)
+
+    @router.get("/items/{item_id}")
+    def slow_item(item_id: int):
+        return run("SELECT pg_sleep(0.1)::text", "SELECT 1")
+
+    @router.get("/queries/{count}")
+    def queries(count: int):
+        return run(*["SELECT 1"] * count)
+
+    @router.get("/sleep")
+    def sleep():
+        return run("SELECT pg_sleep(0.3)::text")
+
+    @router.get("/timeout")
+    def timeout():
+        return run("SHOW statement_timeout")
+
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+@pytest.fixture
+def logged(caplog):
+    """The slow-query log's JSON events."""
+    caplog.set_level(logging.WARNING, logger="quefood.slow_query")
+
+    def logged(event):
+        return [
+            json.loads(record.getMessage()) for record in caplog.records
+            if record.name == "quefood.slow_query" and json.loads(record.getMessage())["event"] == event
+        ]
+    return logged
+
+
+# Test that slow statements are logged with the route template they ran for
+
+def test_slow_query_is_logged(client, logged, monkeypatch):
+    monkeypatch.setattr(query_log, "DB_SLOW_QUERY_MS", 80)
+    assert client.get("/items/7").status_code == 200
+
+    slow, = logged("slow_query")
+    assert slow["route"] == "/items/{item_id}"
+    assert slow["statement"] == "SELECT pg_sleep(0.1)::text"
+    assert slow["duration_ms"] >= 100
+
+
+# Test that routes running more statements than their budget are logged, and pool
+# housekeeping (health checks, SET statement_timeout) is not counted against them
+
+def test_query_budget_overrun_is_logged(client, logged, monkeypatch):
+    monkeypatch.setattr(query_log, "DB_ROUTE_QUERY_BUDGETS", {"/queries/{count}": 2})
+    monkeypatch.setattr(query_log, "DB_ROUTE_STATEMENT_TIMEOUTS", {"/queries/{count}": 1000})
+
+    assert client.get("/queries/2").status_code == 200
+    assert client.get("/queries/2").status_code == 200
+    assert logged("query_budget_exceeded") == []
+
+    assert client.get("/queries/3").status_code == 200
+    overrun, = logged("query_budget_exceeded")
+    assert overrun["route"] == "/queries/{count}"
+    assert overrun["method"] == "GET"
+    assert (overrun["queries"], overrun["budget"]) == (3, 2)
+
+
+def test_pool_health_check_is_not_logged_as_slow(client, pool, logged, monkeypatch):
+    monkeypatch.setattr(query_log, "DB_SLOW_QUERY_MS", 0)
+    # The second checkout pings the connection returned by the first
+    client.get("/queries/1")
+    client.get("/queries/1")
+    assert [entry["statement"] for entry in logged("slow_query")] == ["SELECT 1", "SELECT 1"]
+
+
+def test_request_queries_are_reset_after_the_request():
+    request = Request({"type": "http", "method": "GET", "path": "/orders", "headers": []})
+
+    async def run_dependency(fail):
+        dependency = track_route_queries(request)
+        await dependency.__anext__()
+        assert isinstance(query_log._request_queries.get(), RequestQueries)
+        if fail:
+            with pytest.raises(RuntimeError):
+                await dependency.athrow(RuntimeError("handler failed"))
+        else:
+            with pytest.raises(StopAsyncIteration):
+                await dependency.__anext__()
+        return query_log._request_queries.get()
+
+    assert asyncio.run(run_dependency(fail=False)) is None
+    assert asyncio.run(run_dependency(fail=True)) is None
+
+
+# Test that each route runs under its own statement_timeout, re-SET only when it changes
+
+def test_route_statement_timeout(client, pool, monkeypatch):
+    monkeypatch.setattr(query_log, "DB_STATEMENT_TIMEOUT_MS", 0)
+    monkeypatch.setattr(query_log, "DB_ROUTE_STATEMENT_TIMEOUTS", {"/sleep": 100, "/timeout": 2000})
+
+    assert client.get("/sleep").json() == "canceled"
+    assert client.get("/timeout").json() == ["2s"]
+    assert client.get("/queries/1").json() == [1]
+
+    # The one pooled connection went back to the default between routes
+    connection = pool.getconn()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SHOW statement_timeout")
+            assert cursor.fetchone()[0] == "0"
+    finally:
+        pool.putconn(connection)
+
+
+def test_async_statement_timeout_and_check_are_not_counted(migrated_database, monkeypatch):
+    monkeypatch.setattr(query_log, "DB_ROUTE_STATEMENT_TIMEOUTS", {"/orders": 1500})
+    request = Request({"type": "http", "method": "GET", "path": "/orders", "headers": []})
+
+    async def run():
+        connection = await PooledAsyncConnection.connect(
+            cursor_factory=TimedAsyncCursor, **connect_kwargs(migrated_database)
+        )
+        try:
+            dependency = track_route_queries(request)
+            await dependency.__anext__()
+            queries = query_log._request_queries.get()
+
+            await _check_async_connection(connection)
+            await _apply_async_statement_timeout(connection)
+            await _apply_async_statement_timeout(connection)
+            assert queries.count == 0
+            assert connection.statement_timeout == 1500
+
+            cursor = await connection.execute("SHOW statement_timeout")
+            assert (await cursor.fetchone())[0] == "1500ms"
+            assert queries.count == 1
+            await dependency.aclose()
+        finally:
+            await connection.close()
+
+    asyncio.run(run())
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# The merchant routers import `utils.*` relative to Backend_Component
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "..", "Backend_Component"))
+
+from psycopg.pq import TransactionStatus  # noqa: E402
+from routers import dbop  # noqa: E402
+from utils import db_authenticate  # noqa: E402
+
+
+# Fake async cursor recording what the ad-hoc query endpoint runs and how it ends the transaction
+class RecordingConnection:
+    def __init__(self):
+        self.executed = []
+        self.committed = False
+        self.rolled_back = False
+
+    async def commit(self):
+        self.committed = True
+
+    async def rollback(self):
+        self.rolled_back = True
+
+
+class RecordingCursor:
+    description = [("id",)]
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    async def execute(self, query, params=None):
+        self.connection.executed.append(query)
+
+    async def fetchall(self):
+        return [(1,)]
+
+
+def run_query(query):
+    connection = RecordingConnection()
+    app = FastAPI()
+    app.include_router(dbop.router)
+
+    async def recording_db():
+        yield RecordingCursor(connection)
+
+    app.dependency_overrides[dbop.get_async_db] = recording_db
+    response = TestClient(app).get("/dbop/get_selected_results", params={"query": query})
+    return response, connection
+
+
+# Test that a single SELECT runs in a read-only transaction that is rolled back
+
+def test_select_runs_read_only_and_rolls_back():
+    response, connection = run_query("SELECT id FROM menu_table;")
+
+    assert response.status_code == 200
+    assert response.json() == [{"id": 1}]
+    assert connection.executed == ["SET TRANSACTION READ ONLY", "SELECT id FROM menu_table"]
+    assert connection.rolled_back
+    assert not connection.committed
+
+
+# Test that statements chained after a SELECT are rejected before anything runs
+
+def test_chained_statements_are_rejected():
+    response, connection = run_query("SELECT 1; DELETE FROM menu_table")
+
+    assert response.status_code == 400
+    assert connection.executed == []
+    assert not connection.committed
+
+
+def test_non_select_is_rejected():
+    response, connection = run_query("DELETE FROM menu_table")
+
+    assert response.status_code == 400
+    assert connection.executed == []
+
+
+# Test that a pooled async connection goes back to the pool rolled back, never committed
+
+class PooledFakeConnection(RecordingConnection):
+    closed = False
+    statement_timeout = 0
+
+    def __init__(self):
+        super().__init__()
+        self.info = SimpleNamespace(transaction_status=TransactionStatus.INTRANS)
+
+
+class FakePool:
+    def __init__(self, connection):
+        self.connection = connection
+        self.returned = False
+
+    async def getconn(self):
+        return self.connection
+
+    async def putconn(self, connection):
+        self.returned = True
+
+
+def test_async_connection_rolls_back_uncommitted_work():
+    connection = PooledFakeConnection()
+    pool = FakePool(connection)
+
+    async def fake_get_async_pool():
+        return pool
+
+    async def borrow():
+        async with db_authenticate.get_async_connection():
+            pass
+
+    with patch.object(db_authenticate, "get_async_pool", fake_get_async_pool):
+        asyncio.run(borrow())
+
+    assert connection.rolled_back
+    assert not connection.committed
+    assert pool.returned
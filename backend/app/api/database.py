@@ -1,12 +1,25 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from fastapi import Request, Response
+from .metrics import TimedAsyncAdaptedQueuePool, TimedQueuePool, register_engine
+from contextlib import contextmanager
+import contextvars
+import itertools
+import json
+import logging
 import os
+import threading
+import time
 from dotenv import load_dotenv
 from urllib.parse import quote_plus
 
 load_dotenv()  # Load environment variables from .env
 
+logger = logging.getLogger(__name__)
+
 # Construct the DATABASE_URL from individual components
 DB_USER = os.getenv("DB_USER")
 PASSWORD = quote_plus(os.getenv("PASSWORD"))  # URL-encode the password
@@ -15,14 +28,155 @@ PORT = os.getenv("PORT")
 DATABASE = os.getenv("DATABASE")
 
 DATABASE_URL = f"postgresql://{DB_USER}:{PASSWORD}@{HOST}:{PORT}/{DATABASE}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{PASSWORD}@{HOST}:{PORT}/{DATABASE}"
 
 if not DATABASE_URL:
     raise ValueError("No DATABASE_URL set for SQLAlchemy database")
 
-engine = create_engine(DATABASE_URL)
+# Connection pool settings (defaults match SQLAlchemy's own 5 + 10 pool)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))  # seconds, -1 disables recycling
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes")
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+# Read replicas: comma-separated postgresql:// URLs, empty means every read goes to the primary
+DB_REPLICA_URLS = [url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()]
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))  # seconds of replay lag tolerated
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "10"))  # seconds between health probes
+DB_STICKY_PRIMARY_SECONDS = float(os.getenv("DB_STICKY_PRIMARY_SECONDS", "10"))  # read-your-writes window
+
+
+def parse_route_settings(value: str) -> dict:
+    """Parse "<route path>=<int>;<route path>=<int>" into {route path: int}."""
+    settings = {}
+    for pair in value.split(";"):
+        if "=" in pair:
+            route, number = pair.rsplit("=", 1)
+            settings[route.strip()] = int(number)
+    return settings
+
+# Slow-query log and per-route limits. Route keys are path templates, e.g. "/api/menu/{restaurant_id}"
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 disables the timeout
+DB_QUERY_BUDGET = int(os.getenv("DB_QUERY_BUDGET", "20"))  # statements per request before a warning
+DB_ROUTE_STATEMENT_TIMEOUTS = parse_route_settings(os.getenv("DB_ROUTE_STATEMENT_TIMEOUTS", ""))
+DB_ROUTE_QUERY_BUDGETS = parse_route_settings(os.getenv("DB_ROUTE_QUERY_BUDGETS", ""))
+
+slow_query_logger = logging.getLogger("quefood.slow_query")
+
+
+class RequestQueries:
+    """Statement count and time for one HTTP request, tagged with its route template."""
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.count = 0
+        self.total_ms = 0.0
+
+    @property
+    def route(self) -> str:
+        # The router stores the matched route in the scope before the handler runs
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope.get("path")
+
+    @property
+    def statement_timeout(self) -> int:
+        return DB_ROUTE_STATEMENT_TIMEOUTS.get(self.route, DB_STATEMENT_TIMEOUT_MS)
+
+    @property
+    def budget(self) -> int:
+        return DB_ROUTE_QUERY_BUDGETS.get(self.route, DB_QUERY_BUDGET)
+
+
+_request_queries = contextvars.ContextVar("request_queries", default=None)
+
+
+@contextmanager
+def track_request_queries(scope):
+    """Attribute every statement run inside the block to this request and enforce its budget."""
+    queries = RequestQueries(scope)
+    token = _request_queries.set(queries)
+    try:
+        yield queries
+    finally:
+        _request_queries.reset(token)
+        if queries.count > queries.budget:
+            slow_query_logger.warning(json.dumps({
+                "event": "query_budget_exceeded",
+                "route": queries.route,
+                "method": queries.scope.get("method"),
+                "queries": queries.count,
+                "budget": queries.budget,
+                "total_ms": round(queries.total_ms, 2),
+            }))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration_ms = (time.perf_counter() - context._query_started) * 1000
+    queries = _request_queries.get()
+    if queries is not None:
+        queries.count += 1
+        queries.total_ms += duration_ms
+    if duration_ms >= DB_SLOW_QUERY_MS:
+        slow_query_logger.warning(json.dumps({
+            "event": "slow_query",
+            "route": queries.route if queries else None,
+            "duration_ms": round(duration_ms, 2),
+            "database": conn.engine.url.host,
+            "statement": " ".join(statement.split())[:2000],
+        }))
+
+
+def _apply_statement_timeout(dbapi_connection, connection_record, connection_proxy):
+    # Only re-issue SET when the route's timeout differs from what this connection already has
+    queries = _request_queries.get()
+    timeout = queries.statement_timeout if queries is not None else 0
+    if connection_record.info.get("statement_timeout", 0) != timeout:
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"SET statement_timeout = {int(timeout)}")
+        cursor.close()
+        # Commit so the setting survives the rollback the pool does when the connection is returned
+        dbapi_connection.commit()
+        connection_record.info["statement_timeout"] = timeout
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement on this engine and apply per-route statement timeouts."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "checkout", _apply_statement_timeout)
+
+
+engine = create_engine(DATABASE_URL, poolclass=TimedQueuePool, **POOL_OPTIONS)
+register_engine("primary", engine)
+instrument_engine(engine)
+
+# asyncpg-backed engine for handlers that run directly on the event loop
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=TimedAsyncAdaptedQueuePool, **POOL_OPTIONS)
+register_engine("primary_async", async_engine.sync_engine)
+instrument_engine(async_engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# expire_on_commit=False so committed objects can still be serialized without lazy IO
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 # Define the get_db function
@@ -32,3 +186,163 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Async counterpart of get_db for `async def` handlers
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Replay lag in seconds; 0 when fully caught up or when the server is not a standby
+REPLICA_LAG_SQL = text("""
+    SELECT COALESCE(
+        CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+             ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+        END, 0)
+""")
+
+
+class Replica:
+    """One read replica with a sync and an async engine and a cached health status."""
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.engine = create_engine(
+            url, poolclass=TimedQueuePool, connect_args={"connect_timeout": 2}, **POOL_OPTIONS
+        )
+        self.async_engine = create_async_engine(
+            make_url(url).set(drivername="postgresql+asyncpg"),
+            poolclass=TimedAsyncAdaptedQueuePool,
+            connect_args={"timeout": 2},
+            **POOL_OPTIONS,
+        )
+        register_engine(name, self.engine)
+        register_engine(f"{name}_async", self.async_engine.sync_engine)
+        instrument_engine(self.engine)
+        instrument_engine(self.async_engine)
+
+        # Unknown until the first probe finishes, so reads start on the primary
+        self.healthy = False
+        self.lag = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+        event.listen(self.engine, "handle_error", self._on_error)
+        event.listen(self.async_engine.sync_engine, "handle_error", self._on_error)
+
+    def _on_error(self, context):
+        # A dropped connection takes the replica out of rotation until the next probe
+        if context.is_disconnect:
+            logger.warning("Replica %s disconnected, falling back to primary", self.name)
+            self.healthy = False
+
+    def _check(self):
+        try:
+            with self.engine.connect() as connection:
+                self.lag = float(connection.execute(REPLICA_LAG_SQL).scalar())
+            self.healthy = self.lag <= DB_REPLICA_MAX_LAG
+            if not self.healthy:
+                logger.warning("Replica %s is %.1fs behind, falling back to primary", self.name, self.lag)
+        except Exception as e:
+            logger.warning("Replica %s health check failed: %s", self.name, e)
+            self.healthy = False
+        finally:
+            self._lock.release()
+
+    def is_usable(self) -> bool:
+        """Return the last known health, probing in the background when it is stale."""
+        now = time.monotonic()
+        if now - self._checked_at > DB_REPLICA_CHECK_INTERVAL and self._lock.acquire(blocking=False):
+            self._checked_at = now
+            threading.Thread(target=self._check, daemon=True).start()
+        return self.healthy
+
+
+class ReplicaRouter:
+    """Round-robins reads across healthy replicas."""
+
+    def __init__(self, urls):
+        self.replicas = [Replica(f"replica{i}", url) for i, url in enumerate(urls)]
+        self._counter = itertools.count()
+
+    def pick(self):
+        if not self.replicas:
+            return None
+        start = next(self._counter)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if replica.is_usable():
+                return replica
+        return None
+
+
+replica_router = ReplicaRouter(DB_REPLICA_URLS)
+
+# Read-your-writes: a write response sets this cookie to a deadline (Unix time) until which the
+# client's reads go to the primary. The client carries it, so every worker and instance honors it.
+DB_STICKY_COOKIE = "read_primary_until"
+
+
+def stick_to_primary(response: Response) -> None:
+    """Route the caller's reads to the primary for a while so they see their own writes."""
+    response.set_cookie(
+        DB_STICKY_COOKIE, f"{time.time() + DB_STICKY_PRIMARY_SECONDS:.3f}",
+        max_age=max(1, int(DB_STICKY_PRIMARY_SECONDS)), httponly=True, samesite="lax",
+    )
+
+
+def _reads_from_primary(request: Request) -> bool:
+    try:
+        deadline = float(request.cookies.get(DB_STICKY_COOKIE, ""))
+    except ValueError:
+        return False
+    # Deadlines further out than a write could have set (allowing for clock skew between
+    # hosts) are not honored
+    now = time.time()
+    return now < deadline <= now + 2 * DB_STICKY_PRIMARY_SECONDS
+
+
+def _pick_read_replica(request: Request):
+    if _reads_from_primary(request):
+        return None
+    return replica_router.pick()
+
+
+class RoutingSession(Session):
+    """Session that sends its statements to `info["replica"]` when set, and to the primary otherwise."""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get("replica")
+        if replica is not None and not self._flushing:
+            return replica
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+ReadSessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
+
+AsyncReadSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+# Read-only counterpart of get_db, served by a replica when one is healthy
+def get_read_db(request: Request):
+    db = ReadSessionLocal()
+    replica = _pick_read_replica(request)
+    if replica is not None:
+        db.info["replica"] = replica.engine
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Read-only counterpart of get_async_db
+async def get_async_read_db(request: Request):
+    async with AsyncReadSessionLocal() as db:
+        replica = _pick_read_replica(request)
+        if replica is not None:
+            db.sync_session.info["replica"] = replica.async_engine.sync_engine
+        yield db
@@ -0,0 +1,435 @@
+import itertools
+import os
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from math import asin, ceil, cos, floor, radians, sin, sqrt
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import text
+from .database import DB_REPLICA_MAX_LAG, DB_REPLICA_URLS
+from .metrics import CacheCounters, register_cache
+from .models import Address, Restaurant
+from .notifications import listener
+
+load_dotenv()
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE = 2 * 3.141592653589793 * EARTH_RADIUS_KM / 360
+
+GEO_CELL_DEGREES = float(os.getenv("GEO_CELL_DEGREES", "0.05"))  # ~5.5 km grid cells
+GEO_INDEX_TTL = float(os.getenv("GEO_INDEX_TTL", "300"))  # seconds before re-reading the database
+GEO_MAX_RADIUS_KM = float(os.getenv("GEO_MAX_RADIUS_KM", "50"))  # search radius cap for /nearest, /batch and menu search
+GEO_BATCH_MAX_POINTS = int(os.getenv("GEO_BATCH_MAX_POINTS", "500"))
+GEO_BATCH_CHUNK_ELEMENTS = int(os.getenv("GEO_BATCH_CHUNK_ELEMENTS", "1000000"))  # point/restaurant pairs per chunk
+
+# Nearby-result cache: geohash cell precision, radius bucket width and entry lifetime
+GEO_CACHE_PRECISION = int(os.getenv("GEO_CACHE_PRECISION", "6"))  # ~1.2 x 0.6 km cells
+GEO_CACHE_RADIUS_STEP_KM = float(os.getenv("GEO_CACHE_RADIUS_STEP_KM", "1"))
+GEO_CACHE_MAX_RADIUS_KM = float(os.getenv("GEO_CACHE_MAX_RADIUS_KM", "20"))  # larger radii bypass the cache
+GEO_CACHE_TTL = float(os.getenv("GEO_CACHE_TTL", "30"))
+GEO_CACHE_MAX_ENTRIES = int(os.getenv("GEO_CACHE_MAX_ENTRIES", "10000"))
+
+# Sent by the triggers in migrations/0010_location_change_notifications.sql
+LOCATION_CHANGED_CHANNEL = "restaurant_location_changed"
+
+# The index is read from replicas: after a change, wait out the replication lag before keeping a rebuild
+GEO_INDEX_SETTLE_SECONDS = DB_REPLICA_MAX_LAG if DB_REPLICA_URLS else 0.0
+
+# Matches the original `if address.latitude and address.longitude` check
+COORDINATES_SQL = text("""
+    SELECT a.restaurant_id, a.latitude, a.longitude, r.restaurant_type, r.pricing_levels, r.ratings
+    FROM address_table a
+    JOIN restaurant_table r ON r.restaurant_id = a.restaurant_id
+    WHERE a.latitude IS NOT NULL AND a.longitude IS NOT NULL AND a.latitude <> 0 AND a.longitude <> 0
+""")
+
+
+# Haversine formula to calculate distance between two points
+def haversine(lat1, lon1, lat2, lon2):
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
+    c = 2 * asin(sqrt(a))
+    return EARTH_RADIUS_KM * c
+
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    geohash, bits, value, even = [], 0, 0, True
+    while len(geohash) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            geohash.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return "".join(geohash)
+
+
+def geohash_bounds(geohash: str):
+    """Return (lat_min, lat_max, lon_min, lon_max) of a geohash cell."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+    return lat_range[0], lat_range[1], lon_range[0], lon_range[1]
+
+
+def haversine_many(latitude, longitude, latitudes, longitudes):
+    """Vectorized haversine in km; the arguments broadcast, e.g. one point against arrays of points."""
+    lat1, lon1 = np.radians(latitude), np.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arcsin(np.sqrt(a))
+
+
+class RestaurantGrid:
+    """
+    Restaurant coordinates bucketed into fixed lat/lon cells.
+
+    Ids, coordinates and the filterable restaurant attributes live in contiguous NumPy
+    arrays ordered by cell, and each cell maps to a (start, stop) slice of them. A radius query only measures the cells overlapping
+    the radius' bounding box, so its cost depends on how many restaurants are nearby
+    rather than on the catalog size.
+    """
+
+    def __init__(self, cell_degrees: float = GEO_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.columns = int(round(360 / cell_degrees))
+        self.cells = {}
+        self.ids = np.empty(0, dtype=np.int64)
+        self.latitudes = np.empty(0, dtype=np.float64)
+        self.longitudes = np.empty(0, dtype=np.float64)
+        self.restaurant_types = np.empty(0, dtype=str)
+        self.pricing_levels = np.empty(0, dtype=str)
+        self.ratings = np.empty(0, dtype=np.float64)
+        self.cell_rows = np.empty(0, dtype=np.int64)
+        self.cell_columns = np.empty(0, dtype=np.int64)
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    def _row(self, latitude: float) -> int:
+        return floor((latitude + 90) / self.cell_degrees)
+
+    def build(self, rows) -> "RestaurantGrid":
+        """
+        Index (restaurant_id, latitude, longitude, restaurant_type, pricing_levels, ratings)
+        rows, replacing any previous contents.
+        """
+        rows = list(rows)
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        latitudes = np.array([row[1] for row in rows], dtype=np.float64)
+        longitudes = np.array([row[2] for row in rows], dtype=np.float64)
+        restaurant_types = np.array([row[3] or "" for row in rows], dtype=str)
+        pricing_levels = np.array([row[4] or "" for row in rows], dtype=str)
+        ratings = np.array([np.nan if row[5] is None else float(row[5]) for row in rows], dtype=np.float64)
+
+        cell_rows = np.floor((latitudes + 90) / self.cell_degrees).astype(np.int64)
+        cell_columns = np.floor((longitudes + 180) / self.cell_degrees).astype(np.int64) % self.columns
+        keys = cell_rows * self.columns + cell_columns
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+
+        unique_keys, starts = np.unique(keys, return_index=True)
+        stops = np.append(starts[1:], len(keys))
+        self.cells = {
+            divmod(int(key), self.columns): (int(start), int(stop))
+            for key, start, stop in zip(unique_keys, starts, stops)
+        }
+        self.ids, self.latitudes, self.longitudes = ids[order], latitudes[order], longitudes[order]
+        self.restaurant_types, self.pricing_levels = restaurant_types[order], pricing_levels[order]
+        self.ratings = ratings[order]
+        self.cell_rows, self.cell_columns = np.divmod(keys, self.columns)
+        return self
+
+    def _candidates(self, latitude: float, longitude: float, radius_km: float) -> np.ndarray:
+        """Array positions of every restaurant in the cells covering the radius' bounding box."""
+        dlat = radius_km / KM_PER_DEGREE
+        lat_min, lat_max = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+
+        # Longitude degrees shrink towards the poles; size the box for the widest latitude it spans
+        widest = cos(radians(max(abs(lat_min), abs(lat_max))))
+        if widest < 1e-6 or radius_km / (KM_PER_DEGREE * widest) >= 180:
+            columns = np.arange(self.columns)
+        else:
+            dlon = radius_km / (KM_PER_DEGREE * widest)
+            first = floor((longitude - dlon + 180) / self.cell_degrees)
+            last = floor((longitude + dlon + 180) / self.cell_degrees)
+            columns = np.unique(np.arange(first, last + 1) % self.columns)
+        first_row, last_row = self._row(lat_min), self._row(lat_max)
+
+        # A box with more cells than are occupied (a large radius) is cheaper to resolve with
+        # one vectorized pass over every restaurant than with a lookup per cell
+        if (last_row - first_row + 1) * len(columns) > len(self.cells):
+            in_columns = np.zeros(self.columns, dtype=bool)
+            in_columns[columns] = True
+            inside = (self.cell_rows >= first_row) & (self.cell_rows <= last_row) & in_columns[self.cell_columns]
+            return np.flatnonzero(inside)
+
+        slices = []
+        for row in range(first_row, last_row + 1):
+            for column in columns.tolist():
+                cell = self.cells.get((row, column))
+                if cell:
+                    slices.append(np.arange(*cell))
+        return np.concatenate(slices) if slices else np.empty(0, dtype=np.int64)
+
+    def nearest(self, latitude: float, longitude: float, radius_km: float, limit: int = 10, **filters):
+        """Return up to `limit` (distance_km, restaurant_id) closer than radius_km, nearest first."""
+        positions, distances = self.search(latitude, longitude, radius_km, limit, **filters)
+        return [(float(distance), int(restaurant_id)) for distance, restaurant_id in zip(distances, self.ids[positions])]
+
+    def nearest_many(self, points, limit: int = 10):
+        """
+        Resolve many (latitude, longitude, radius_km) points in one vectorized pass. Each point
+        is paired with the restaurants in its own candidate cells, and all pairs are measured
+        and ranked together. Returns one nearest-first list of up to `limit`
+        (distance_km, restaurant_id) per point, with the same semantics as nearest().
+        """
+        results = [[] for _ in points]
+        if not points:
+            return results
+        latitudes, longitudes, radii = (np.array(column, dtype=np.float64) for column in zip(*points))
+        candidates = [self._candidates(*point) for point in points]
+
+        # Split the points so each chunk measures at most GEO_BATCH_CHUNK_ELEMENTS pairs
+        start = 0
+        while start < len(points):
+            stop, pairs = start + 1, len(candidates[start])
+            while stop < len(points) and pairs + len(candidates[stop]) <= GEO_BATCH_CHUNK_ELEMENTS:
+                pairs += len(candidates[stop])
+                stop += 1
+
+            point_rows = np.repeat(np.arange(start, stop), [len(c) for c in candidates[start:stop]])
+            positions = np.concatenate(candidates[start:stop])
+            distances = haversine_many(
+                latitudes[point_rows], longitudes[point_rows], self.latitudes[positions], self.longitudes[positions]
+            )
+            inside = distances < radii[point_rows]
+            point_rows, positions, distances = point_rows[inside], positions[inside], distances[inside]
+
+            ids = self.ids[positions]
+            order = np.lexsort((ids, distances, point_rows))
+            point_rows, ids, distances = point_rows[order], ids[order], distances[order]
+            bounds = np.searchsorted(point_rows, np.arange(start, stop + 1))
+            for row in range(start, stop):
+                first, last = bounds[row - start], min(bounds[row - start + 1], bounds[row - start] + limit)
+                results[row] = [(float(distances[i]), int(ids[i])) for i in range(first, last)]
+            start = stop
+        return results
+
+    def search(self, latitude: float, longitude: float, radius_km: float, limit: int = 10, after=None,
+               restaurant_types=None, pricing_levels=None, min_rating=None):
+        """
+        Array positions and distances of up to `limit` restaurants closer than radius_km, nearest first.
+
+        Filters are applied to the candidate arrays before any distance is computed. `after`
+        is the (distance_km, restaurant_id) of the last result of the previous page; only
+        results ordered after it are returned, so every page costs the same.
+        """
+        candidates = self._candidates(latitude, longitude, radius_km)
+        if restaurant_types:
+            candidates = candidates[np.isin(self.restaurant_types[candidates], restaurant_types)]
+        if pricing_levels:
+            candidates = candidates[np.isin(self.pricing_levels[candidates], pricing_levels)]
+        if min_rating is not None:
+            candidates = candidates[self.ratings[candidates] >= min_rating]
+
+        distances = haversine_many(latitude, longitude, self.latitudes[candidates], self.longitudes[candidates])
+        inside = distances < radius_km
+        if after is not None:
+            after_distance, after_id = after
+            ids = self.ids[candidates]
+            inside &= (distances > after_distance) | ((distances == after_distance) & (ids > after_id))
+        candidates, distances = candidates[inside], distances[inside]
+
+        if len(distances) > limit:
+            top = np.argpartition(distances, limit - 1)[:limit]
+            candidates, distances = candidates[top], distances[top]
+        order = np.lexsort((self.ids[candidates], distances))
+        return candidates[order], distances[order]
+
+
+class RestaurantLocationIndex:
+    """Process-wide RestaurantGrid loaded lazily from the database and rebuilt when it changes."""
+
+    def __init__(self):
+        self._grid = None
+        self._expires_at = 0.0
+        self._changed_at = float("-inf")
+        self._lock = threading.Lock()
+        self.version = 0  # bumped whenever the grid is dropped or rebuilt
+
+    def invalidate(self) -> None:
+        self._changed_at = time.monotonic()
+        self._grid = None
+        self.version += 1
+
+    def grid(self, db) -> RestaurantGrid:
+        listener.start()
+        grid = self._grid
+        if grid is not None and time.monotonic() < self._expires_at:
+            return grid
+        with self._lock:
+            if self._grid is None or time.monotonic() >= self._expires_at:
+                started = time.monotonic()
+                self._grid = RestaurantGrid().build(db.execute(COORDINATES_SQL).fetchall())
+                self._expires_at = time.monotonic() + GEO_INDEX_TTL
+                # A change reported during the read, or within the replica lag before it, may be
+                # missing: read again once it has settled
+                settled_at = self._changed_at + GEO_INDEX_SETTLE_SECONDS
+                if started <= settled_at:
+                    self._expires_at = min(self._expires_at, settled_at)
+                self.version += 1
+            return self._grid
+
+    def nearest(self, db, latitude: float, longitude: float, radius_km: float, limit: int = 10, **filters):
+        return self.grid(db).nearest(latitude, longitude, radius_km, limit, **filters)
+
+    def nearest_many(self, db, points, limit: int = 10):
+        return self.grid(db).nearest_many(points, limit)
+
+
+restaurant_locations = RestaurantLocationIndex()
+
+
+class NearbyResultCache:
+    """
+    Nearby-restaurant results cached per geohash cell and radius bucket.
+
+    An entry holds every restaurant that can be in the top `limit` for any point in the
+    cell at any radius up to the bucket, with its details. A hit re-ranks those by exact
+    distance from the caller's point, so cached and uncached responses are identical.
+    Entries expire after GEO_CACHE_TTL and are dropped when the location index changes.
+    """
+
+    def __init__(self, index: RestaurantLocationIndex, limit: int = 10):
+        self.index = index
+        self.limit = limit
+        self.counters = CacheCounters()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> dict:
+        return {**self.counters.snapshot(), "entries": len(self._entries), "listening": listener.connected}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def nearby(self, db, latitude: float, longitude: float, radius_km: float, load_details):
+        """
+        Return the `limit` nearest restaurants closer than radius_km, nearest first.
+        `load_details(db, matches)` turns (distance_km, restaurant_id) matches into detail dicts.
+        """
+        if radius_km > GEO_CACHE_MAX_RADIUS_KM:
+            return load_details(db, self.index.nearest(db, latitude, longitude, radius_km, self.limit))
+
+        cell = geohash_encode(latitude, longitude, GEO_CACHE_PRECISION)
+        key = (cell, ceil(radius_km / GEO_CACHE_RADIUS_STEP_KM))
+        # Read the version once the grid is current, so results are never stored under an
+        # older version than the grid they come from
+        grid = self.index.grid(db)
+        version = self.index.version
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] != version or entry[1] < time.monotonic()):
+                del self._entries[key]
+                entry = None
+            elif entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is None:
+            self.counters.miss()
+            entry = (version, time.monotonic() + GEO_CACHE_TTL,
+                     self._load(db, grid, cell, key[1] * GEO_CACHE_RADIUS_STEP_KM, load_details))
+            with self._lock:
+                self._entries[key] = entry
+                while len(self._entries) > GEO_CACHE_MAX_ENTRIES:
+                    self._entries.popitem(last=False)
+        else:
+            self.counters.hit()
+
+        return self._rank(entry[2], latitude, longitude, radius_km)
+
+    def _load(self, db, grid: RestaurantGrid, cell: str, bucket_km: float, load_details):
+        lat_min, lat_max, lon_min, lon_max = geohash_bounds(cell)
+        center_lat, center_lon = (lat_min + lat_max) / 2, (lon_min + lon_max) / 2
+        half_diagonal = max(
+            haversine(center_lat, center_lon, lat, lon) for lat in (lat_min, lat_max) for lon in (lon_min, lon_max)
+        )
+
+        # A point in the cell is within half_diagonal of the center, so its results lie within
+        # bucket + half_diagonal of the center, and no farther than the center's own
+        # limit-th nearest restaurant + 2 * half_diagonal.
+        reach = bucket_km + half_diagonal
+        rows, distances = grid.search(center_lat, center_lon, reach, limit=max(grid.size, 1))
+        if len(distances) >= self.limit:
+            cutoff = min(reach, distances[self.limit - 1] + 2 * half_diagonal)
+            rows, distances = rows[distances <= cutoff], distances[distances <= cutoff]
+
+        matches = [(float(distance), int(restaurant_id)) for distance, restaurant_id in zip(distances, grid.ids[rows])]
+        positions = {restaurant_id: row for (_, restaurant_id), row in zip(matches, rows)}
+
+        details = load_details(db, matches)
+        rows = [positions[detail["restaurant_id"]] for detail in details]
+        return grid.ids[rows], grid.latitudes[rows], grid.longitudes[rows], details
+
+    def _rank(self, entry, latitude: float, longitude: float, radius_km: float):
+        ids, latitudes, longitudes, details = entry
+        distances = haversine_many(latitude, longitude, latitudes, longitudes)
+        inside = np.flatnonzero(distances < radius_km)
+        order = inside[np.lexsort((ids[inside], distances[inside]))][:self.limit]
+        return [{**details[i], "distance_km": round(float(distances[i]), 2)} for i in order]
+
+
+nearby_results = NearbyResultCache(restaurant_locations)
+register_cache("nearby_restaurants", nearby_results)
+
+
+def _on_location_changed(payload: str = None) -> None:
+    restaurant_locations.invalidate()
+    nearby_results.clear()
+
+
+# Postgres reports address and restaurant changes from any process; while the listener is
+# disconnected, changes are picked up within GEO_INDEX_TTL.
+listener.subscribe(LOCATION_CHANGED_CHANNEL, _on_location_changed, on_reset=_on_location_changed)
+
+
+# Rebuild the index as soon as a session in this process commits an address or restaurant
+# change, without waiting for the notification.
+@event.listens_for(Session, "after_flush")
+def _flag_location_changes(session, flush_context):
+    if any(isinstance(obj, (Address, Restaurant)) for obj in itertools.chain(session.new, session.dirty, session.deleted)):
+        session.info["restaurant_locations_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_restaurant_locations(session):
+    if session.info.pop("restaurant_locations_changed", False):
+        _on_location_changed()
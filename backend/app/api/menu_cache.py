@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from .database import DB_REPLICA_MAX_LAG, DB_REPLICA_URLS
+from .metrics import CacheCounters, register_cache
+from .notifications import listener
+
+load_dotenv()
+
+MENU_CACHE_MAX_ENTRIES = int(os.getenv("MENU_CACHE_MAX_ENTRIES", "1000"))
+MENU_CACHE_TTL = float(os.getenv("MENU_CACHE_TTL", "300"))  # upper bound on staleness if a notification is lost
+
+# Sent by the triggers in migrations/0002_menu_change_notifications.sql with the restaurant_id as payload
+MENU_CHANGED_CHANNEL = "menu_changed"
+
+# Menus are read from replicas: after a change, wait out the replication lag before caching again
+MENU_CACHE_SETTLE_SECONDS = DB_REPLICA_MAX_LAG if DB_REPLICA_URLS else 0.0
+
+
+class MenuCache:
+    """
+    LRU of get_menu responses keyed by (restaurant_id, category).
+
+    Entries are dropped when Postgres reports a change to the restaurant's menu, photos
+    or name on MENU_CHANGED_CHANNEL. Nothing is cached while the listener is not
+    connected, since changes could be missed.
+    """
+
+    def __init__(self, max_entries: int = MENU_CACHE_MAX_ENTRIES, ttl: float = MENU_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.counters = CacheCounters()
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._changed_at = {}  # restaurant_id -> monotonic time of its last change
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> dict:
+        return {**self.counters.snapshot(), "entries": len(self._entries), "listening": listener.connected}
+
+    def token(self) -> int:
+        """Call before reading the database; put() ignores the result if a menu changed meanwhile."""
+        return self._generation
+
+    def get(self, restaurant_id: int, category):
+        listener.start()
+        key = (restaurant_id, category)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            self.counters.miss()
+            return None
+        self.counters.hit()
+        return entry[1]
+
+    def put(self, restaurant_id: int, category, response, token) -> None:
+        with self._lock:
+            if not listener.connected or token != self._generation:
+                return
+            if time.monotonic() - self._changed_at.get(restaurant_id, float("-inf")) < MENU_CACHE_SETTLE_SECONDS:
+                return
+            self._entries[(restaurant_id, category)] = (time.monotonic() + self.ttl, response)
+            self._entries.move_to_end((restaurant_id, category))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, restaurant_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            self._changed_at[restaurant_id] = time.monotonic()
+            for key in [key for key in self._entries if key[0] == restaurant_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+menu_cache = MenuCache()
+register_cache("menu", menu_cache)
+
+
+def _on_menu_changed(payload: str) -> None:
+    try:
+        menu_cache.invalidate(int(payload))
+    except ValueError:
+        menu_cache.clear()
+
+
+listener.subscribe(MENU_CHANGED_CHANNEL, _on_menu_changed, on_reset=menu_cache.clear)
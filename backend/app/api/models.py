@@ -1,7 +1,7 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, DateTime, Boolean, Numeric, LargeBinary, DECIMAL
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, Float, DateTime, Boolean, Numeric, LargeBinary, DECIMAL, Index
 from sqlalchemy.dialects.postgresql import JSON
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.orm import deferred, relationship
+from sqlalchemy.sql import func, text
 from datetime import datetime
 from .database import Base
 from sqlalchemy.ext.mutable import MutableList
@@ -45,6 +45,9 @@ class CustomerAccount(Base):
 # Manager Account Table
 class ManagerAccount(Base):
     __tablename__ = "manager_account_table"
+    __table_args__ = (
+        Index("ix_manager_account_table_name", "manager_account_name"),
+    )
 
     manager_id = Column(Integer, primary_key=True, index=True)
     restaurant_id = Column(Integer, ForeignKey("restaurant_table.restaurant_id"), nullable=False)
@@ -58,6 +61,9 @@ class ManagerAccount(Base):
 # Customer History Table
 class CustomerHistory(Base):
     __tablename__ = "customer_history_table"
+    __table_args__ = (
+        Index("ix_customer_history_customer_number", "customer_number"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True, index=True) 
     customer_number = Column(String(15), ForeignKey("customer_account_table.phone_number"), nullable=False)
@@ -73,6 +79,9 @@ class CustomerHistory(Base):
 # Menu Table
 class Menu(Base):
     __tablename__ = "menu_table"
+    __table_args__ = (
+        Index("ix_menu_table_restaurant_category", "restaurant_id", "category"),
+    )
 
     menu_id = Column(Integer, primary_key=True, index=True)
     restaurant_id = Column(Integer, ForeignKey("restaurant_table.restaurant_id"), nullable=False)
@@ -89,6 +98,10 @@ class Menu(Base):
 # Order Table
 class OrderTable(Base):
     __tablename__ = "order_table"
+    __table_args__ = (
+        Index("ix_order_table_customer_restaurant_status", "customer_id", "restaurant_id", "status"),
+        Index("ix_order_table_restaurant_status", "restaurant_id", "status"),
+    )
 
     order_number = Column(String, primary_key=True, index=True)
     due_date = Column(DateTime, default=datetime.utcnow)
@@ -138,14 +151,71 @@ class Restaurant(Base):
 
 class RestaurantPhotos(Base):
     __tablename__ = "restaurant_photos"
+    __table_args__ = (
+        Index("ix_restaurant_photos_restaurant_food", "restaurant_id", "food_name"),
+        Index("ix_restaurant_photos_file_name", "file_name"),
+    )
 
     photo_id = Column(Integer, primary_key=True, index=True)
     restaurant_id = Column(Integer, ForeignKey("restaurant_table.restaurant_id"), nullable=False)
     food_name = Column(String(500), nullable=True) 
     file_name = Column(String, nullable=False) 
     content_type = Column(String, nullable=False) 
-    photo_data = Column(LargeBinary, nullable=False) 
+    photo_data = deferred(Column(LargeBinary, nullable=True))  # legacy; bytes now live in the photo store. Loaded only on access
+    content_hash = Column(String(64), nullable=True)  # SHA-256 of the bytes, their photo store key
+    size_bytes = Column(BigInteger, nullable=True)
     upload_time = Column(DateTime, default=datetime.utcnow) 
 
     # Relationship with Restaurant
-    restaurant = relationship("Restaurant", back_populates="photos")
\ No newline at end of file
+    restaurant = relationship("Restaurant", back_populates="photos")
+
+
+# Per-restaurant menu version, bumped by database triggers on menu, photo and restaurant changes
+class MenuVersion(Base):
+    __tablename__ = "menu_versions"
+
+    restaurant_id = Column(Integer, primary_key=True, autoincrement=False)
+    # Rows are inserted by the bump_menu_version() trigger function, which relies on this default
+    version = Column(BigInteger, nullable=False, server_default=text("1"))
+    updated_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
+# Rows behind each menu version bump (menu items, photos, restaurant name), written by database triggers
+class MenuChange(Base):
+    __tablename__ = "menu_changes"
+
+    change_id = Column(BigInteger, primary_key=True, autoincrement=True)
+    restaurant_id = Column(Integer, nullable=False)
+    version = Column(BigInteger, nullable=False)
+    source = Column(String, nullable=False)  # table the change came from
+    row_id = Column(Integer, nullable=False)
+    food_name = Column(String, nullable=True)
+    changed_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_menu_changes_restaurant_version", "restaurant_id", "version"),
+    )
+
+
+# Resized copies of a stored photo, keyed by the original's content hash (see migrations/0007_photo_variants.sql)
+class PhotoVariant(Base):
+    __tablename__ = "photo_variants"
+
+    content_hash = Column(String(64), primary_key=True)
+    variant = Column(String(16), primary_key=True)  # thumb, card or full
+    format = Column(String(8), primary_key=True)  # webp or jpeg
+    variant_hash = Column(String(64), nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    width = Column(Integer, nullable=False)
+    height = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=text("timezone('utc', now())"))  # naive UTC, like upload_time
+
+
+# Photos whose variants failed to build, retried by Backend_Component's backfill script (see migrations/0012_photo_variant_failures.sql)
+class PhotoVariantFailure(Base):
+    __tablename__ = "photo_variant_failures"
+
+    content_hash = Column(String(64), primary_key=True)
+    attempts = Column(Integer, nullable=False, server_default=text("1"))
+    last_error = Column(String, nullable=False)
+    failed_at = Column(DateTime, nullable=False, server_default=text("timezone('utc', now())"))
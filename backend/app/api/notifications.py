@@ -0,0 +1,91 @@
+import logging
+import os
+import select
+import threading
+import time
+import psycopg2
+import psycopg2.extensions
+from dotenv import load_dotenv
+from .database import DATABASE_URL
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_RECONNECT_SECONDS = float(os.getenv("NOTIFY_RECONNECT_SECONDS", "5"))
+
+
+class NotificationListener:
+    """
+    Background thread that LISTENs on Postgres channels and dispatches NOTIFY payloads.
+
+    Notifications are only delivered by the primary and are lost while disconnected, so
+    every `on_reset` callback runs whenever the connection drops or is (re)established.
+    The thread starts on the first `start()` call, never at import time.
+    """
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.connected = False
+        self._handlers = {}
+        self._reset_handlers = []
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel: str, callback, on_reset=None) -> None:
+        self._handlers.setdefault(channel, []).append(callback)
+        if on_reset is not None:
+            self._reset_handlers.append(on_reset)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="pg-notify-listener", daemon=True)
+                self._thread.start()
+
+    def _reset(self) -> None:
+        for callback in self._reset_handlers:
+            callback()
+
+    def _run(self) -> None:
+        while True:
+            connection = None
+            try:
+                connection = psycopg2.connect(self.dsn)
+                connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with connection.cursor() as cursor:
+                    for channel in self._handlers:
+                        cursor.execute(f'LISTEN "{channel}"')
+                self._reset()
+                self.connected = True
+                self._listen(connection)
+            except Exception as e:
+                logger.warning("Notification listener disconnected: %s", e)
+            finally:
+                if self.connected:
+                    self.connected = False
+                    self._reset()
+                if connection is not None:
+                    connection.close()
+            time.sleep(NOTIFY_RECONNECT_SECONDS)
+
+    def _listen(self, connection) -> None:
+        while True:
+            if select.select([connection], [], [], 60) == ([], [], []):
+                # Idle: make sure the connection is still alive
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                continue
+            connection.poll()
+            while connection.notifies:
+                notify = connection.notifies.pop(0)
+                for callback in self._handlers.get(notify.channel, []):
+                    try:
+                        callback(notify.payload)
+                    except Exception:
+                        logger.exception("Notification handler for %s failed", notify.channel)
+
+
+listener = NotificationListener(DATABASE_URL)
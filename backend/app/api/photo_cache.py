@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from .database import DB_REPLICA_MAX_LAG, DB_REPLICA_URLS
+from .metrics import CacheCounters, register_cache
+from .notifications import listener
+from .photo_store import photo_path
+
+load_dotenv()
+
+PHOTO_CACHE_MB = float(os.getenv("PHOTO_CACHE_MB", "64"))
+PHOTO_CACHE_MAX_FILE_BYTES = int(os.getenv("PHOTO_CACHE_MAX_FILE_BYTES", str(1024 * 1024)))  # larger files stream from disk
+PHOTO_METADATA_MAX_ENTRIES = int(os.getenv("PHOTO_METADATA_MAX_ENTRIES", "10000"))
+PHOTO_METADATA_TTL = float(os.getenv("PHOTO_METADATA_TTL", "300"))  # upper bound on staleness if a notification is lost
+
+# Sent by the triggers in migrations/0009_photo_change_notifications.sql:
+# "file:<file_name>" for restaurant_photos rows, "hash:<content_hash>" for photo_variants rows
+PHOTO_CHANGED_CHANNEL = "photo_changed"
+
+# Photo metadata is read from replicas: after a change, wait out the replication lag before caching again
+PHOTO_METADATA_SETTLE_SECONDS = DB_REPLICA_MAX_LAG if DB_REPLICA_URLS else 0.0
+
+
+class PhotoBytesCache:
+    """
+    LRU of photo store files keyed by content hash, bounded by their total size. Stored
+    bytes never change under a hash, so entries only leave by eviction.
+    """
+
+    def __init__(self, budget_bytes: int, max_file_bytes: int = PHOTO_CACHE_MAX_FILE_BYTES):
+        self.budget_bytes = budget_bytes
+        self.max_file_bytes = max_file_bytes
+        self.resident_bytes = 0
+        self.counters = CacheCounters()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> dict:
+        return {
+            **self.counters.snapshot(),
+            "entries": len(self._entries),
+            "resident_bytes": self.resident_bytes,
+            "budget_bytes": self.budget_bytes,
+        }
+
+    def read(self, digest: str, size_bytes):
+        """The file's bytes, from memory when possible; None for files too large to cache."""
+        if size_bytes is None or size_bytes > min(self.max_file_bytes, self.budget_bytes):
+            return None
+        with self._lock:
+            data = self._entries.get(digest)
+            if data is not None:
+                self._entries.move_to_end(digest)
+        if data is not None:
+            self.counters.hit()
+            return data
+
+        self.counters.miss()
+        with open(photo_path(digest), "rb") as photo:
+            data = photo.read()
+        with self._lock:
+            if digest not in self._entries:
+                self._entries[digest] = data
+                self.resident_bytes += len(data)
+                while self.resident_bytes > self.budget_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.resident_bytes -= len(evicted)
+        return data
+
+
+class PhotoMetadataCache:
+    """
+    get_photo's database lookup keyed by (file_name, size). Entries are dropped when Postgres
+    reports a change to the photo or its variants on PHOTO_CHANGED_CHANNEL; nothing is cached
+    while the listener is not connected.
+    """
+
+    def __init__(self, max_entries: int = PHOTO_METADATA_MAX_ENTRIES, ttl: float = PHOTO_METADATA_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.counters = CacheCounters()
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._changed_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> dict:
+        return {**self.counters.snapshot(), "entries": len(self._entries), "listening": listener.connected}
+
+    def token(self) -> int:
+        """Call before reading the database; put() ignores the result if a photo changed meanwhile."""
+        return self._generation
+
+    def get(self, key):
+        listener.start()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            self.counters.miss()
+            return None
+        self.counters.hit()
+        return entry[1]
+
+    def put(self, key, rows, token) -> None:
+        with self._lock:
+            if not listener.connected or token != self._generation:
+                return
+            if time.monotonic() - self._changed_at < PHOTO_METADATA_SETTLE_SECONDS:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, rows)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, payload: str) -> None:
+        kind, _, value = payload.partition(":")
+        with self._lock:
+            self._generation += 1
+            self._changed_at = time.monotonic()
+            if kind == "file":
+                stale = [key for key in self._entries if key[0] == value]
+            elif kind == "hash":
+                stale = [key for key, (_, rows) in self._entries.items() if rows[0].content_hash == value]
+            else:
+                stale = list(self._entries)
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+photo_bytes = PhotoBytesCache(int(PHOTO_CACHE_MB * 1024 * 1024))
+register_cache("photo_bytes", photo_bytes)
+
+photo_metadata = PhotoMetadataCache()
+register_cache("photo_metadata", photo_metadata)
+
+listener.subscribe(PHOTO_CHANGED_CHANNEL, photo_metadata.invalidate, on_reset=photo_metadata.clear)
@@ -0,0 +1,95 @@
+import hashlib
+import io
+import os
+import tempfile
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Photo bytes live on disk under their SHA-256, e.g. <dir>/ab/cd/abcd...; Postgres keeps the hash.
+# This module is the photo store for both services: Backend_Component (utils/photo_store.py)
+# imports it to write uploads, the customer API to serve them. Each service runs from its own
+# directory, so the store is always an absolute path, the same one (or shared volume) in both.
+PHOTO_STORE_DIR = os.getenv("PHOTO_STORE_DIR", "/var/lib/quefood/photo_store")
+if not os.path.isabs(PHOTO_STORE_DIR):
+    raise ValueError(f"PHOTO_STORE_DIR must be an absolute path, got {PHOTO_STORE_DIR!r}")
+
+# When a proxy (e.g. nginx `internal` location aliased to PHOTO_STORE_DIR) serves the files,
+# responses only carry an X-Accel-Redirect to this prefix and the proxy sends the bytes.
+PHOTO_ACCEL_REDIRECT_PREFIX = os.getenv("PHOTO_ACCEL_REDIRECT_PREFIX", "")
+
+PHOTO_UPLOAD_CHUNK_BYTES = 64 * 1024
+
+# Hex digits of the content hash used as the photo version in URLs (?v=...)
+PHOTO_VERSION_LENGTH = 16
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def relative_path(digest: str) -> str:
+    if len(digest) != 64 or not all(c in "0123456789abcdef" for c in digest):
+        raise ValueError(f"Not a SHA-256 hex digest: {digest!r}")
+    return os.path.join(digest[:2], digest[2:4], digest)
+
+
+def photo_version(digest: str) -> str:
+    return digest[:PHOTO_VERSION_LENGTH]
+
+
+def photo_path(digest: str) -> str:
+    return os.path.join(PHOTO_STORE_DIR, relative_path(digest))
+
+
+class PhotoTooLarge(ValueError):
+    pass
+
+
+def save_photo_stream(stream, max_bytes: int = None) -> tuple:
+    """
+    Copy a binary file object into the store in PHOTO_UPLOAD_CHUNK_BYTES chunks, hashing as it
+    goes, and return (content_hash, size_bytes). Raises PhotoTooLarge past `max_bytes`.
+    """
+    os.makedirs(PHOTO_STORE_DIR, exist_ok=True)
+    hasher = hashlib.sha256()
+    size = 0
+    # Write aside (on the store's filesystem, so the rename is atomic): readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=PHOTO_STORE_DIR, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            while chunk := stream.read(PHOTO_UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise PhotoTooLarge(f"Photo is larger than {max_bytes} bytes")
+                hasher.update(chunk)
+                tmp.write(chunk)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+
+        digest = hasher.hexdigest()
+        path = photo_path(digest)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            # Fresh mtime: Backend_Component's scripts/gc_photo_store.py keeps recent files,
+            # whose rows may not be committed yet
+            os.utime(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.chmod(tmp_path, 0o644)  # mkstemp creates 0600; the proxy may read the store too
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return digest, size
+
+
+def save_photo(data: bytes) -> tuple:
+    """Store `data` if it is not stored yet and return (content_hash, size_bytes)."""
+    return save_photo_stream(io.BytesIO(data))
+
+
+def read_photo(digest: str) -> bytes:
+    with open(photo_path(digest), "rb") as photo:
+        return photo.read()
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from app.api.database import get_db
+from app.api.database import get_db, get_read_db, stick_to_primary
 from app.api.auth import decode_access_token
 from app.api.models import CustomerHistory, OrderTable , CustomerAccount
 from sqlalchemy import asc, desc
@@ -64,7 +64,7 @@ def get_phone_number_from_token(request: Request):
 # Fetch Orders Using Phone Number
 @router.get("/orders")
 def get_customer_orders(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     customer_number: str = Depends(get_phone_number_from_token)
 ):
     """Fetch full order details from `order_table` sorted by `due_date`."""
@@ -131,6 +131,7 @@ def get_customer_orders(
 @router.post("/history")
 def add_order_to_customer_history(
     request: OrderHistoryRequest, 
+    response: Response,
     db: Session = Depends(get_db),
     customer_number: str = Depends(get_phone_number_from_token)
 ):
@@ -164,6 +165,7 @@ def add_order_to_customer_history(
     )
 
     db.add(new_history)
+    stick_to_primary(response)
     db.commit()
     db.refresh(new_history)
 
@@ -1,55 +1,58 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from ..database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db, get_async_read_db, stick_to_primary
 from .. import models, schemas
+from ..http_cache import etag_matches, make_etag, not_modified
 from uuid import uuid4
 from typing import List, Dict
 from datetime import datetime
-from sqlalchemy import func
+from sqlalchemy import func, select
 from sqlalchemy.orm.attributes import flag_modified
 
 router = APIRouter()
 
+
 @router.post("/cart", response_model=schemas.CartRead)
-def create_or_get_cart(
+async def create_or_get_cart(
     cart_data: schemas.CartCreate,
-    db: Session = Depends(get_db)
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get the user's open cart or create one if none exists.
     """
     # Look up the customer by phone number
-    customer = db.query(models.CustomerAccount).filter(
+    customer = await db.scalar(select(models.CustomerAccount).where(
         models.CustomerAccount.phone_number == cart_data.phone_number
-    ).first()
+    ))
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
 
     # Look up the restaurant by ID
-    restaurant = db.query(models.Restaurant).filter(
+    restaurant = await db.scalar(select(models.Restaurant).where(
         models.Restaurant.restaurant_id == cart_data.restaurant_id
-    ).first()
+    ))
     if not restaurant:
         raise HTTPException(status_code=404, detail="Restaurant not found")
     
-    address = db.query(models.Address).filter(
+    address = await db.scalar(select(models.Address).where(
         models.Address.restaurant_id == cart_data.restaurant_id
-    ).first()
+    ))
     if not address:
         raise HTTPException(status_code=404, detail="Address not found")
 
     # Check if there's already an open cart for this customer
-    existing_cart = db.query(models.OrderTable).filter(
+    existing_cart = await db.scalar(select(models.OrderTable).where(
         models.OrderTable.customer_id == customer.customer_id,
         models.OrderTable.restaurant_id == cart_data.restaurant_id,
         models.OrderTable.status == "cart"
-    ).first()
+    ))
 
     if existing_cart:
         return existing_cart
 
     # Determine the next order number
-    last_order = db.query(models.OrderTable).order_by(models.OrderTable.order_number.desc()).first()
+    last_order = await db.scalar(select(models.OrderTable).order_by(models.OrderTable.order_number.desc()).limit(1))
     if last_order:
         last_order_number_str = last_order.order_number
         try:
@@ -77,17 +80,18 @@ def create_or_get_cart(
         state = address.state,
         city = address.city,
         street_address = address.street_address,
-        postal_code = address.postal_code,
+        postal_code = str(address.postal_code),  # an integer column, copied into a varchar one (asyncpg does not cast)
         latitude = address.latitude,
         longitude = address.longitude
     )
     db.add(new_cart)
-    db.commit()
-    db.refresh(new_cart)
+    stick_to_primary(response)
+    await db.commit()
+    await db.refresh(new_cart)
     return new_cart
 
 @router.get("/cart/{order_number}", response_model=schemas.CartRead)
-def get_cart(order_number: str, db: Session = Depends(get_db)):
+async def get_cart(order_number: str, db: AsyncSession = Depends(get_async_read_db)):
     """
     Retrieve a cart by order_number.
     """
@@ -96,10 +100,10 @@ def get_cart(order_number: str, db: Session = Depends(get_db)):
 
     print(f"📥 Received request for order_number: {order_number}")
 
-    cart = db.query(models.OrderTable).filter(
+    cart = await db.scalar(select(models.OrderTable).where(
         models.OrderTable.order_number == order_number,
         models.OrderTable.status == "cart"
-    ).first()
+    ))
 
     if not cart:
         raise HTTPException(status_code=404, detail="Cart not found or not open")
@@ -110,17 +114,18 @@ def get_cart(order_number: str, db: Session = Depends(get_db)):
 
 
 @router.put("/cart/{order_number}/prepare", response_model=schemas.CartRead)
-def prepare_order(
+async def prepare_order(
     order_number: str,
-    db: Session = Depends(get_db)
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Update the status of an order to 'prepare' by order_number.
     """
     # Fetch the order
-    order = db.query(models.OrderTable).filter(
+    order = await db.scalar(select(models.OrderTable).where(
         models.OrderTable.order_number == order_number
-    ).first()
+    ))
 
     # Handle case where order is not found
     if not order:
@@ -128,10 +133,11 @@ def prepare_order(
 
     # Update the status to 'prepare'
     order.status = "prepare"
+    stick_to_primary(response)
 
     # Commit changes to the database
-    db.commit()
-    db.refresh(order)
+    await db.commit()
+    await db.refresh(order)
 
     print(f"Order {order_number} status updated to 'prepare'")
 
@@ -140,28 +146,29 @@ def prepare_order(
 
 
 @router.put("/cart/{order_number}/items", response_model=schemas.CartRead)
-def add_item_to_cart(
+async def add_item_to_cart(
     order_number: str,
+    response: Response,
     item: Dict,  # Change to Dict
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Add an item to the cart's fooditems array.
     """
-    cart = db.query(models.OrderTable).filter(
+    cart = await db.scalar(select(models.OrderTable).where(
         models.OrderTable.order_number == order_number,
         models.OrderTable.status == "cart"
-    ).first()
+    ))
 
     if not cart:
         raise HTTPException(status_code=404, detail="Cart not found or not open")
 
     # Fetch menu info
-    menu_item = db.query(models.Menu).filter(
+    menu_item = await db.scalar(select(models.Menu).where(
         models.Menu.menu_id == item['menu_id'],
         models.Menu.food_name == item['food_name'],
         models.Menu.restaurant_id == cart.restaurant_id
-    ).first()
+    ))
     if not menu_item:
         raise HTTPException(status_code=404, detail="Menu item not found")
 
@@ -199,6 +206,7 @@ def add_item_to_cart(
 
     # Update the cart's fooditems
     cart.fooditems = current_items
+    stick_to_primary(response)
 
     flag_modified(cart, "fooditems")
 
@@ -207,39 +215,40 @@ def add_item_to_cart(
     cart.items_count = sum(i["quantity"] for i in current_items)
     cart.subtotal = sum(i["line_total"] for i in current_items)
     cart.taxes = round(cart.subtotal * 0.1, 2)  # example 10% tax
-    db.flush()
+    await db.flush()
     try: 
-        db.commit()
+        await db.commit()
     except Exception as e:
         print(f"Error during commit: {e}")
-    db.refresh(cart)
+    await db.refresh(cart)
     print(f"Cart after commit: {cart.fooditems}") #log cart after commit.
     return cart
 
 @router.put("/cart/{order_number}/items/{menu_id}", response_model=schemas.CartRead)
-def remove_item_from_cart(
+async def remove_item_from_cart(
     order_number: str,
+    response: Response,
     item: Dict,  # Use item dictionary for consistency
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Remove an item from the cart by menu_id or decrement its quantity.
     """
 
-    cart = db.query(models.OrderTable).filter(
+    cart = await db.scalar(select(models.OrderTable).where(
         models.OrderTable.order_number == order_number,
         models.OrderTable.status == "cart"
-    ).first()
+    ))
 
     if not cart:
         raise HTTPException(status_code=404, detail="Cart not found or not open")
 
     # Fetch menu info (optional, but good for validation)
-    menu_item = db.query(models.Menu).filter(
+    menu_item = await db.scalar(select(models.Menu).where(
         models.Menu.menu_id == item['menu_id'],
         models.Menu.food_name == item['food_name'],
         models.Menu.restaurant_id == cart.restaurant_id
-    ).first()
+    ))
     if not menu_item:
         raise HTTPException(status_code=404, detail="Menu item not found")
 
@@ -268,6 +277,7 @@ def remove_item_from_cart(
 
     # Update the cart's fooditems
     cart.fooditems = current_items
+    stick_to_primary(response)
 
     flag_modified(cart, "fooditems")
 
@@ -276,55 +286,57 @@ def remove_item_from_cart(
     cart.subtotal = sum(i["line_total"] for i in current_items)
     cart.taxes = round(cart.subtotal * 0.1, 2)  # example 10% tax
 
-    db.flush()
+    await db.flush()
     try:
-        db.commit()
+        await db.commit()
     except Exception as e:
         print(f"Error during commit: {e}")
-    db.refresh(cart)
+    await db.refresh(cart)
     print(f"Cart after commit: {cart.fooditems}")  # Log cart after commit
     return cart
 
 @router.post("/cart/{order_number}/checkout", response_model=schemas.CartRead)
-def checkout_cart(
+async def checkout_cart(
     order_number: str,
-    db: Session = Depends(get_db)
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Checkout the cart (set status to something else, e.g. 'new' or 'pending').
     """
-    cart = db.query(models.OrderTable).filter(
+    cart = await db.scalar(select(models.OrderTable).where(
         models.OrderTable.order_number == order_number,
         models.OrderTable.status == "cart"
-    ).first()
+    ))
 
     if not cart:
         raise HTTPException(status_code=404, detail="Cart not found or not open")
 
     # Move from 'cart' to 'new' or 'pending'
     cart.status = "new"
-    db.commit()
-    db.refresh(cart)
+    stick_to_primary(response)
+    await db.commit()
+    await db.refresh(cart)
     return cart
 
 @router.get("/cart/customer/{phone_number}/{restaurant_id}", response_model=schemas.CartRead)
-def get_cart_by_customer_and_restaurant(
+async def get_cart_by_customer_and_restaurant(
     phone_number: str,
     restaurant_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Retrieve a cart by customer phone number and restaurant ID.
     """
-    customer = db.query(models.CustomerAccount).filter(models.CustomerAccount.phone_number == phone_number).first()
+    customer = await db.scalar(select(models.CustomerAccount).where(models.CustomerAccount.phone_number == phone_number))
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
 
-    cart = db.query(models.OrderTable).filter(
+    cart = await db.scalar(select(models.OrderTable).where(
         models.OrderTable.customer_id == customer.customer_id,
         models.OrderTable.restaurant_id == restaurant_id,
         models.OrderTable.status == "cart"
-    ).first()
+    ))
 
     if not cart:
         raise HTTPException(status_code=404, detail="Cart not found")
@@ -332,21 +344,21 @@ def get_cart_by_customer_and_restaurant(
     return cart
 
 @router.get("/carts/{phone_number}", response_model=List[schemas.CartRead])
-def get_all_carts_by_customer(
+async def get_all_carts_by_customer(
     phone_number: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Retrieve all carts by customer ID.
     """
-    customer = db.query(models.CustomerAccount).filter(models.CustomerAccount.phone_number == phone_number).first()
+    customer = await db.scalar(select(models.CustomerAccount).where(models.CustomerAccount.phone_number == phone_number))
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
 
-    carts = db.query(models.OrderTable).filter(
+    carts = (await db.scalars(select(models.OrderTable).where(
         models.OrderTable.customer_id == customer.customer_id,
         models.OrderTable.status == "cart"
-    ).all()
+    ))).all()
 
     if not carts:
         raise HTTPException(status_code=404, detail="No carts found for this customer")
@@ -354,41 +366,55 @@ def get_all_carts_by_customer(
     return carts
 
 @router.get("/restaurant/{restaurant_id}", response_model=schemas.RestaurantRead)
-def get_all_carts_by_restaurant(
+async def get_all_carts_by_restaurant(
     restaurant_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    #get restaurant by id
-    restaurant = db.query(models.Restaurant).filter(models.Restaurant.restaurant_id == restaurant_id).first()
-    if not restaurant:
+    #get restaurant by id, with the version its ETag is derived from
+    row = (await db.execute(
+        select(models.Restaurant, models.MenuVersion.version)
+        .outerjoin(models.MenuVersion, models.MenuVersion.restaurant_id == models.Restaurant.restaurant_id)
+        .where(models.Restaurant.restaurant_id == restaurant_id)
+    )).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Restaurant not found")
-    
+
+    restaurant, version = row
+    etag = make_etag("restaurant", restaurant_id, version or 0)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers.update({"ETag": etag, "Cache-Control": "no-cache"})
+
     #return restaurant name and address
     return restaurant
 
 #delete cart
 @router.delete("/cart/{phone_number}/{restaurant_id}", response_model=schemas.CartRead)
-def delete_cart(
+async def delete_cart(
     phone_number: str,
-    restaurant_id: str,
-    db: Session = Depends(get_db)
+    restaurant_id: int,  # asyncpg requires an int bind for restaurant_id
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Delete a cart by customer phone number and restaurant ID.
     """
-    customer = db.query(models.CustomerAccount).filter(models.CustomerAccount.phone_number == phone_number).first()
+    customer = await db.scalar(select(models.CustomerAccount).where(models.CustomerAccount.phone_number == phone_number))
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
 
-    cart = db.query(models.OrderTable).filter(
+    cart = await db.scalar(select(models.OrderTable).where(
         models.OrderTable.customer_id == customer.customer_id,
         models.OrderTable.restaurant_id == restaurant_id,
         models.OrderTable.status == "cart"
-    ).first()
+    ))
 
     if not cart:
         raise HTTPException(status_code=404, detail="Cart not found")
 
-    db.delete(cart)
-    db.commit()
+    stick_to_primary(response)
+    await db.delete(cart)
+    await db.commit()
     return cart
\ No newline at end of file
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from typing import Optional
+from app.api.metrics import cache_snapshot, pool_snapshot
+import hmac
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+router = APIRouter()
+
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN")
+
+
+def verify_internal_token(x_internal_token: Optional[str] = Header(None)):
+    """
+    Require the X-Internal-Token header to match INTERNAL_API_TOKEN. Without a configured
+    token the internal endpoints are disabled: they answer 404, as if they did not exist.
+    """
+    if not INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_internal_token is None or not hmac.compare_digest(x_internal_token.encode(), INTERNAL_API_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@router.get("/pool", dependencies=[Depends(verify_internal_token)])
+def get_pool_metrics():
+    """Live connection pool usage and checkout wait-time histograms for this worker."""
+    return {"pid": os.getpid(), "pools": pool_snapshot()}
+
+
+@router.get("/cache", dependencies=[Depends(verify_internal_token)])
+def get_cache_metrics():
+    """Hit / miss counters and sizes of this worker's in-process caches."""
+    return {"pid": os.getpid(), "caches": cache_snapshot()}
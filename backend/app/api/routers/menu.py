@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import text 
-from app.api.database import get_db
+from app.api.database import get_async_read_db, get_read_db
+from app.api.geo import GEO_MAX_RADIUS_KM, restaurant_locations
+from app.api.menu_cache import menu_cache
+from app.api.http_cache import etag_matches, make_etag, not_modified
+from app.api.photo_store import PHOTO_VERSION_LENGTH
+from app.api import schemas
 from typing import List, Optional
 import logging
 import os
+import zlib
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,81 +21,322 @@ logging.basicConfig(level=logging.DEBUG)
 
 API_BASE_URL = os.getenv("API_BASE_URL")
 
+MENU_FORMAT = 2  # bump when the menu response shape changes, so clients drop ETags of the old shape
+
+# Each dish's photo URLs, matched by trimmed food_name and aggregated in the database. Stored
+# photos carry their content version (?v=), which lets clients cache them as immutable.
+DISH_PHOTOS_JOIN = f"""
+    LEFT JOIN LATERAL (
+        SELECT array_agg(
+                   CAST(:photo_base AS text) || rp.file_name
+                   || COALESCE('?v=' || left(rp.content_hash, {PHOTO_VERSION_LENGTH}), '')
+                   ORDER BY rp.photo_id
+               ) AS image_urls
+        FROM restaurant_photos rp
+        WHERE rp.restaurant_id = r.restaurant_id
+          AND rp.food_name <> ''
+          AND btrim(rp.food_name, E' \\t\\n\\r') = btrim(m.food_name, E' \\t\\n\\r')
+    ) p ON true"""
+
+# Restaurant name, menu items and their photo URLs in one round-trip. A restaurant with no
+# (matching) items yields a single row with a NULL menu_id, and an unknown restaurant yields no rows.
+MENU_SQL = """
+    SELECT r.restaurant_name, m.menu_id, m.food_name, m.food_description, m.food_price,
+           m.category, m.availability, m.restaurant_id, p.image_urls, COALESCE(v.version, 0) AS menu_version
+    FROM restaurant_table r
+    LEFT JOIN menu_versions v ON v.restaurant_id = r.restaurant_id
+    LEFT JOIN menu_table m ON m.restaurant_id = r.restaurant_id {category_filter}""" + DISH_PHOTOS_JOIN + """
+    WHERE r.restaurant_id = :restaurant_id
+    ORDER BY m.menu_id
+"""
+menu_sql = text(MENU_SQL.format(category_filter=""))
+menu_by_category_sql = text(MENU_SQL.format(category_filter="AND m.category ILIKE :category"))
+menu_version_sql = text("SELECT version FROM menu_versions WHERE restaurant_id = :restaurant_id")
+
+# Delta sync (see migrations/0005_menu_change_log.sql): dishes whose rows or photos changed
+menu_changed_items_sql = text(MENU_SQL.format(
+    category_filter="AND (m.menu_id = ANY(:menu_ids) OR btrim(m.food_name, E' \\t\\n\\r') = ANY(:food_names))"
+))
+restaurant_menu_version_sql = text("""
+    SELECT COALESCE(v.version, 0) AS version
+    FROM restaurant_table r
+    LEFT JOIN menu_versions v ON v.restaurant_id = r.restaurant_id
+    WHERE r.restaurant_id = :restaurant_id
+""")
+menu_changes_sql = text("""
+    SELECT version, source, row_id, food_name
+    FROM menu_changes
+    WHERE restaurant_id = :restaurant_id AND version > :since AND version <= :version
+""")
+
+# The same rows for many (restaurant_id, category pattern) items at once, tagged with the
+# item's 1-based position in the request. A NULL pattern means no category filter.
+BULK_MENU_SQL = """
+    SELECT f.item, r.restaurant_name, m.menu_id, m.food_name, m.food_description, m.food_price,
+           m.category, m.availability, m.restaurant_id, p.image_urls, COALESCE(v.version, 0) AS menu_version
+    FROM unnest(CAST(:restaurant_ids AS integer[]), CAST(:categories AS text[]))
+         WITH ORDINALITY AS f(restaurant_id, category, item)
+    JOIN restaurant_table r ON r.restaurant_id = f.restaurant_id
+    LEFT JOIN menu_versions v ON v.restaurant_id = r.restaurant_id
+    LEFT JOIN menu_table m ON m.restaurant_id = r.restaurant_id
+         AND (f.category IS NULL OR m.category ILIKE f.category)""" + DISH_PHOTOS_JOIN + """
+    ORDER BY f.item, m.menu_id
+"""
+bulk_menu_sql = text(BULK_MENU_SQL)
+MENU_BULK_MAX_RESTAURANTS = int(os.getenv("MENU_BULK_MAX_RESTAURANTS", "100"))
+
+
+# Dish search across restaurants, ranked by trigram word similarity of the query to the dish
+# name or category. `<%` is served by the trigram indexes in migrations/0004_menu_trigram_indexes.sql.
+SEARCH_SQL = """
+    SELECT m.menu_id, m.food_name, m.food_description, m.food_price, m.category, m.availability,
+           m.restaurant_id, r.restaurant_name{distance_column},
+           GREATEST(word_similarity(:q, m.food_name), word_similarity(:q, m.category)) AS score
+    FROM menu_table m
+    JOIN restaurant_table r ON r.restaurant_id = m.restaurant_id{nearby_join}
+    WHERE (:q <% m.food_name OR :q <% m.category)
+    ORDER BY score DESC{distance_order}, m.menu_id
+    LIMIT :limit
+"""
+search_sql = text(SEARCH_SQL.format(distance_column="", nearby_join="", distance_order=""))
+# Located search: only the nearby restaurants, with their distances, so equally good matches
+# come nearest first within the LIMIT
+search_near_sql = text(SEARCH_SQL.format(
+    distance_column=", n.distance_km",
+    nearby_join="""
+    JOIN unnest(CAST(:restaurant_ids AS integer[]), CAST(:distances AS double precision[]))
+         AS n(restaurant_id, distance_km) ON n.restaurant_id = m.restaurant_id""",
+    distance_order=", n.distance_km",
+))
+SEARCH_MAX_RESTAURANTS = 500  # nearest restaurants considered by a located search
+
+
+# Changes whenever the restaurant's menu_versions row is bumped (see migrations/0003_menu_versions.sql)
+def menu_etag(restaurant_id: int, version: int, category: Optional[str]) -> str:
+    return make_etag("menu", MENU_FORMAT, restaurant_id, version, zlib.crc32(category.encode()) if category else 0)
+
+
+# Construct Response: one entry per photo, or one with no image_url for dishes without photos
+def menu_entries(rows) -> list:
+    entries = []
+    for menu in rows:
+        if menu.menu_id is None:
+            continue
+        for image_url in menu.image_urls or [None]:
+            entries.append({
+                "menu_id": menu.menu_id,
+                "food_name": menu.food_name,
+                "food_description": menu.food_description or "No description available.",
+                "food_price": float(menu.food_price),
+                "category": menu.category,
+                "availability": menu.availability,
+                "restaurant_id": menu.restaurant_id,
+                "restaurant_name": menu.restaurant_name,
+                "image_url": image_url
+            })
+    return entries
+
+
+@router.post("/bulk")
+async def get_menus_bulk(request: schemas.MenuBulkRequest, db: AsyncSession = Depends(get_async_read_db)):
+    """
+    Menus of many restaurants in one call, each optionally filtered by category. Entries come
+    back in request order with get_menu's response shape; `menu` is null for unknown restaurants.
+    Cached menus are served from the menu cache and the rest are loaded with a single query.
+    """
+    items = [(item.restaurant_id, item.category or None) for item in request.restaurants]
+    if len(items) > MENU_BULK_MAX_RESTAURANTS:
+        raise HTTPException(status_code=400, detail=f"At most {MENU_BULK_MAX_RESTAURANTS} restaurants per request")
+
+    menus = [None] * len(items)
+    misses = []
+    for position, (restaurant_id, category) in enumerate(items):
+        cached = menu_cache.get(restaurant_id, category)
+        if cached is not None:
+            menus[position] = cached[1]
+        else:
+            misses.append(position)
+
+    try:
+        if misses:
+            token = menu_cache.token()
+            result = await db.execute(bulk_menu_sql, {
+                "restaurant_ids": [items[position][0] for position in misses],
+                "categories": [f"%{items[position][1]}%" if items[position][1] else None for position in misses],
+                "photo_base": f"{API_BASE_URL}/api/photos/",
+            })
+            rows_by_item = {}
+            for row in result.fetchall():
+                rows_by_item.setdefault(row.item, []).append(row)
+
+            for item, position in enumerate(misses, start=1):
+                rows = rows_by_item.get(item)
+                if rows:
+                    menus[position] = menu_entries(rows)
+                    restaurant_id, category = items[position]
+                    menu_cache.put(restaurant_id, category, (rows[0].menu_version, menus[position]), token)
+
+        return [
+            {"restaurant_id": restaurant_id, "category": category, "menu": menu}
+            for (restaurant_id, category), menu in zip(items, menus)
+        ]
+
+    except Exception as e:
+        logging.error(f"Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Declared before /{restaurant_id} so "search" is not parsed as a restaurant id
+@router.get("/search", response_model=List[dict])
+def search_menu(
+    q: str = Query(..., min_length=2, description="Dish or category to look for"),
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    radius: float = Query(GEO_MAX_RADIUS_KM, gt=0, le=GEO_MAX_RADIUS_KM),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db)
+):
+    """Dishes matching `q` across restaurants, best match first; only near the point when one is given."""
+    if (latitude is None) != (longitude is None):
+        raise HTTPException(status_code=400, detail="latitude and longitude must be given together")
+
+    try:
+        params = {"q": q, "limit": limit}
+        located = latitude is not None
+        if located:
+            nearby = restaurant_locations.nearest(db, latitude, longitude, radius, limit=SEARCH_MAX_RESTAURANTS)
+            if not nearby:
+                return []
+            params["restaurant_ids"] = [restaurant_id for _, restaurant_id in nearby]
+            params["distances"] = [distance for distance, _ in nearby]
+
+        rows = db.execute(search_near_sql if located else search_sql, params).fetchall()
+
+        results = []
+        for row in rows:
+            result = {
+                "menu_id": row.menu_id,
+                "food_name": row.food_name,
+                "food_description": row.food_description or "No description available.",
+                "food_price": float(row.food_price),
+                "category": row.category,
+                "availability": row.availability,
+                "restaurant_id": row.restaurant_id,
+                "restaurant_name": row.restaurant_name,
+                "score": round(row.score, 3),
+            }
+            if located:
+                result["distance_km"] = round(row.distance_km, 2)
+            results.append(result)
+        return results
+
+    except Exception as e:
+        logging.error(f"Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/{restaurant_id}", response_model=List[dict])
-def get_menu(
+async def get_menu(
     restaurant_id: int,
+    request: Request,
+    response: Response,
     category: Optional[str] = Query(None, description="Filter by category"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
+    # Served from the in-process cache until Postgres reports a change to this restaurant's menu
+    cached = menu_cache.get(restaurant_id, category)
+    if cached is not None:
+        version, menu = cached
+        etag = menu_etag(restaurant_id, version, category)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response.headers.update({"ETag": etag, "Cache-Control": "no-cache"})
+        return menu
+    token = menu_cache.token()
+
     try:
-        # Fetch Restaurant Name
-        restaurant_sql = text("""
-            SELECT restaurant_name FROM restaurant_table WHERE restaurant_id = :restaurant_id
-        """)
-        restaurant_result = db.execute(restaurant_sql, {"restaurant_id": restaurant_id})
-        restaurant_row = restaurant_result.fetchone()
-
-        if not restaurant_row:
+        # Revalidation: answer 304 from the version row alone when the client's copy is current
+        if request.headers.get("if-none-match"):
+            version = await db.scalar(menu_version_sql, {"restaurant_id": restaurant_id})
+            etag = menu_etag(restaurant_id, version, category)
+            if version is not None and etag_matches(request, etag):
+                return not_modified(etag)
+
+        params = {"restaurant_id": restaurant_id, "photo_base": f"{API_BASE_URL}/api/photos/"}
+        if category:
+            params["category"] = f"%{category}%"
+
+        result = await db.execute(menu_by_category_sql if category else menu_sql, params)
+        rows = result.fetchall()
+
+        if not rows:
             raise HTTPException(status_code=404, detail="Restaurant not found")
 
-        restaurant_name = restaurant_row.restaurant_name
+        etag = menu_etag(restaurant_id, rows[0].menu_version, category)
+        if etag_matches(request, etag):
+            return not_modified(etag)
 
-        # Fetch All Menu Items
-        menu_sql = text("""
-            SELECT menu_id, food_name, food_description, food_price, category, availability, restaurant_id
-            FROM menu_table
-            WHERE restaurant_id = :restaurant_id
-        """)
+        menu_response = menu_entries(rows)
+        menu_cache.put(restaurant_id, category, (rows[0].menu_version, menu_response), token)
+        response.headers.update({"ETag": etag, "Cache-Control": "no-cache"})
+        return menu_response
 
-        params = {"restaurant_id": restaurant_id}
-        if category:
-            menu_sql = text(menu_sql.text + " AND category ILIKE :category")
-            params["category"] = f"%{category}%"
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{restaurant_id}/changes")
+async def get_menu_changes(
+    restaurant_id: int,
+    since: int = Query(..., ge=0, description="Menu version the client already has"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    What changed in a restaurant's menu after version `since`. `changed` holds every get_menu
+    entry of each dish that was added or edited, or whose photos changed: the client replaces
+    all its entries with those menu_ids and drops the menu_ids in `removed`. When the change
+    log cannot cover `since` (too old, or the restaurant itself changed), `full` is true and
+    `changed` is the whole menu. The client keeps `version` for its next call.
+    """
+    try:
+        version = await db.scalar(restaurant_menu_version_sql, {"restaurant_id": restaurant_id})
+        if version is None:
+            raise HTTPException(status_code=404, detail="Restaurant not found")
+
+        delta = {"restaurant_id": restaurant_id, "version": version, "full": False, "changed": [], "removed": []}
+        if since == version:
+            return delta
+
+        changes = []
+        if since < version:
+            result = await db.execute(menu_changes_sql, {"restaurant_id": restaurant_id, "since": since, "version": version})
+            changes = result.fetchall()
+
+        # Every version in (since, version] must be logged, and only for menu items and photos
+        logged_versions = {change.version for change in changes}
+        if len(logged_versions) != version - since or any(change.source == "restaurant_table" for change in changes):
+            result = await db.execute(menu_sql, {"restaurant_id": restaurant_id, "photo_base": f"{API_BASE_URL}/api/photos/"})
+            delta.update(full=True, changed=menu_entries(result.fetchall()))
+            return delta
 
-        result = db.execute(menu_sql, params)
-        menu_items = result.fetchall()
-
-        if not menu_items:
-            return [] 
-
-        # Fetch All Photos (Raw SQL)
-        photo_sql = text("""
-            SELECT food_name, file_name 
-            FROM restaurant_photos
-            WHERE restaurant_id = :restaurant_id
-        """)
-        photo_result = db.execute(photo_sql, {"restaurant_id": restaurant_id})
-        photos = photo_result.fetchall()
-        
-        # Organize Photos by Food Name
-        photo_dict = {}
-        for photo in photos:
-            if photo.food_name:
-                trimmed_food_name = photo.food_name.strip()
-                if trimmed_food_name not in photo_dict:
-                    photo_dict[trimmed_food_name] = []
-                photo_dict[trimmed_food_name].append(f"{API_BASE_URL}/api/photos/{photo.file_name}")
-
-        # Construct Response
-        response = []
-        for menu in menu_items:
-            trimmed_menu_name = menu.food_name.strip() 
-            image_urls = photo_dict.get(trimmed_menu_name, [None]) 
-            for image_url in image_urls:
-                response.append({
-                    "menu_id": menu.menu_id,
-                    "food_name": menu.food_name,
-                    "food_description": menu.food_description or "No description available.",
-                    "food_price": float(menu.food_price),
-                    "category": menu.category,
-                    "availability": menu.availability,
-                    "restaurant_id": menu.restaurant_id,
-                    "restaurant_name": restaurant_name, 
-                    "image_url": image_url 
-                })
-
-        return response
+        menu_ids = {change.row_id for change in changes if change.source == "menu_table"}
+        food_names = {change.food_name for change in changes if change.source == "restaurant_photos" and change.food_name}
+        result = await db.execute(menu_changed_items_sql, {
+            "restaurant_id": restaurant_id,
+            "menu_ids": list(menu_ids),
+            "food_names": list(food_names),
+            "photo_base": f"{API_BASE_URL}/api/photos/",
+        })
+        rows = result.fetchall()
+        delta["changed"] = menu_entries(rows)
+        delta["removed"] = sorted(menu_ids - {row.menu_id for row in rows})
+        return delta
 
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,16 +1,173 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response
+from sqlalchemy import and_, func
 from sqlalchemy.orm import Session
-from app.api.database import get_db
-from app.api.models import RestaurantPhotos
+from app.api.database import get_read_db
+from app.api.models import PhotoVariant, RestaurantPhotos
+from app.api.http_cache import etag_matches, http_date, make_etag, not_modified_since
+from app.api.photo_cache import photo_bytes, photo_metadata
+from app.api.photo_store import PHOTO_ACCEL_REDIRECT_PREFIX, photo_path, photo_version, relative_path
+from typing import List, Optional
+import logging
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
 
 router = APIRouter()
 
+API_BASE_URL = os.getenv("API_BASE_URL")
+
+# Variants built on upload by Backend_Component (utils/photo_variants.py); "original" is the uploaded file.
+# Without ?size= the uploaded bytes are sent, as before there were variants
+PHOTO_SIZES = ("thumb", "card", "full", "original")
+PHOTO_DEFAULT_SIZE = os.getenv("PHOTO_DEFAULT_SIZE", "original")
+VARIANT_MEDIA_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+# For URLs carrying the photo's current version (?v=, as built by get_menu): the bytes never change
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def photo_url(file_name: str, content_hash: Optional[str], size: Optional[str] = None) -> str:
+    """URL of get_photo, versioned like the menu's image_url when the photo is in the photo store."""
+    params = []
+    if content_hash:
+        params.append(f"v={photo_version(content_hash)}")
+    if size:
+        params.append(f"size={size}")
+    return f"{API_BASE_URL}/api/photos/{file_name}" + ("?" + "&".join(params) if params else "")
+
+
+def preferred_format(request: Request, formats) -> Optional[str]:
+    """WebP when the client accepts it, JPEG otherwise."""
+    accepts_webp = "image/webp" in request.headers.get("accept", "")
+    for format in ("webp", "jpeg") if accepts_webp else ("jpeg",):
+        if format in formats:
+            return format
+    return None
+
+
+def stored_file_response(digest: str, media_type: str, photo_id: int, size_bytes, headers: dict = None) -> Response:
+    if PHOTO_ACCEL_REDIRECT_PREFIX:
+        return Response(
+            media_type=media_type,
+            headers={**(headers or {}), "X-Accel-Redirect": PHOTO_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + relative_path(digest)},
+        )
+
+    # Hot photos are answered from memory, larger ones stream from disk
+    try:
+        data = photo_bytes.read(digest, size_bytes)
+    except FileNotFoundError:
+        data = None
+    if data is not None:
+        return Response(content=data, media_type=media_type, headers=headers)
+
+    path = photo_path(digest)
+    if not os.path.isfile(path):
+        logging.error(f"Photo {photo_id} missing from the photo store: {path}")
+        raise HTTPException(status_code=404, detail="Image not found")
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
 @router.get("/photos/{file_name}", response_class=Response)
-def get_photo(file_name: str, db: Session = Depends(get_db)):
-    photo = db.query(RestaurantPhotos).filter(RestaurantPhotos.file_name == file_name).first()
+def get_photo(
+    file_name: str,
+    request: Request,
+    size: str = Query(PHOTO_DEFAULT_SIZE, description="thumb, card, full or original"),
+    v: Optional[str] = Query(None, description="Content version, as in the URLs built by get_menu"),
+    db: Session = Depends(get_read_db)
+):
+    if size not in PHOTO_SIZES:
+        raise HTTPException(status_code=400, detail=f"size must be one of {', '.join(PHOTO_SIZES)}")
 
-    if not photo:
+    # Metadata only, with the requested variant in each format: the bytes come from the photo store.
+    # Cached until Postgres reports a change to the photo or its variants.
+    rows = photo_metadata.get((file_name, size))
+    if rows is None:
+        token = photo_metadata.token()
+        rows = (
+            db.query(
+                RestaurantPhotos.photo_id, RestaurantPhotos.content_type, RestaurantPhotos.content_hash,
+                RestaurantPhotos.size_bytes, RestaurantPhotos.upload_time, PhotoVariant.format,
+                PhotoVariant.variant_hash, PhotoVariant.size_bytes.label("variant_size_bytes"), PhotoVariant.created_at,
+            )
+            .outerjoin(PhotoVariant, and_(
+                PhotoVariant.content_hash == RestaurantPhotos.content_hash, PhotoVariant.variant == size
+            ))
+            .filter(RestaurantPhotos.file_name == file_name)
+            .order_by(RestaurantPhotos.photo_id)
+            .all()
+        )
+        if rows and rows[0].content_hash is not None:
+            photo_metadata.put((file_name, size), rows, token)
+
+    if not rows:
         raise HTTPException(status_code=404, detail="Image not found")
+    photo = rows[0]
+
+    # Rows not moved out of Postgres yet (see migrations/0006_photo_store.py)
+    if photo.content_hash is None:
+        photo_data = db.query(RestaurantPhotos.photo_data).filter(RestaurantPhotos.photo_id == photo.photo_id).scalar()
+        if photo_data is None:
+            raise HTTPException(status_code=404, detail="Image not found")
+        return Response(content=photo_data, media_type=photo.content_type)
+
+    # The original is sent until its variants are built (or when it is asked for)
+    variants = {row.format: row for row in rows if row.photo_id == photo.photo_id and row.format}
+    format = preferred_format(request, variants)
+    if format is not None:
+        variant = variants[format]
+        digest, media_type, size_bytes = variant.variant_hash, VARIANT_MEDIA_TYPES[format], variant.variant_size_bytes
+        last_modified = max(filter(None, (photo.upload_time, variant.created_at)))
+    else:
+        digest, media_type, size_bytes = photo.content_hash, photo.content_type, photo.size_bytes
+        last_modified = photo.upload_time
+
+    # Strong validator: the hash of the bytes sent. A fallback original is not what this size
+    # will serve once variants exist, so it is never marked immutable.
+    headers = {"ETag": make_etag(digest), "Cache-Control": "public, no-cache"}
+    if v == photo_version(photo.content_hash) and (format is not None or size == "original"):
+        headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    if size != "original":
+        headers["Vary"] = "Accept"
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+
+    if etag_matches(request, headers["ETag"]) or (last_modified is not None and not_modified_since(request, last_modified)):
+        return Response(status_code=304, headers=headers)
+    return stored_file_response(digest, media_type, photo.photo_id, size_bytes, headers)
+
+
+@router.get("/restaurant/{restaurant_id}/photos", response_model=List[dict])
+def list_restaurant_photos(restaurant_id: int, db: Session = Depends(get_read_db)):
+    """Metadata of a restaurant's photos: ids, sizes and URLs, never the image bytes."""
+    try:
+        photos = (
+            db.query(
+                RestaurantPhotos.photo_id, RestaurantPhotos.food_name, RestaurantPhotos.file_name,
+                RestaurantPhotos.content_type, RestaurantPhotos.content_hash, RestaurantPhotos.upload_time,
+                # Rows still holding photo_data: Postgres reads the stored length without the bytes
+                func.coalesce(RestaurantPhotos.size_bytes, func.octet_length(RestaurantPhotos.photo_data)).label("size_bytes"),
+            )
+            .filter(RestaurantPhotos.restaurant_id == restaurant_id)
+            .order_by(RestaurantPhotos.photo_id)
+            .all()
+        )
+
+        return [
+            {
+                "photo_id": photo.photo_id,
+                "food_name": photo.food_name,
+                "file_name": photo.file_name,
+                "content_type": photo.content_type,
+                "size_bytes": photo.size_bytes,
+                "upload_time": photo.upload_time,
+                "url": photo_url(photo.file_name, photo.content_hash),
+                "thumbnail_url": photo_url(photo.file_name, photo.content_hash, "thumb"),
+            }
+            for photo in photos
+        ]
 
-    return Response(content=photo.photo_data, media_type=photo.content_type)
+    except Exception as e:
+        logging.error(f"Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
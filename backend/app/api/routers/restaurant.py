@@ -1,56 +1,144 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from app.api.database import get_db
+from app.api.database import get_read_db
 from app.api.models import Restaurant, Address
-from math import radians, cos, sin, asin, sqrt
-from typing import List
+from app.api.geo import GEO_BATCH_MAX_POINTS, GEO_MAX_RADIUS_KM, nearby_results, restaurant_locations
+from app.api import schemas
+from typing import List, Optional
+import base64
+import json
 
 router = APIRouter()
 
-# Haversine formula to calculate distance between two points
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a))
-    return R * c
-
-@router.get("/", response_model=List[dict]) 
-def get_nearby_restaurants(latitude: float, longitude: float, radius: float, db: Session = Depends(get_db)):
+
+# Nearest-page cursor: the (distance_km, restaurant_id) of the last restaurant returned
+def encode_cursor(distance: float, restaurant_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([distance, restaurant_id]).encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        distance, restaurant_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(distance), int(restaurant_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def restaurant_details(db: Session, matches):
+    """Load restaurant and address rows for (distance_km, restaurant_id) matches, keeping their order."""
+    if not matches:
+        return []
+
+    results = (
+        db.query(Restaurant, Address)
+        .join(Address, Restaurant.restaurant_id == Address.restaurant_id)
+        .filter(Restaurant.restaurant_id.in_([restaurant_id for _, restaurant_id in matches]))
+        .all()
+    )
+    rows = {restaurant.restaurant_id: (restaurant, address) for restaurant, address in results}
+
+    restaurants = []
+    for distance, restaurant_id in matches:
+        if restaurant_id not in rows:
+            continue
+        restaurant, address = rows[restaurant_id]
+        restaurants.append({
+            "restaurant_id": restaurant.restaurant_id,
+            "restaurant_name": restaurant.restaurant_name,
+            "ratings": restaurant.ratings,
+            "restaurant_type": restaurant.restaurant_type,
+            "pricing_levels": restaurant.pricing_levels,
+            "address": {
+                "city": address.city,
+                "state": address.state,
+                "street_address": address.street_address,
+                "postal_code": address.postal_code,
+                "latitude": address.latitude,
+                "longitude": address.longitude
+            },
+            "distance_km": round(distance, 2)
+        })
+    return restaurants
+
+
+@router.get("/", response_model=List[dict])
+def get_nearby_restaurants(
+    latitude: float,
+    longitude: float,
+    radius: float,
+    db: Session = Depends(get_read_db),
+):
+    # Any radius is accepted here, as it always was; GEO_MAX_RADIUS_KM only caps /nearest and /batch
+    try:
+        # Cached per geohash cell and radius bucket, re-ranked for this exact point; at most 10, nearest first
+        return nearby_results.nearby(db, latitude, longitude, radius, restaurant_details)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/nearest")
+def get_nearest_restaurants(
+    latitude: float,
+    longitude: float,
+    radius: float = Query(GEO_MAX_RADIUS_KM, gt=0, le=GEO_MAX_RADIUS_KM),
+    limit: int = Query(10, ge=1, le=50),
+    cursor: Optional[str] = None,
+    restaurant_type: Optional[List[str]] = Query(None),
+    pricing_levels: Optional[List[str]] = Query(None),
+    min_rating: Optional[float] = None,
+    db: Session = Depends(get_read_db),
+):
+    """
+    Restaurants nearest to a point, `limit` per page. Pass the returned `next_cursor` to get
+    the next page; filters are applied while selecting candidates, before paging.
+    """
+    after = decode_cursor(cursor) if cursor else None
     try:
-        # Join restaurant_table and address_table to get location data
-        results = (
-            db.query(Restaurant, Address)
-            .join(Address, Restaurant.restaurant_id == Address.restaurant_id)
-            .all()
+        # Fetch one extra match to know whether another page exists
+        matches = restaurant_locations.nearest(
+            db, latitude, longitude, radius, limit=limit + 1, after=after,
+            restaurant_types=restaurant_type, pricing_levels=pricing_levels, min_rating=min_rating,
         )
+        page = matches[:limit]
+        next_cursor = encode_cursor(*page[-1]) if len(matches) > limit else None
+        return {"restaurants": restaurant_details(db, page), "next_cursor": next_cursor}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/batch")
+def get_nearby_restaurants_batch(request: schemas.NearbyBatchRequest, db: Session = Depends(get_read_db)):
+    """
+    Nearby restaurants for many points at once: the same ranking as GET /, computed for all
+    points in one pass over the coordinate set, with one detail query for every result.
+    """
+    if len(request.points) > GEO_BATCH_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"At most {GEO_BATCH_MAX_POINTS} points per request")
+    if any(point.radius > GEO_MAX_RADIUS_KM for point in request.points):
+        raise HTTPException(status_code=400, detail=f"Radius must be at most {GEO_MAX_RADIUS_KM} km")
+    try:
+        points = [(point.latitude, point.longitude, point.radius) for point in request.points]
+        results = restaurant_locations.nearest_many(db, points, limit=10)
+
+        restaurant_ids = sorted({restaurant_id for matches in results for _, restaurant_id in matches})
+        details = {
+            restaurant["restaurant_id"]: restaurant
+            for restaurant in restaurant_details(db, [(0.0, restaurant_id) for restaurant_id in restaurant_ids])
+        }
 
-        nearby_restaurants = []
-        for restaurant, address in results:
-            if address.latitude and address.longitude:  # Fix Here
-                distance = haversine(latitude, longitude, address.latitude, address.longitude)  # Fix Here
-                if distance < radius:
-                    nearby_restaurants.append({
-                        "restaurant_id": restaurant.restaurant_id,
-                        "restaurant_name": restaurant.restaurant_name,
-                        "ratings": restaurant.ratings,
-                        "restaurant_type": restaurant.restaurant_type,
-                        "pricing_levels": restaurant.pricing_levels,
-                        "address": {
-                            "city": address.city,
-                            "state": address.state,
-                            "street_address": address.street_address,
-                            "postal_code": address.postal_code,
-                            "latitude": address.latitude,
-                            "longitude": address.longitude  # Fix Here
-                        },
-                        "distance_km": round(distance, 2)
-                    })
-
-        # Sort by distance
-        nearby_restaurants.sort(key=lambda x: x["distance_km"])
-        return nearby_restaurants[:10]  # Limit results to 10
+        return [
+            {
+                "latitude": point.latitude,
+                "longitude": point.longitude,
+                "radius": point.radius,
+                "restaurants": [
+                    {**details[restaurant_id], "distance_km": round(distance, 2)}
+                    for distance, restaurant_id in matches if restaurant_id in details
+                ],
+            }
+            for point, matches in zip(request.points, results)
+        ]
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
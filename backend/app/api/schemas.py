@@ -94,3 +94,22 @@ class RestaurantRead(BaseModel):
     class Config:
         from_attributes = True  # Pydantic v2 replacement for orm_mode
 
+
+
+# Batch nearby-restaurant search
+class NearbyPoint(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    radius: float = Field(..., gt=0)
+
+class NearbyBatchRequest(BaseModel):
+    points: List[NearbyPoint] = Field(..., min_length=1)
+
+
+# Bulk menu fetch
+class MenuBulkItem(BaseModel):
+    restaurant_id: int
+    category: Optional[str] = None
+
+class MenuBulkRequest(BaseModel):
+    restaurants: List[MenuBulkItem] = Field(..., min_length=1)
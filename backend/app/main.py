@@ -1,7 +1,7 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from pydantic import BaseModel
-from app.api.database import engine, Base
-from app.api.routers import auth, restaurant, menu, photo, cart
+from app.api.database import track_request_queries
+from app.api.routers import auth, restaurant, menu, photo, cart, internal
 from app.api.routers.CustomerFunction import router as customer_router
 import stripe
 import os
@@ -13,8 +13,13 @@ stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
 # Initialize FastAPI app
 app = FastAPI(title="QueFood Backend")
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# The schema is managed by migrations (`python -m app.migrate`), so startup opens no DB connection
+
+# Tag every SQL statement with the route that issued it and enforce per-route query budgets
+@app.middleware("http")
+async def log_request_queries(request: Request, call_next):
+    with track_request_queries(request.scope):
+        return await call_next(request)
 
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(restaurant.router, prefix="/api/restaurant", tags=["Restaurants"])
@@ -22,6 +27,7 @@ app.include_router(customer_router, prefix="/api/customer", tags=["Customer"])
 app.include_router(menu.router, prefix="/api/menu", tags=["Menu"])
 app.include_router(photo.router, prefix="/api", tags=["Photos"])
 app.include_router(cart.router, prefix="/api", tags=["Cart"])
+app.include_router(internal.router, prefix="/internal", tags=["Internal"], include_in_schema=False)
 
 # Define Pydantic model to receive amount from frontend
 class PaymentRequest(BaseModel):
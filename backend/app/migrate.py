@@ -0,0 +1,115 @@
+"""
+Apply the versioned migrations in backend/migrations in filename order.
+
+This is the only place the schema is created or changed; the app itself never
+touches DDL at startup. Applied versions are recorded in `schema_migrations`.
+
+- `.sql` files whose first line is `-- migrate: no-transaction` run statement by
+  statement in autocommit mode (needed for CREATE INDEX CONCURRENTLY); all
+  others run in a single transaction.
+- `.py` files define `upgrade(connection)` and run in a single transaction, unless
+  they set `TRANSACTIONAL = False`: those commit their own steps (e.g. per batch of a
+  data move, so no lock is held for the whole move) and must be safe to resume.
+
+Usage (from the backend/ directory):
+    python -m app.migrate            # apply pending migrations
+    python -m app.migrate --list     # show applied / pending versions
+"""
+import argparse
+import importlib.util
+from pathlib import Path
+from sqlalchemy import text
+from app.api.database import engine
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migrations"
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+
+
+def migration_files():
+    return sorted([*MIGRATIONS_DIR.glob("*.sql"), *MIGRATIONS_DIR.glob("*.py")], key=lambda path: path.name)
+
+
+def applied_versions(connection) -> set:
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(255) PRIMARY KEY,
+            applied_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+    """))
+    return {row.version for row in connection.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def split_statements(sql: str):
+    """Split a plain SQL script on statement-ending semicolons (no function bodies)."""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
+
+def load_python_migration(path: Path):
+    spec = importlib.util.spec_from_file_location(f"migrations.{path.stem}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def apply_migration(path: Path) -> None:
+    version = path.stem
+
+    if path.suffix == ".py":
+        module = load_python_migration(path)
+        if getattr(module, "TRANSACTIONAL", True):
+            with engine.begin() as connection:
+                module.upgrade(connection)
+                connection.execute(text("INSERT INTO schema_migrations (version) VALUES (:version)"), {"version": version})
+        else:
+            with engine.connect() as connection:
+                module.upgrade(connection)
+                connection.execute(text("INSERT INTO schema_migrations (version) VALUES (:version)"), {"version": version})
+                connection.commit()
+        return
+
+    sql = path.read_text()
+    if sql.startswith(NO_TRANSACTION_MARKER):
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            for statement in split_statements(sql):
+                connection.exec_driver_sql(statement)
+            connection.execute(text("INSERT INTO schema_migrations (version) VALUES (:version)"), {"version": version})
+    else:
+        with engine.begin() as connection:
+            connection.exec_driver_sql(sql)
+            connection.execute(text("INSERT INTO schema_migrations (version) VALUES (:version)"), {"version": version})
+
+
+def run_migrations() -> list:
+    """Apply every pending migration and return the versions applied."""
+    with engine.begin() as connection:
+        done = applied_versions(connection)
+
+    applied = []
+    for path in migration_files():
+        if path.stem in done:
+            continue
+        print(f"Applying migration {path.stem}")
+        apply_migration(path)
+        applied.append(path.stem)
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--list", action="store_true", help="list applied and pending migrations")
+    args = parser.parse_args()
+
+    if args.list:
+        with engine.begin() as connection:
+            done = applied_versions(connection)
+        for path in migration_files():
+            print(f"{'applied' if path.stem in done else 'pending'}  {path.stem}")
+        return
+
+    applied = run_migrations()
+    print(f"Applied {len(applied)} migration(s)" if applied else "Database is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Compare requests/sec of the sync (`get_db`) and async (`get_async_db`) session paths.
+
+Both endpoints run the same menu query against the configured database; the sync
+one goes through FastAPI's threadpool, the async one runs on the event loop.
+
+Usage (from the backend/ directory):
+    python -m benchmarks.bench_async_db --restaurant-id 1 --requests 2000 --concurrency 100
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import text
+
+from app.api.database import async_engine, engine, get_async_db, get_db
+
+MENU_SQL = text("""
+    SELECT menu_id, food_name, food_description, food_price, category, availability, restaurant_id
+    FROM menu_table
+    WHERE restaurant_id = :restaurant_id
+""")
+
+bench_app = FastAPI()
+
+
+@bench_app.get("/sync/{restaurant_id}")
+def sync_menu(restaurant_id: int, db: Session = Depends(get_db)):
+    return len(db.execute(MENU_SQL, {"restaurant_id": restaurant_id}).fetchall())
+
+
+@bench_app.get("/async/{restaurant_id}")
+async def async_menu(restaurant_id: int, db: AsyncSession = Depends(get_async_db)):
+    return len((await db.execute(MENU_SQL, {"restaurant_id": restaurant_id})).fetchall())
+
+
+async def run(path: str, total: int, concurrency: int) -> float:
+    """Fire `total` requests at `path` with at most `concurrency` in flight; return req/s."""
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=bench_app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                response = await client.get(path)
+                response.raise_for_status()
+
+        # Warm up the pools so connection setup is not measured
+        await asyncio.gather(*(one() for _ in range(concurrency)))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return total / (time.perf_counter() - start)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--restaurant-id", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    sync_rps = await run(f"/sync/{args.restaurant_id}", args.requests, args.concurrency)
+    async_rps = await run(f"/async/{args.restaurant_id}", args.requests, args.concurrency)
+
+    print(f"requests={args.requests} concurrency={args.concurrency}")
+    print(f"sync  (get_db)       : {sync_rps:8.1f} req/s")
+    print(f"async (get_async_db) : {async_rps:8.1f} req/s")
+    print(f"speedup              : {async_rps / sync_rps:8.2f}x")
+
+    await async_engine.dispose()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
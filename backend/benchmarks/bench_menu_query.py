@@ -0,0 +1,109 @@
+"""
+Compare get_menu latency with the old three round-trips (restaurant name, menu rows,
+photos matched in Python) against the single joined query in app.api.routers.menu.
+
+Both variants run against the configured database on the async engine, bypassing the
+menu cache, and must produce the same response.
+
+Usage (from the backend/ directory):
+    python -m benchmarks.bench_menu_query --restaurant-id 1 --iterations 500
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy.sql import text
+
+from app.api.database import AsyncSessionLocal, async_engine
+from app.api.photo_store import photo_version
+from app.api.routers.menu import API_BASE_URL, menu_sql
+
+RESTAURANT_SQL = text("SELECT restaurant_name FROM restaurant_table WHERE restaurant_id = :restaurant_id")
+MENU_ITEMS_SQL = text("""
+    SELECT menu_id, food_name, food_description, food_price, category, availability, restaurant_id
+    FROM menu_table
+    WHERE restaurant_id = :restaurant_id
+""")
+PHOTOS_SQL = text("SELECT food_name, file_name, content_hash FROM restaurant_photos WHERE restaurant_id = :restaurant_id")
+
+
+def menu_entry(menu, restaurant_name, image_url):
+    return {
+        "menu_id": menu.menu_id,
+        "food_name": menu.food_name,
+        "food_description": menu.food_description or "No description available.",
+        "food_price": float(menu.food_price),
+        "category": menu.category,
+        "availability": menu.availability,
+        "restaurant_id": menu.restaurant_id,
+        "restaurant_name": restaurant_name,
+        "image_url": image_url,
+    }
+
+
+async def three_round_trips(db, restaurant_id: int):
+    params = {"restaurant_id": restaurant_id}
+    restaurant_name = (await db.execute(RESTAURANT_SQL, params)).fetchone().restaurant_name
+    menu_items = (await db.execute(MENU_ITEMS_SQL, params)).fetchall()
+    if not menu_items:
+        return []
+    photo_dict = {}
+    for photo in (await db.execute(PHOTOS_SQL, params)).fetchall():
+        if photo.food_name:
+            version = f"?v={photo_version(photo.content_hash)}" if photo.content_hash else ""
+            photo_dict.setdefault(photo.food_name.strip(), []).append(f"{API_BASE_URL}/api/photos/{photo.file_name}{version}")
+    return [
+        menu_entry(menu, restaurant_name, image_url)
+        for menu in menu_items
+        for image_url in photo_dict.get(menu.food_name.strip(), [None])
+    ]
+
+
+async def one_round_trip(db, restaurant_id: int):
+    params = {"restaurant_id": restaurant_id, "photo_base": f"{API_BASE_URL}/api/photos/"}
+    rows = (await db.execute(menu_sql, params)).fetchall()
+    return [
+        menu_entry(menu, menu.restaurant_name, image_url)
+        for menu in rows if menu.menu_id is not None
+        for image_url in menu.image_urls or [None]
+    ]
+
+
+async def latencies_ms(variant, restaurant_id: int, iterations: int):
+    async with AsyncSessionLocal() as db:
+        await variant(db, restaurant_id)  # warm up the connection
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            await variant(db, restaurant_id)
+            samples.append((time.perf_counter() - start) * 1000)
+        return samples
+
+
+def sort_key(entry):
+    return entry["menu_id"], entry["image_url"] or ""
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--restaurant-id", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    async with AsyncSessionLocal() as db:
+        before = await three_round_trips(db, args.restaurant_id)
+        after = await one_round_trip(db, args.restaurant_id)
+    assert sorted(before, key=sort_key) == sorted(after, key=sort_key), "responses differ"
+
+    print(f"restaurant_id={args.restaurant_id} entries={len(after)} iterations={args.iterations}")
+    for name, variant in (("before (3 queries)", three_round_trips), ("after  (1 query)  ", one_round_trip)):
+        samples = await latencies_ms(variant, args.restaurant_id, args.iterations)
+        p95 = statistics.quantiles(samples, n=20)[-1]
+        print(f"{name}: mean {statistics.mean(samples):7.3f} ms  p50 {statistics.median(samples):7.3f} ms  p95 {p95:7.3f} ms")
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""
+Compare the per-request cost of the nearby-restaurant lookup: a per-row Python haversine
+scan over every restaurant (the old get_nearby_restaurants), one vectorized NumPy pass
+over every restaurant, and the grid in app.api.geo.
+
+Restaurants are synthetic and spread over cities of --per-city restaurants each, so the
+catalog grows by covering more area, as it does in production. No database is used.
+
+Usage (from the backend/ directory):
+    python -m benchmarks.bench_nearby --sizes 10000 100000 --queries 200 --radius 5
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from app.api.geo import RestaurantGrid, haversine, haversine_many
+
+
+def synthetic_restaurants(size: int, per_city: int, rng: random.Random):
+    """Return (cities, rows) with rows in the shape RestaurantGrid.build expects."""
+    cities = [(rng.uniform(25, 55), rng.uniform(-125, -65)) for _ in range(max(1, size // per_city))]
+    rows = []
+    for restaurant_id in range(1, size + 1):
+        latitude, longitude = cities[restaurant_id % len(cities)]
+        rows.append((
+            restaurant_id, latitude + rng.gauss(0, 0.1), longitude + rng.gauss(0, 0.1),
+            rng.choice(["Pizza", "Sushi", "Cafe"]), rng.choice(["$", "$$", "$$$"]), round(rng.uniform(1, 5), 1),
+        ))
+    return cities, rows
+
+
+def linear_scan(rows, latitude, longitude, radius):
+    matches = []
+    for restaurant_id, lat, lon, *_ in rows:
+        distance = haversine(latitude, longitude, lat, lon)
+        if distance < radius:
+            matches.append((distance, restaurant_id))
+    matches.sort()
+    return matches
+
+
+def vectorized_scan(grid, latitude, longitude, radius, limit=10):
+    distances = haversine_many(latitude, longitude, grid.latitudes, grid.longitudes)
+    inside = np.flatnonzero(distances < radius)
+    if len(inside) > limit:
+        inside = inside[np.argpartition(distances[inside], limit - 1)[:limit]]
+    return sorted(zip(distances[inside].tolist(), grid.ids[inside].tolist()))
+
+
+def per_query_ms(lookup, points) -> float:
+    start = time.perf_counter()
+    for latitude, longitude in points:
+        lookup(latitude, longitude)
+    return (time.perf_counter() - start) * 1000 / len(points)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--per-city", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--radius", type=float, default=5.0, help="search radius in km")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'restaurants':>12} {'build ms':>9} {'python ms/q':>12} {'numpy ms/q':>11} {'grid ms/q':>10}")
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        cities, rows = synthetic_restaurants(size, args.per_city, rng)
+        points = []
+        for _ in range(args.queries):
+            latitude, longitude = rng.choice(cities)
+            points.append((latitude + rng.gauss(0, 0.05), longitude + rng.gauss(0, 0.05)))
+
+        start = time.perf_counter()
+        grid = RestaurantGrid().build(rows)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        for latitude, longitude in points[:20]:
+            expected = linear_scan(rows, latitude, longitude, args.radius)[:10]
+            assert [id for _, id in grid.nearest(latitude, longitude, args.radius)] == [id for _, id in expected]
+            assert [id for _, id in vectorized_scan(grid, latitude, longitude, args.radius)] == [id for _, id in expected]
+
+        python_ms = per_query_ms(lambda lat, lon: linear_scan(rows, lat, lon, args.radius), points)
+        numpy_ms = per_query_ms(lambda lat, lon: vectorized_scan(grid, lat, lon, args.radius), points)
+        grid_ms = per_query_ms(lambda lat, lon: grid.nearest(lat, lon, args.radius), points)
+        print(f"{size:>12} {build_ms:>9.1f} {python_ms:>12.3f} {numpy_ms:>11.3f} {grid_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Time from process start to the first served request for a fresh uvicorn worker.
+
+Starts `uvicorn app.main:app` repeatedly and polls GET / until it answers 200.
+
+Usage (from the backend/ directory):
+    python -m benchmarks.bench_startup --runs 5 --port 8765
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def time_to_first_request(port: int, timeout: float) -> float:
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/", timeout=0.5).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.TransportError:
+                pass
+            time.sleep(0.01)
+        raise RuntimeError(f"No response within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    timings = [time_to_first_request(args.port, args.timeout) for _ in range(args.runs)]
+    for run, seconds in enumerate(timings, 1):
+        print(f"run {run}: {seconds * 1000:8.1f} ms")
+    print(f"median: {statistics.median(timings) * 1000:8.1f} ms  min: {min(timings) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+"""Baseline schema: every table declared in app.api.models (no-op for tables that already exist)."""
+from app.api.database import Base
+from app.api import models  # noqa: F401  (registers the tables on Base.metadata)
+
+
+def upgrade(connection):
+    Base.metadata.create_all(bind=connection)
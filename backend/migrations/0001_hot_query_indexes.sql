@@ -0,0 +1,26 @@
+-- migrate: no-transaction
+-- Indexes for the filters used by the cart, menu, photo and merchant (dbop) endpoints.
+-- Built CONCURRENTLY so the tables stay writable while they build. A failed build
+-- leaves an INVALID index behind; drop it before re-running this migration.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_order_table_customer_restaurant_status
+    ON order_table (customer_id, restaurant_id, status);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_order_table_restaurant_status
+    ON order_table (restaurant_id, status);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_menu_table_restaurant_category
+    ON menu_table (restaurant_id, category);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_restaurant_photos_restaurant_food
+    ON restaurant_photos (restaurant_id, food_name);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_restaurant_photos_file_name
+    ON restaurant_photos (file_name);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_customer_history_customer_number
+    ON customer_history_table (customer_number);
+
+-- Merchant login looks managers up by account name
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_manager_account_table_name
+    ON manager_account_table (manager_account_name);
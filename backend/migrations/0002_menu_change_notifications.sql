@@ -0,0 +1,30 @@
+-- Publish the restaurant_id on the `menu_changed` channel whenever a restaurant's menu
+-- items, photos or name change, from any service. The backend's menu cache LISTENs on it.
+-- Postgres folds identical notifications within a transaction, so bulk updates send one.
+
+CREATE OR REPLACE FUNCTION notify_menu_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM pg_notify('menu_changed', OLD.restaurant_id::text);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM pg_notify('menu_changed', NEW.restaurant_id::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS menu_table_menu_changed ON menu_table;
+CREATE TRIGGER menu_table_menu_changed
+    AFTER INSERT OR UPDATE OR DELETE ON menu_table
+    FOR EACH ROW EXECUTE FUNCTION notify_menu_changed();
+
+DROP TRIGGER IF EXISTS restaurant_photos_menu_changed ON restaurant_photos;
+CREATE TRIGGER restaurant_photos_menu_changed
+    AFTER INSERT OR UPDATE OR DELETE ON restaurant_photos
+    FOR EACH ROW EXECUTE FUNCTION notify_menu_changed();
+
+DROP TRIGGER IF EXISTS restaurant_table_menu_changed ON restaurant_table;
+CREATE TRIGGER restaurant_table_menu_changed
+    AFTER UPDATE OF restaurant_name OR DELETE ON restaurant_table
+    FOR EACH ROW EXECUTE FUNCTION notify_menu_changed();
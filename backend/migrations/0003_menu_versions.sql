@@ -0,0 +1,43 @@
+-- Per-restaurant menu version used for menu and restaurant ETags. The `menu_changed`
+-- trigger function from 0002 now also bumps the restaurant's version, in the same
+-- transaction as the change, and restaurant inserts fire it as well.
+
+CREATE TABLE IF NOT EXISTS menu_versions (
+    restaurant_id INTEGER PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+-- 0000 may already have created the table from the model, without a database default
+ALTER TABLE menu_versions ALTER COLUMN version SET DEFAULT 1;
+
+INSERT INTO menu_versions (restaurant_id)
+SELECT restaurant_id FROM restaurant_table
+ON CONFLICT (restaurant_id) DO NOTHING;
+
+-- 0005 changes the return type, which CREATE OR REPLACE cannot undo when this is re-applied
+DROP FUNCTION IF EXISTS bump_menu_version(INTEGER);
+CREATE OR REPLACE FUNCTION bump_menu_version(changed_restaurant_id INTEGER) RETURNS void AS $$
+    INSERT INTO menu_versions (restaurant_id) VALUES (changed_restaurant_id)
+    ON CONFLICT (restaurant_id) DO UPDATE SET version = menu_versions.version + 1, updated_at = now();
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION notify_menu_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.restaurant_id IS NOT NULL THEN
+        PERFORM bump_menu_version(OLD.restaurant_id);
+        PERFORM pg_notify('menu_changed', OLD.restaurant_id::text);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.restaurant_id IS NOT NULL
+            AND (TG_OP = 'INSERT' OR NEW.restaurant_id IS DISTINCT FROM OLD.restaurant_id) THEN
+        PERFORM bump_menu_version(NEW.restaurant_id);
+        PERFORM pg_notify('menu_changed', NEW.restaurant_id::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS restaurant_table_menu_changed ON restaurant_table;
+CREATE TRIGGER restaurant_table_menu_changed
+    AFTER INSERT OR UPDATE OF restaurant_name OR DELETE ON restaurant_table
+    FOR EACH ROW EXECUTE FUNCTION notify_menu_changed();
@@ -0,0 +1,12 @@
+-- migrate: no-transaction
+-- Trigram indexes for menu category filters (ILIKE '%...%') and dish search (word
+-- similarity). They need the pg_trgm extension, so they are not declared on the models
+-- (0000 creates the tables before the extension exists).
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_menu_table_category_trgm
+    ON menu_table USING gin (category gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_menu_table_food_name_trgm
+    ON menu_table USING gin (food_name gin_trgm_ops);
@@ -0,0 +1,75 @@
+-- Log of the rows behind every menu version bump, read by GET /api/menu/{id}/changes so
+-- clients holding a copy of a menu can sync only what changed. Each bump from 0003 now
+-- records the menu item, photo or restaurant row (and its trimmed food_name, which ties
+-- photos to dishes) under the new version. Only the last 1000 versions of each
+-- restaurant are kept; older clients get the full menu instead.
+
+CREATE TABLE IF NOT EXISTS menu_changes (
+    change_id BIGSERIAL PRIMARY KEY,
+    restaurant_id INTEGER NOT NULL,
+    version BIGINT NOT NULL,
+    source VARCHAR NOT NULL,
+    row_id INTEGER NOT NULL,
+    food_name VARCHAR,
+    changed_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_menu_changes_restaurant_version ON menu_changes (restaurant_id, version);
+
+-- Now returns the new version
+DROP FUNCTION IF EXISTS bump_menu_version(INTEGER);
+CREATE FUNCTION bump_menu_version(changed_restaurant_id INTEGER) RETURNS BIGINT AS $$
+    INSERT INTO menu_versions (restaurant_id) VALUES (changed_restaurant_id)
+    ON CONFLICT (restaurant_id) DO UPDATE SET version = menu_versions.version + 1, updated_at = now()
+    RETURNING version;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION log_menu_change(
+    changed_restaurant_id INTEGER, changed_version BIGINT, changed_source TEXT, changed_row JSONB, key_column TEXT
+) RETURNS void AS $$
+    INSERT INTO menu_changes (restaurant_id, version, source, row_id, food_name)
+    VALUES (changed_restaurant_id, changed_version, changed_source, (changed_row ->> key_column)::integer,
+            btrim(changed_row ->> 'food_name', E' \t\n\r'));
+    DELETE FROM menu_changes
+    WHERE restaurant_id = changed_restaurant_id AND version <= changed_version - 1000;
+$$ LANGUAGE sql;
+
+-- TG_ARGV[0] names the table's primary key column
+CREATE OR REPLACE FUNCTION notify_menu_changed() RETURNS trigger AS $$
+DECLARE
+    changed_version BIGINT;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.restaurant_id IS NOT NULL THEN
+        changed_version := bump_menu_version(OLD.restaurant_id);
+        PERFORM log_menu_change(OLD.restaurant_id, changed_version, TG_TABLE_NAME, to_jsonb(OLD), TG_ARGV[0]);
+        -- Renamed in place: dishes matching the new food_name change as well
+        IF TG_OP = 'UPDATE' AND NEW.restaurant_id IS NOT DISTINCT FROM OLD.restaurant_id
+                AND to_jsonb(NEW) ->> 'food_name' IS DISTINCT FROM to_jsonb(OLD) ->> 'food_name' THEN
+            PERFORM log_menu_change(NEW.restaurant_id, changed_version, TG_TABLE_NAME, to_jsonb(NEW), TG_ARGV[0]);
+        END IF;
+        PERFORM pg_notify('menu_changed', OLD.restaurant_id::text);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.restaurant_id IS NOT NULL
+            AND (TG_OP = 'INSERT' OR NEW.restaurant_id IS DISTINCT FROM OLD.restaurant_id) THEN
+        changed_version := bump_menu_version(NEW.restaurant_id);
+        PERFORM log_menu_change(NEW.restaurant_id, changed_version, TG_TABLE_NAME, to_jsonb(NEW), TG_ARGV[0]);
+        PERFORM pg_notify('menu_changed', NEW.restaurant_id::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS menu_table_menu_changed ON menu_table;
+CREATE TRIGGER menu_table_menu_changed
+    AFTER INSERT OR UPDATE OR DELETE ON menu_table
+    FOR EACH ROW EXECUTE FUNCTION notify_menu_changed('menu_id');
+
+DROP TRIGGER IF EXISTS restaurant_photos_menu_changed ON restaurant_photos;
+CREATE TRIGGER restaurant_photos_menu_changed
+    AFTER INSERT OR UPDATE OR DELETE ON restaurant_photos
+    FOR EACH ROW EXECUTE FUNCTION notify_menu_changed('photo_id');
+
+DROP TRIGGER IF EXISTS restaurant_table_menu_changed ON restaurant_table;
+CREATE TRIGGER restaurant_table_menu_changed
+    AFTER INSERT OR UPDATE OF restaurant_name OR DELETE ON restaurant_table
+    FOR EACH ROW EXECUTE FUNCTION notify_menu_changed('restaurant_id');
@@ -0,0 +1,52 @@
+"""
+Move photo bytes out of restaurant_photos into the content-addressed photo store
+(app.api.photo_store, PHOTO_STORE_DIR). Rows keep content_hash and size_bytes; photo_data
+becomes nullable and is cleared once the file is written. Run it where PHOTO_STORE_DIR is
+the directory the API servers read from.
+
+The schema change commits first, then each batch of moved photos commits on its own, so
+photo reads and uploads only wait for one batch at a time. An interrupted run resumes with
+the photos not moved yet.
+"""
+from sqlalchemy import text
+from app.api.photo_store import save_photo
+
+BATCH_SIZE = 100
+
+# Commits its own steps (see app/migrate.py)
+TRANSACTIONAL = False
+
+
+def upgrade(connection):
+    connection.execute(text("ALTER TABLE restaurant_photos ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)"))
+    connection.execute(text("ALTER TABLE restaurant_photos ADD COLUMN IF NOT EXISTS size_bytes BIGINT"))
+    connection.execute(text("ALTER TABLE restaurant_photos ALTER COLUMN photo_data DROP NOT NULL"))
+
+    # Moving bytes does not change any menu: only bump menu versions (0005) for columns menus show
+    connection.execute(text("DROP TRIGGER IF EXISTS restaurant_photos_menu_changed ON restaurant_photos"))
+    connection.execute(text("""
+        CREATE TRIGGER restaurant_photos_menu_changed
+            AFTER INSERT OR UPDATE OF restaurant_id, food_name, file_name OR DELETE ON restaurant_photos
+            FOR EACH ROW EXECUTE FUNCTION notify_menu_changed('photo_id')
+    """))
+    connection.commit()
+
+    # Files written before a failed commit are harmless: they are only found through a committed hash
+    last_id = 0
+    while True:
+        rows = connection.execute(text("""
+            SELECT photo_id, photo_data FROM restaurant_photos
+            WHERE photo_id > :last_id AND content_hash IS NULL AND photo_data IS NOT NULL
+            ORDER BY photo_id
+            LIMIT :batch_size
+        """), {"last_id": last_id, "batch_size": BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            digest, size = save_photo(bytes(row.photo_data))
+            connection.execute(text("""
+                UPDATE restaurant_photos SET content_hash = :digest, size_bytes = :size, photo_data = NULL
+                WHERE photo_id = :photo_id
+            """), {"digest": digest, "size": size, "photo_id": row.photo_id})
+        connection.commit()
+        last_id = rows[-1].photo_id
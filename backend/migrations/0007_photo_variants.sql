@@ -0,0 +1,16 @@
+-- Resized variants of each stored photo (thumb / card / full, WebP and JPEG), built on
+-- upload by Backend_Component and served by GET /api/photos/{file_name}?size=...
+-- Keyed by the original's content hash, so photos sharing bytes share variants; the
+-- variant bytes are stored in the photo store under variant_hash.
+
+CREATE TABLE IF NOT EXISTS photo_variants (
+    content_hash VARCHAR(64) NOT NULL,
+    variant VARCHAR(16) NOT NULL,
+    format VARCHAR(8) NOT NULL,
+    variant_hash VARCHAR(64) NOT NULL,
+    size_bytes BIGINT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (content_hash, variant, format)
+);
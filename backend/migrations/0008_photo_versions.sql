@@ -0,0 +1,11 @@
+-- Menu photo URLs now carry the photo's content version (?v=<content_hash prefix>), so a
+-- new upload under the same file name changes the menu: fire the menu_changed trigger
+-- (0005) for content_hash too. photo_variants.created_at backs Last-Modified and is
+-- stored as naive UTC like restaurant_photos.upload_time.
+
+DROP TRIGGER IF EXISTS restaurant_photos_menu_changed ON restaurant_photos;
+CREATE TRIGGER restaurant_photos_menu_changed
+    AFTER INSERT OR UPDATE OF restaurant_id, food_name, file_name, content_hash OR DELETE ON restaurant_photos
+    FOR EACH ROW EXECUTE FUNCTION notify_menu_changed('photo_id');
+
+ALTER TABLE photo_variants ALTER COLUMN created_at SET DEFAULT timezone('utc', now());
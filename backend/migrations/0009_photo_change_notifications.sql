@@ -0,0 +1,35 @@
+-- Publish photo changes on the `photo_changed` channel for the backend's photo metadata
+-- cache (app/api/photo_cache.py): "file:<file_name>" when a restaurant_photos row is
+-- inserted, updated or deleted (uploads from Backend_Component included), and
+-- "hash:<content_hash>" when variants of a stored photo are added or removed.
+
+CREATE OR REPLACE FUNCTION notify_photo_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'photo_variants' THEN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM pg_notify('photo_changed', 'hash:' || OLD.content_hash);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM pg_notify('photo_changed', 'hash:' || NEW.content_hash);
+        END IF;
+    ELSE
+        IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.file_name IS NOT NULL THEN
+            PERFORM pg_notify('photo_changed', 'file:' || OLD.file_name);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.file_name IS NOT NULL THEN
+            PERFORM pg_notify('photo_changed', 'file:' || NEW.file_name);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS restaurant_photos_photo_changed ON restaurant_photos;
+CREATE TRIGGER restaurant_photos_photo_changed
+    AFTER INSERT OR UPDATE OR DELETE ON restaurant_photos
+    FOR EACH ROW EXECUTE FUNCTION notify_photo_changed();
+
+DROP TRIGGER IF EXISTS photo_variants_photo_changed ON photo_variants;
+CREATE TRIGGER photo_variants_photo_changed
+    AFTER INSERT OR UPDATE OR DELETE ON photo_variants
+    FOR EACH ROW EXECUTE FUNCTION notify_photo_changed();
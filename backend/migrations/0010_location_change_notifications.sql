@@ -0,0 +1,20 @@
+-- Publish changes to what the restaurant location index (app/api/geo.py) is built from on
+-- the `restaurant_location_changed` channel, whichever process or tool makes them. The
+-- index is rebuilt as a whole, so one notification per statement is enough.
+
+CREATE OR REPLACE FUNCTION notify_restaurant_location_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('restaurant_location_changed', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS address_table_location_changed ON address_table;
+CREATE TRIGGER address_table_location_changed
+    AFTER INSERT OR UPDATE OF restaurant_id, latitude, longitude OR DELETE OR TRUNCATE ON address_table
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_restaurant_location_changed();
+
+DROP TRIGGER IF EXISTS restaurant_table_location_changed ON restaurant_table;
+CREATE TRIGGER restaurant_table_location_changed
+    AFTER INSERT OR UPDATE OF restaurant_id, restaurant_type, pricing_levels, ratings OR DELETE OR TRUNCATE ON restaurant_table
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_restaurant_location_changed();
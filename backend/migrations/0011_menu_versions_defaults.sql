@@ -0,0 +1,8 @@
+-- Databases whose menu_versions table was created by 0000 before the model declared a
+-- server default: bump_menu_version() inserts rows without a version, which then failed
+-- NOT NULL. restaurant_id also got a serial sequence it never uses.
+
+ALTER TABLE menu_versions ALTER COLUMN version SET DEFAULT 1;
+
+ALTER TABLE menu_versions ALTER COLUMN restaurant_id DROP DEFAULT;
+DROP SEQUENCE IF EXISTS menu_versions_restaurant_id_seq;
@@ -0,0 +1,11 @@
+-- Photos whose variants could not be built on upload (Backend_Component
+-- routers/photos.py store_photo_variants), e.g. a corrupt or unsupported image. Such photos
+-- are served as uploaded; scripts/backfill_photo_variants.py retries them and gives up
+-- after --max-attempts, and a successful build removes the row.
+
+CREATE TABLE IF NOT EXISTS photo_variant_failures (
+    content_hash VARCHAR(64) PRIMARY KEY,
+    attempts INTEGER NOT NULL DEFAULT 1,
+    last_error TEXT NOT NULL,
+    failed_at TIMESTAMP NOT NULL DEFAULT timezone('utc', now())
+);
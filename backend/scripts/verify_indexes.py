@@ -0,0 +1,227 @@
+"""
+EXPLAIN every query issued by the cart, menu, photo and merchant (dbop / photos) routers
+and fail if any of them reads a hot table with a sequential scan.
+
+Small tables are always cheaper to seq-scan, so the check runs with
+`enable_seqscan = off`: a Seq Scan that survives that setting means no index
+can serve the query. With --seed N, N synthetic restaurants (with menus, photos,
+customers and orders) are inserted and ANALYZEd first; everything runs in one
+transaction that is rolled back, so the database is left untouched.
+
+Usage (from the backend/ directory):
+    python -m scripts.verify_indexes --seed 2000
+"""
+import argparse
+import json
+import sys
+from sqlalchemy import text
+from app.api.database import engine
+from app.api.routers.menu import BULK_MENU_SQL, MENU_SQL, SEARCH_SQL
+
+SEED_BASE = 900000  # id offset for synthetic rows
+
+SEED_SQL = [
+    """
+    INSERT INTO restaurant_table (restaurant_id, restaurant_name, ratings, restaurant_type, pricing_levels)
+    SELECT :base + g, 'Seed restaurant ' || g, 4.0, 'seed', '$' FROM generate_series(1, :n) g
+    """,
+    """
+    INSERT INTO address_table (restaurant_id, state, city, street_address, postal_code, latitude, longitude)
+    SELECT :base + g, 'ON', 'Waterloo', g || ' Seed St', 10000, 43.4 + g * 0.0001, -80.5 - g * 0.0001
+    FROM generate_series(1, :n) g
+    """,
+    """
+    INSERT INTO customer_account_table (customer_id, phone_number, manager_account_name, manager_account_password)
+    SELECT :base + g, '9' || lpad(g::text, 9, '0'), 'seed', 'seed' FROM generate_series(1, :n) g
+    """,
+    """
+    INSERT INTO manager_account_table (manager_id, restaurant_id, manager_account_name, manager_account_password)
+    SELECT :base + g, :base + g, 'seed' || g, 'seed' FROM generate_series(1, :n) g
+    """,
+    """
+    INSERT INTO menu_table (menu_id, restaurant_id, category, food_name, food_description, food_price, availability)
+    SELECT :base * 10 + g * 10 + d, :base + g, 'Category ' || (d % 3), 'Dish ' || d, 'seed', 9.99, true
+    FROM generate_series(1, :n) g, generate_series(0, 9) d
+    """,
+    """
+    INSERT INTO restaurant_photos (restaurant_id, food_name, file_name, content_type, content_hash, size_bytes)
+    SELECT :base + g, 'Dish ' || d, 'seed_' || g || '_' || d || '.jpg', 'image/jpeg', md5(g::text) || md5(d::text), 1
+    FROM generate_series(1, :n) g, generate_series(0, 9) d
+    """,
+    """
+    INSERT INTO order_table (order_number, status, customer_id, restaurant_id, items_count, subtotal, taxes, fooditems)
+    SELECT 'S' || lpad((g * 10 + d)::text, 9, '0'),
+           (ARRAY['cart', 'new', 'prepare', 'complete', 'cancelled'])[d % 5 + 1],
+           :base + g, :base + (g + d) % :n + 1, 1, 10.0, 1.0, '[]'
+    FROM generate_series(1, :n) g, generate_series(0, 9) d
+    """,
+    """
+    INSERT INTO customer_history_table (customer_number, order_number)
+    SELECT '9' || lpad(g::text, 9, '0'), 'S' || lpad((g * 10 + d)::text, 9, '0')
+    FROM generate_series(1, :n) g, generate_series(0, 9) d
+    """,
+]
+
+HOT_TABLES = [
+    "order_table", "menu_table", "restaurant_photos", "customer_history_table",
+    "customer_account_table", "restaurant_table", "address_table", "manager_account_table", "menu_changes",
+    "photo_variants",
+]
+
+# (router, description, SQL, params) for every query shape the routers issue.
+# The coordinate load behind app.api.geo is left out on purpose: it reads every address row by design.
+QUERIES = [
+    ("cart", "customer by phone", "SELECT * FROM customer_account_table WHERE phone_number = :phone", {}),
+    ("cart", "customer phone by id", "SELECT phone_number FROM customer_account_table WHERE customer_id = :customer_id", {}),
+    ("cart", "restaurant by id", "SELECT * FROM restaurant_table WHERE restaurant_id = :restaurant_id", {}),
+    ("cart", "address by restaurant", "SELECT * FROM address_table WHERE restaurant_id = :restaurant_id", {}),
+    ("cart", "open cart", """
+        SELECT * FROM order_table
+        WHERE customer_id = :customer_id AND restaurant_id = :restaurant_id AND status = 'cart'
+    """, {}),
+    ("cart", "last order number", "SELECT * FROM order_table ORDER BY order_number DESC LIMIT 1", {}),
+    ("cart", "cart by order number", "SELECT * FROM order_table WHERE order_number = :order_number AND status = 'cart'", {}),
+    ("cart", "carts by customer", "SELECT * FROM order_table WHERE customer_id = :customer_id AND status = 'cart'", {}),
+    ("cart", "menu item", """
+        SELECT * FROM menu_table WHERE menu_id = :menu_id AND food_name = 'Dish 1' AND restaurant_id = :restaurant_id
+    """, {}),
+    ("restaurant", "nearby details by id", """
+        SELECT * FROM restaurant_table r JOIN address_table a ON r.restaurant_id = a.restaurant_id
+        WHERE r.restaurant_id IN (:restaurant_id)
+    """, {}),
+    ("menu", "menu with photos", MENU_SQL.format(category_filter=""), {}),
+    ("menu", "menu with photos by category", MENU_SQL.format(category_filter="AND m.category ILIKE :category"),
+     {"category": "%Category 1%"}),
+    ("menu", "bulk menus", BULK_MENU_SQL,
+     {"restaurant_ids": [SEED_BASE + 1, SEED_BASE + 2], "categories": [None, "%Category 1%"]}),
+    ("menu", "menu changes since version", """
+        SELECT version, source, row_id, food_name FROM menu_changes
+        WHERE restaurant_id = :restaurant_id AND version > 0 AND version <= 10
+    """, {}),
+    ("menu", "changed dishes with photos",
+     MENU_SQL.format(category_filter="AND (m.menu_id = ANY(:menu_ids) OR btrim(m.food_name, E' \\t\\n\\r') = ANY(:food_names))"),
+     {"menu_ids": [SEED_BASE * 10 + 11], "food_names": ["Dish 2"]}),
+    ("menu", "dish search", SEARCH_SQL.format(restaurant_filter=""), {"q": "Dish 1", "limit": 20}),
+    ("photo", "photo by file name", """
+        SELECT p.photo_id, p.content_type, p.content_hash, v.format, v.variant_hash
+        FROM restaurant_photos p
+        LEFT OUTER JOIN photo_variants v ON v.content_hash = p.content_hash AND v.variant = 'thumb'
+        WHERE p.file_name = :file_name
+        ORDER BY p.photo_id
+    """, {}),
+    ("photo", "photo metadata by restaurant", """
+        SELECT photo_id, file_name, content_hash, COALESCE(size_bytes, octet_length(photo_data)) AS size_bytes
+        FROM restaurant_photos WHERE restaurant_id = :restaurant_id ORDER BY photo_id
+    """, {}),
+    ("customer", "order numbers by customer", """
+        SELECT order_number FROM customer_history_table WHERE customer_number = :phone
+    """, {}),
+    ("customer", "orders by number", """
+        SELECT * FROM order_table WHERE order_number IN (:order_number) AND status != 'cart' ORDER BY due_date DESC
+    """, {}),
+    ("dbop", "login", """
+        SELECT manager_account_password, manager_id FROM manager_account_table WHERE manager_account_name = :manager_name
+    """, {}),
+    ("dbop", "menu categories", """
+        SELECT DISTINCT category FROM menu_table
+        WHERE restaurant_id IN (SELECT restaurant_id FROM manager_account_table WHERE manager_id = :manager_id)
+    """, {}),
+    ("dbop", "menu food by category", """
+        SELECT food_name, food_price, availability FROM menu_table
+        WHERE restaurant_id IN (SELECT restaurant_id FROM manager_account_table WHERE manager_id = :manager_id)
+        AND category = 'Category 1'
+    """, {}),
+    ("dbop", "open orders", """
+        SELECT ot.order_number FROM order_table ot
+        WHERE ot.restaurant_id IN (SELECT restaurant_id FROM manager_account_table WHERE manager_id = :manager_id)
+        AND ot.status IN ('new', 'prepare')
+    """, {}),
+    ("dbop", "order history", """
+        SELECT ot.order_number FROM order_table ot
+        WHERE ot.restaurant_id IN (SELECT restaurant_id FROM manager_account_table WHERE manager_id = :manager_id)
+        AND ot.status IN ('complete', 'cancelled')
+    """, {}),
+    ("dbop", "update availability", """
+        UPDATE menu_table SET availability = true
+        WHERE category = 'Category 1'
+        AND restaurant_id IN (SELECT restaurant_id FROM manager_account_table WHERE manager_id = :manager_id)
+        AND food_name = 'Dish 1'
+    """, {}),
+    ("dbop", "update order status", "UPDATE order_table SET status = 'complete' WHERE order_number = :order_number", {}),
+    ("dbop", "restaurant by manager", """
+        SELECT restaurant_id, restaurant_name FROM restaurant_table
+        WHERE restaurant_id IN (SELECT restaurant_id FROM manager_account_table WHERE manager_id = :manager_id)
+    """, {}),
+    ("photos", "photo by restaurant and dish", """
+        SELECT photo_id FROM restaurant_photos WHERE restaurant_id = :restaurant_id AND food_name = 'Dish 1'
+    """, {}),
+    ("photos", "photo metadata by manager", """
+        SELECT photo_id, file_name, content_hash, COALESCE(size_bytes, octet_length(photo_data)) AS size_bytes
+        FROM restaurant_photos
+        WHERE restaurant_id IN (SELECT restaurant_id FROM manager_account_table WHERE manager_id = :manager_id)
+        ORDER BY photo_id
+    """, {}),
+    ("photos", "photo by id", "SELECT * FROM restaurant_photos WHERE photo_id = 1", {}),
+    ("photos", "delete photo", "DELETE FROM restaurant_photos WHERE photo_id = 1", {}),
+]
+
+SAMPLE_PARAMS = {
+    "phone": "9000000001",
+    "customer_id": SEED_BASE + 1,
+    "restaurant_id": SEED_BASE + 1,
+    "manager_id": SEED_BASE + 1,
+    "manager_name": "seed1",
+    "menu_id": SEED_BASE * 10 + 11,
+    "order_number": "S000000011",
+    "file_name": "seed_1_1.jpg",
+    "photo_base": "/api/photos/",
+}
+
+
+def seq_scans(plan: dict):
+    """Yield the hot tables read by a Seq Scan anywhere in an EXPLAIN JSON plan."""
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in HOT_TABLES:
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from seq_scans(child)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="insert N synthetic restaurants before checking")
+    args = parser.parse_args()
+
+    failures = []
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            if args.seed:
+                for statement in SEED_SQL:
+                    connection.execute(text(statement), {"base": SEED_BASE, "n": args.seed})
+                for table in HOT_TABLES:
+                    connection.exec_driver_sql(f"ANALYZE {table}")
+
+            connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+
+            for router, name, sql, params in QUERIES:
+                plan = connection.execute(
+                    text("EXPLAIN (FORMAT JSON) " + sql), {**SAMPLE_PARAMS, **params}
+                ).scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                tables = sorted(set(seq_scans(plan[0]["Plan"])))
+                status = "SEQ SCAN on " + ", ".join(tables) if tables else "ok"
+                print(f"[{router:10s}] {name:32s} {status}")
+                if tables:
+                    failures.append((router, name, tables))
+        finally:
+            transaction.rollback()
+
+    if failures:
+        print(f"\n{len(failures)} quer{'y' if len(failures) == 1 else 'ies'} fell back to a sequential scan")
+        sys.exit(1)
+    print("\nAll queries use an index")
+
+
+if __name__ == "__main__":
+    main()